@@ -0,0 +1,224 @@
+import sys
+import threading
+import time
+from array import array
+
+import benchmarks
+import operations
+
+try:
+    import numpy
+except ImportError:  # The reports fall back to loops over the same columns
+    numpy = None
+
+# Genre code of rows whose book was deleted; the row is reused by the next new book
+DELETED = -1
+# Operations whose first argument, or first item of each batch entry, names a changed book
+_BOOK_OPERATIONS = ("add_book", "update_book", "delete_book", "borrow_book", "return_book")
+_BATCH_OPERATIONS = ("add_books_bulk", "borrow_many", "return_many")
+
+
+class CatalogColumns:
+    """
+    Column store of the catalog for aggregate reports: one row per book, with genre
+    codes (positions in operations.genres) and copy counts in typed arrays instead of
+    one record object per book. The columns follow the catalog through a mutation
+    listener, or are rebuilt from operations.books when operations.generation shows
+    a change they did not see (e.g. while detached, after reset_library or loading
+    a store). With NumPy installed, reports are vectorized
+    over zero-copy views of the arrays; without it they loop over the arrays.
+    """
+
+    def __init__(self):
+        self.isbns = []  # Row -> ISBN (None for free rows)
+        self.rows = {}  # ISBN -> row
+        self.free = []  # Rows of deleted books, reused first
+        self.genre_codes = array("b")
+        self.total_copies = array("q")
+        self.original_copies = array("q")
+        self.generation = None  # operations.generation the columns reflect
+        self.lock = threading.Lock()  # Listeners run on the threads of threadsafe.py callers
+
+    def attach(self):
+        """Rebuilds the columns and keeps them updated from now on."""
+        self.rebuild()
+        if self.on_mutation not in operations.mutation_listeners:
+            operations.mutation_listeners.append(self.on_mutation)
+
+    def detach(self):
+        """Stops following catalog changes."""
+        if self.on_mutation in operations.mutation_listeners:
+            operations.mutation_listeners.remove(self.on_mutation)
+
+    def rebuild(self):
+        """Reloads every column from operations.books."""
+        generation = operations.generation
+        isbns = []
+        codes = array("b")
+        totals = array("q")
+        originals = array("q")
+        genre_code = {genre: code for code, genre in enumerate(operations.genres)}
+        for isbn, book in operations.books.items():
+            isbns.append(isbn)
+            codes.append(genre_code[book.genre])
+            totals.append(book.total_copies)
+            originals.append(book.original_copies)
+        with self.lock:
+            self.isbns = isbns
+            self.rows = {isbn: row for row, isbn in enumerate(isbns)}
+            self.free = []
+            self.genre_codes, self.total_copies, self.original_copies = codes, totals, originals
+            self.generation = generation
+
+    def on_mutation(self, operation, args, kwargs):
+        """Mutation listener: updates the rows of the books an operation changed."""
+        if self.generation != operations.generation - 1:
+            return  # Changes were missed (or made concurrently); the next report rebuilds the columns
+        if operation in _BOOK_OPERATIONS:
+            isbns = args[:1] or [kwargs.get("isbn")]
+        elif operation in _BATCH_OPERATIONS:
+            isbns = [entry[0] for entry in args[0] if entry]
+        elif operation == "apply_batch":
+            isbns = [entry[1][0] for entry in args[0] if entry[0] in _BOOK_OPERATIONS and entry[1]]
+        else:
+            isbns = ()
+        for isbn in isbns:
+            self.sync(isbn)
+        self.generation += 1
+
+    def sync(self, isbn):
+        """Copies one book's current state into its row, adding or freeing the row as needed."""
+        book = operations.books.get(isbn) if isinstance(isbn, str) else None
+        with self.lock:
+            row = self.rows.get(isbn)
+            if book is None:
+                if row is not None:
+                    del self.rows[isbn]
+                    self.isbns[row] = None
+                    self.genre_codes[row] = DELETED
+                    self.free.append(row)
+                return
+            code = operations.genres.index(book.genre)
+            if row is None:
+                if self.free:
+                    row = self.free.pop()
+                    self.isbns[row] = isbn
+                else:
+                    row = len(self.isbns)
+                    self.isbns.append(isbn)
+                    self.genre_codes.append(DELETED)
+                    self.total_copies.append(0)
+                    self.original_copies.append(0)
+                self.rows[isbn] = row
+            self.genre_codes[row] = code
+            self.total_copies[row] = book.total_copies
+            self.original_copies[row] = book.original_copies
+
+    def _current(self):
+        """Rebuilds the columns if the catalog changed in a way they did not follow."""
+        if self.generation != operations.generation:
+            self.rebuild()
+
+    def availability_by_genre(self):
+        """Returns {genre: copies on the shelf / copies owned} for genres owning copies."""
+        self._current()
+        with self.lock:
+            if numpy is not None:
+                codes = numpy.frombuffer(self.genre_codes, dtype=numpy.int8)
+                live = codes != DELETED
+                slots = len(operations.genres)
+                shelf = numpy.bincount(codes[live], weights=numpy.frombuffer(self.total_copies, dtype=numpy.int64)[live],
+                                       minlength=slots)
+                owned = numpy.bincount(codes[live],
+                                       weights=numpy.frombuffer(self.original_copies, dtype=numpy.int64)[live],
+                                       minlength=slots)
+                shelf, owned = shelf.tolist(), owned.tolist()
+            else:
+                shelf = [0] * len(operations.genres)
+                owned = [0] * len(operations.genres)
+                for code, total, original in zip(self.genre_codes, self.total_copies, self.original_copies):
+                    if code != DELETED:
+                        shelf[code] += total
+                        owned[code] += original
+        return {genre: shelf[code] / owned[code] for code, genre in enumerate(operations.genres) if owned[code]}
+
+    def low_availability(self, fraction=0.1):
+        """Returns the ISBNs with fewer than fraction of their copies on the shelf, in row order."""
+        self._current()
+        with self.lock:
+            if numpy is not None:
+                totals = numpy.frombuffer(self.total_copies, dtype=numpy.int64)
+                originals = numpy.frombuffer(self.original_copies, dtype=numpy.int64)
+                mask = (numpy.frombuffer(self.genre_codes, dtype=numpy.int8) != DELETED) & (originals > 0)
+                rows = numpy.flatnonzero(mask & (totals < fraction * originals)).tolist()
+            else:
+                rows = [row for row, (code, total, original) in
+                        enumerate(zip(self.genre_codes, self.total_copies, self.original_copies))
+                        if code != DELETED and original > 0 and total < fraction * original]
+            return [self.isbns[row] for row in rows]
+
+    def on_loan_histogram(self):
+        """Returns a list whose item n counts the books with n copies on loan (original - total copies)."""
+        self._current()
+        with self.lock:
+            if numpy is not None:
+                codes = numpy.frombuffer(self.genre_codes, dtype=numpy.int8)
+                on_loan = (numpy.frombuffer(self.original_copies, dtype=numpy.int64)
+                           - numpy.frombuffer(self.total_copies, dtype=numpy.int64))[codes != DELETED]
+                return numpy.bincount(numpy.maximum(on_loan, 0)).tolist()
+            counts = []
+            for code, total, original in zip(self.genre_codes, self.total_copies, self.original_copies):
+                if code != DELETED:
+                    lent = max(original - total, 0)
+                    if lent >= len(counts):
+                        counts.extend([0] * (lent + 1 - len(counts)))
+                    counts[lent] += 1
+            return counts
+
+
+def _dict_reports(fraction=0.1):
+    """The same reports computed by iterating operations.books, for comparison."""
+    shelf = {}
+    owned = {}
+    low = []
+    histogram = {}
+    for isbn, book in operations.books.items():
+        shelf[book.genre] = shelf.get(book.genre, 0) + book.total_copies
+        owned[book.genre] = owned.get(book.genre, 0) + book.original_copies
+        if book.original_copies > 0 and book.total_copies < fraction * book.original_copies:
+            low.append(isbn)
+        lent = max(book.original_copies - book.total_copies, 0)
+        histogram[lent] = histogram.get(lent, 0) + 1
+    return {genre: shelf[genre] / owned[genre] for genre in owned if owned[genre]}, low, histogram
+
+
+def measure(count=1_000_000, seed=0):
+    """
+    Loads count synthetic books, lends out some copies, then times the three reports
+    over the columns and over the dictionary. Returns the timings in seconds.
+    """
+    operations.reset_library()
+    operations.add_books_bulk(benchmarks.generate_books(count, seed))
+    for isbn, book in operations.books.items():
+        book.total_copies = book.original_copies * (hash(isbn) % 4) // 4  # Skip circulation for speed
+    operations.rebuild_indexes()
+    columns = CatalogColumns()
+
+    started = time.perf_counter()
+    columns.rebuild()
+    rebuild_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    columns.availability_by_genre()
+    columns.low_availability()
+    columns.on_loan_histogram()
+    column_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    _dict_reports()
+    dict_seconds = time.perf_counter() - started
+    return {"books": count, "numpy": numpy is not None, "rebuild_seconds": rebuild_seconds,
+            "column_seconds": column_seconds, "dict_seconds": dict_seconds,
+            "speedup": dict_seconds / column_seconds if column_seconds else 0.0}
+
+
+if __name__ == "__main__":
+    print(measure(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
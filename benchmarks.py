@@ -0,0 +1,208 @@
+import argparse
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+import operations
+
+# Words used to build synthetic titles and author names
+_TITLE_WORDS = ("Data", "Systems", "History", "Python", "Modern", "Theory", "Ocean", "Garden", "Night", "River",
+                "Mystery", "Empire", "Quantum", "Journey", "Letters", "Shadow", "Engine", "Island", "Winter", "Code")
+_FIRST_NAMES = ("Kairan", "Haja", "Julius", "Ibrahim", "Kumba", "Fatmata", "Sorie", "Mohamed", "Alpha", "Isata")
+_LAST_NAMES = ("Lebbie", "Barrie", "Kargbo", "Swarray", "Sesay", "Conteh", "Kamara", "Koroma", "Bangura", "Sawyer")
+
+
+def generate_books(count, seed=0, prefix="BK"):
+    """Yields count synthetic (isbn, title, author, genre, total_copies) records."""
+    generator = random.Random(seed)
+    for number in range(count):
+        title = " ".join(generator.choice(_TITLE_WORDS) for _ in range(generator.randint(2, 4)))
+        author = f"{generator.choice(_FIRST_NAMES)} {generator.choice(_LAST_NAMES)}"
+        yield (f"{prefix}{number:08d}", f"{title} {number}", author, generator.choice(operations.genres),
+               generator.randint(1, 8))
+
+
+def generate_members(count, seed=0, prefix="MB"):
+    """Yields count synthetic (member_id, name, email) records."""
+    generator = random.Random(seed)
+    for number in range(count):
+        first = generator.choice(_FIRST_NAMES)
+        last = generator.choice(_LAST_NAMES)
+        yield f"{prefix}{number:08d}", f"{first} {last}", f"{first.lower()}.{last.lower()}{number}@example.com"
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _fragments(texts, count, generator):
+    """
+    Returns up to count distinct lowercase substrings of the texts, three to eight
+    characters long, so timed searches miss the result cache and measure the index.
+    """
+    fragments = {}
+    for _ in range(count * 10):
+        if len(fragments) == count:
+            break
+        text = generator.choice(texts).lower()
+        length = generator.randint(3, 8)
+        start = generator.randrange(max(1, len(text) - length + 1))
+        fragments[text[start:start + length]] = None
+    return list(fragments)
+
+
+def time_calls(function, argument_list):
+    """
+    Calls function once per argument tuple and times each call.
+    Returns calls per second and latency percentiles in microseconds.
+    """
+    latencies = []
+    clock = time.perf_counter_ns
+    started = clock()
+    for arguments in argument_list:
+        before = clock()
+        function(*arguments)
+        latencies.append(clock() - before)
+    elapsed = (clock() - started) / 1e9
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "ops_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_us": _percentile(latencies, 0.50) / 1000,
+        "p90_us": _percentile(latencies, 0.90) / 1000,
+        "p99_us": _percentile(latencies, 0.99) / 1000,
+        "max_us": latencies[-1] / 1000
+    }
+
+
+def run_size(size, samples=1000, seed=0):
+    """
+    Loads size books and size members, then benchmarks every operation with samples
+    calls each. Searches use distinct queries, except the "_cached" runs, which repeat
+    a few words. Returns the load time, memory peak and per-operation results.
+    """
+    generator = random.Random(seed)
+    operations.reset_library()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    operations.add_books_bulk(generate_books(size, seed))
+    operations.add_members_bulk(generate_members(size, seed))
+    load_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    operations.find_books("warm up")
+    index_build_seconds = time.perf_counter() - started
+
+    isbns = list(operations.books)
+    member_ids = list(operations.members)
+    new_books = list(generate_books(samples, seed + 1, prefix="NB"))
+    new_members = list(generate_members(samples, seed + 1, prefix="NM"))
+    titles = [operations.books[isbn].title for isbn in isbns]
+    authors = sorted({operations.books[isbn].author for isbn in isbns})
+    title_queries = [(query,) for query in _fragments(titles, 3 * samples, generator)]
+    author_queries = [(query, "author") for query in _fragments(authors, samples, generator)]
+    repeated_queries = [(generator.choice(_TITLE_WORDS).lower(),) for _ in range(samples)]
+    checkouts = list({(generator.choice(isbns), generator.choice(member_ids)) for _ in range(samples)})
+
+    results = {}
+    results["add_book"] = time_calls(operations.add_book, new_books)
+    results["add_member"] = time_calls(operations.add_member, new_members)
+    # Each run gets its own third of the title queries, so none is answered from an earlier run's cache
+    results["search_books_title"] = time_calls(operations.search_books, title_queries[0::3])
+    results["search_books_author"] = time_calls(operations.search_books, author_queries)
+    results["search_books_title_cached"] = time_calls(operations.search_books, repeated_queries)
+    results["fuzzy_find_books_title_page"] = time_calls(
+        lambda query: operations.fuzzy_find_books(query[:2] + query[3:], limit=20), title_queries[1::3])
+    results["find_books_title_page"] = time_calls(lambda query: operations.find_books(query, limit=20),
+                                                  title_queries[2::3])
+    started = time.perf_counter()
+    operations.browse_books()
+    browse_build_seconds = time.perf_counter() - started
+    results["browse_books_genre_page"] = time_calls(lambda isbn: operations.browse_books(genre="Mystery", after=isbn),
+                                                    [(generator.choice(isbns),) for _ in range(samples)])
+    results["browse_books_author_page"] = time_calls(lambda author: operations.browse_books(author=author),
+                                                     [(operations.books[generator.choice(isbns)].author,)
+                                                      for _ in range(samples)])
+    results["update_book_title"] = time_calls(lambda isbn: operations.update_book(isbn, title=f"Retitled {isbn}"),
+                                              [(generator.choice(isbns),) for _ in range(samples)])
+    results["update_member_email"] = time_calls(
+        lambda member_id: operations.update_member(member_id, email=f"{member_id.lower()}@example.org"),
+        [(generator.choice(member_ids),) for _ in range(samples)])
+    results["borrow_book"] = time_calls(operations.borrow_book, checkouts)
+    results["member_loans"] = time_calls(operations.member_loans, [(member_id,) for _, member_id in checkouts])
+    results["current_borrowers"] = time_calls(operations.current_borrowers, [(isbn,) for isbn, _ in checkouts])
+    # Sweeps at later and later times, each returning the loans that fell due since the last
+    now = operations.clock()
+    results["overdue_loans"] = time_calls(operations.overdue_loans,
+                                          [(now + 60 * 86400 * number / samples,) for number in range(samples)])
+    results["return_book"] = time_calls(operations.return_book, checkouts)
+    results["borrow_many"] = time_calls(operations.borrow_many, [(checkouts,)])
+    results["return_many"] = time_calls(operations.return_many, [(checkouts,)])
+    results["apply_batch"] = time_calls(operations.apply_batch, [([("borrow_book", pair), ("return_book", pair)],)
+                                                                 for pair in checkouts])
+    results["circulation_summary"] = time_calls(operations.circulation_summary, [()] * samples)
+    results["genre_stats"] = time_calls(operations.genre_stats, [()] * samples)
+    results["title_stats"] = time_calls(operations.title_stats, [(generator.choice(isbns),) for _ in range(samples)])
+
+    # Holds queue on books with no copies on the shelf, about ten members per book
+    hold_books = [record[:4] + (0,) for record in generate_books(max(1, samples // 10), seed + 2, prefix="HB")]
+    operations.add_books_bulk(hold_books)
+    hold_isbns = [record[0] for record in hold_books]
+    holds = list({(generator.choice(hold_isbns), generator.choice(member_ids)) for _ in range(samples)})
+    results["place_hold"] = time_calls(operations.place_hold, holds)
+    results["hold_queue"] = time_calls(operations.hold_queue, [(isbn,) for isbn, _ in holds])
+    results["cancel_hold"] = time_calls(operations.cancel_hold, holds)
+    for isbn in hold_isbns:
+        operations.delete_book(isbn)
+    results["delete_book"] = time_calls(operations.delete_book, [(record[0],) for record in new_books])
+    results["delete_member"] = time_calls(operations.delete_member, [(record[0],) for record in new_members])
+    results["add_books_bulk"] = time_calls(operations.add_books_bulk, [(new_books,)])
+    results["add_members_bulk"] = time_calls(operations.add_members_bulk, [(new_members,)])
+
+    return {
+        "size": size,
+        "load_seconds": load_seconds,
+        "load_peak_bytes": peak,
+        "load_peak_bytes_per_record": peak / (2 * size) if size else 0.0,
+        "index_build_seconds": index_build_seconds,
+        "browse_build_seconds": browse_build_seconds,
+        "search_cache": operations.search_cache_stats(),
+        "operations": results
+    }
+
+
+def run(sizes, samples=1000, seed=0):
+    """Benchmarks every size in turn and returns the machine-readable results."""
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "samples": samples,
+        "seed": seed,
+        "runs": [run_size(size, samples, seed) for size in sizes]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every library operation at several data sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    arguments = parser.parse_args()
+
+    report = run(arguments.sizes, arguments.samples, arguments.seed)
+    with open(arguments.output, "w", encoding="utf-8") as target:
+        json.dump(report, target, indent=2)
+    for result in report["runs"]:
+        print(f"\n--- {result['size']} books and members: loaded in {result['load_seconds']:.2f}s, "
+              f"peak {result['load_peak_bytes'] / 1e6:.1f} MB ---")
+        for name, numbers in result["operations"].items():
+            print(f"{name:24} {numbers['ops_per_second']:>12,.0f} ops/s   p50 {numbers['p50_us']:8.1f} us   "
+                  f"p99 {numbers['p99_us']:8.1f} us")
+    print(f"\nResults written to {arguments.output}")
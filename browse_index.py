@@ -0,0 +1,208 @@
+import bisect
+import itertools
+
+# Keys per chunk of a SortedKeys; chunks split at twice this size
+CHUNK_SIZE = 512
+
+
+def author_key(author):
+    """Returns the normalized form authors are grouped by: lowercase, single-spaced."""
+    return " ".join(author.lower().split())
+
+
+def title_key(title, isbn):
+    """
+    Returns the key books are ordered by: the lowercased title, then the ISBN. It is
+    one string joined by NUL, which sorts below every other character, so keys order
+    like (title, ISBN) pairs while each comparison is a single string comparison.
+    """
+    return f"{title.lower()}\0{isbn}"
+
+
+def key_isbn(key):
+    """Returns the ISBN part of a title_key."""
+    return key.rpartition("\0")[2]
+
+
+class SortedKeys:
+    """
+    Sorted collection of keys stored as a list of sorted chunks, with the largest key
+    of each chunk in a separate list. Finding a key bisects the chunk maxima and then
+    one chunk, so lookups cost O(log n) and an insert or removal moves at most one
+    chunk's worth of references instead of shifting a list of every key.
+    """
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self.chunks = [keys[start:start + CHUNK_SIZE] for start in range(0, len(keys), CHUNK_SIZE)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]
+        self.size = len(keys)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key):
+        """Inserts a key."""
+        self.size += 1
+        if not self.chunks:
+            self.chunks.append([key])
+            self.maxes.append(key)
+            return
+        position = min(bisect.bisect_left(self.maxes, key), len(self.chunks) - 1)
+        chunk = self.chunks[position]
+        bisect.insort(chunk, key)
+        self.maxes[position] = chunk[-1]
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self.chunks.insert(position + 1, chunk[CHUNK_SIZE:])
+            del chunk[CHUNK_SIZE:]
+            self.maxes.insert(position, chunk[-1])
+
+    def remove(self, key):
+        """Removes a key that is present."""
+        position = bisect.bisect_left(self.maxes, key)
+        chunk = self.chunks[position]
+        del chunk[bisect.bisect_left(chunk, key)]
+        self.size -= 1
+        if chunk:
+            self.maxes[position] = chunk[-1]
+        else:
+            del self.chunks[position]
+            del self.maxes[position]
+
+    def after(self, key=None, descending=False):
+        """
+        Yields the keys after key in ascending order, or before it in descending order;
+        every key when key is None. Each key yielded costs O(1) after an O(log n) seek.
+        """
+        if not self.chunks:
+            return iter(())
+        if descending:
+            if key is None:
+                position, offset = len(self.chunks) - 1, len(self.chunks[-1])
+            else:
+                position = min(bisect.bisect_left(self.maxes, key), len(self.chunks) - 1)
+                offset = bisect.bisect_left(self.chunks[position], key)
+            return itertools.chain(reversed(self.chunks[position][:offset]),
+                                   *(reversed(chunk) for chunk in reversed(self.chunks[:position])))
+        if key is None:
+            position, offset = 0, 0
+        else:
+            position = bisect.bisect_right(self.maxes, key)
+            if position == len(self.chunks):
+                return iter(())
+            offset = bisect.bisect_right(self.chunks[position], key)
+        return itertools.chain(itertools.islice(self.chunks[position], offset, None),
+                               *itertools.islice(self.chunks, position + 1, None))
+
+
+class BrowseIndex:
+    """
+    Title-ordered secondary indexes over the catalog: every book, the books of each
+    genre and the books of each (normalized) author, each kept as a SortedKeys of
+    title_key strings. A browse page seeks to its cursor and reads the next k keys,
+    O(log n + k), instead of filtering and sorting all books. The cursor is a key
+    rather than a position, so pages stay consistent while books are added or
+    removed between requests (keyset pagination). Like the search indexes, it is
+    built by the first browse, so catalogs that are never browsed pay nothing.
+    """
+
+    def __init__(self):
+        self.entries = {}  # ISBN -> (key, genre, author key) the book is indexed under
+        self.titles = SortedKeys()
+        self.genres = {}  # genre -> SortedKeys
+        self.authors = {}  # author key -> SortedKeys
+        self.pending = None  # Callable producing (ISBN, book) pairs still to be indexed
+
+    def clear(self):
+        """Removes every book from the index."""
+        self.entries.clear()
+        self.titles = SortedKeys()
+        self.genres.clear()
+        self.authors.clear()
+        self.pending = None
+
+    def load(self, source):
+        """
+        Replaces the index contents with the (ISBN, book) pairs returned by source().
+        Like SearchIndex.load, indexing is deferred until the next browse.
+        """
+        self.clear()
+        self.pending = source
+
+    def add(self, isbn, title, author, genre):
+        """Indexes a book, replacing its previous title, author and genre if indexed."""
+        if self.pending is not None:
+            return
+        if isbn in self.entries:
+            self.remove(isbn)
+        key = title_key(title, isbn)
+        grouped = author_key(author)
+        self.entries[isbn] = (key, genre, grouped)
+        self.titles.add(key)
+        for groups, name in ((self.genres, genre), (self.authors, grouped)):
+            keys = groups.get(name)
+            if keys is None:
+                keys = groups[name] = SortedKeys()
+            keys.add(key)
+
+    def remove(self, isbn):
+        """Drops a book from the index. Unknown ISBNs are ignored."""
+        if self.pending is not None:
+            return
+        entry = self.entries.pop(isbn, None)
+        if entry is None:
+            return
+        key, genre, grouped = entry
+        self.titles.remove(key)
+        for groups, name in ((self.genres, genre), (self.authors, grouped)):
+            keys = groups[name]
+            keys.remove(key)
+            if not keys:
+                del groups[name]
+
+    def key(self, isbn):
+        """Returns the title_key a book is indexed under, or None."""
+        self._current()
+        entry = self.entries.get(isbn)
+        return entry[0] if entry is not None else None
+
+    def page(self, genre=None, author=None, after=None, limit=20, descending=False):
+        """
+        Returns up to limit keys in title order (reversed with descending), after the
+        key after, of the books in the genre and by the author when given. With both
+        filters, the smaller group is walked and checked against the other.
+        """
+        self._current()
+        groups = []
+        if genre is not None:
+            groups.append((self.genres.get(genre), lambda key: self.entries[key_isbn(key)][1] == genre))
+        if author is not None:
+            grouped = author_key(author)
+            groups.append((self.authors.get(grouped), lambda key: self.entries[key_isbn(key)][2] == grouped))
+        if not groups:
+            return list(itertools.islice(self.titles.after(after, descending), limit))
+        if any(keys is None for keys, _ in groups):
+            return []
+        groups.sort(key=lambda group: len(group[0]))
+        keys = groups[0][0].after(after, descending)
+        if len(groups) > 1:
+            keys = filter(groups[1][1], keys)
+        return list(itertools.islice(keys, limit))
+
+    def _current(self):
+        if self.pending is None:
+            return
+        source = self.pending
+        self.pending = None
+        entries = self.entries
+        genres = {}
+        authors = {}
+        for isbn, book in source():
+            key = title_key(book.title, isbn)
+            grouped = author_key(book.author)
+            entries[isbn] = (key, book.genre, grouped)
+            genres.setdefault(book.genre, []).append(key)
+            authors.setdefault(grouped, []).append(key)
+        self.titles = SortedKeys(entry[0] for entry in entries.values())
+        self.genres = {genre: SortedKeys(keys) for genre, keys in genres.items()}
+        self.authors = {grouped: SortedKeys(keys) for grouped, keys in authors.items()}
@@ -0,0 +1,251 @@
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping, MutableMapping
+from itertools import accumulate
+
+import operations
+from records import Book
+
+# File layout (little-endian, every section 8-byte aligned except the genre codes):
+#   header: magic, version, book count, ISBN/title/author heap sizes
+#   total_copies and original_copies columns (int64 each)
+#   ISBN, title and author offset columns (uint64, count + 1 entries each)
+#   genre code column (uint8 index into operations.genres)
+#   ISBN, title and author string heaps (UTF-8)
+# Books are stored sorted by the UTF-8 bytes of their ISBN.
+_MAGIC = b"SLCB"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIQQQQ")
+
+
+def write_catalog(path, books):
+    """
+    Writes the books mapping to path in the columnar snapshot format.
+    The file is written to a temporary name first and then moved into place.
+    """
+    # Avoid caching every snapshot record when re-snapshotting a LazyBooks mapping
+    lookup = books.peek if isinstance(books, LazyBooks) else books.__getitem__
+    encoded = sorted((isbn.encode("utf-8"), isbn) for isbn in books)
+    count = len(encoded)
+    genre_codes = {genre: code for code, genre in enumerate(operations.genres)}
+
+    total_copies = array("q")
+    original_copies = array("q")
+    genre_column = bytearray(count)
+    isbn_parts = []
+    title_parts = []
+    author_parts = []
+    for position, (isbn_bytes, isbn) in enumerate(encoded):
+        book = lookup(isbn)
+        total_copies.append(book["total_copies"])
+        original_copies.append(book["original_copies"])
+        genre_column[position] = genre_codes[book["genre"]]
+        isbn_parts.append(isbn_bytes)
+        title_parts.append(book["title"].encode("utf-8"))
+        author_parts.append(book["author"].encode("utf-8"))
+
+    heaps = [b"".join(parts) for parts in (isbn_parts, title_parts, author_parts)]
+    offsets = [array("Q", accumulate(map(len, parts), initial=0)) for parts in (isbn_parts, title_parts, author_parts)]
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as snapshot:
+        snapshot.write(_HEADER.pack(_MAGIC, _VERSION, count, *map(len, heaps)))
+        snapshot.write(total_copies.tobytes())
+        snapshot.write(original_copies.tobytes())
+        for column in offsets:
+            snapshot.write(column.tobytes())
+        snapshot.write(genre_column)
+        for heap in heaps:
+            snapshot.write(heap)
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, path)
+
+
+class ColumnarCatalog(Mapping):
+    """
+    Read-only view of a columnar snapshot opened via mmap.
+    Lookups binary-search the ISBN heap and decode only the requested record,
+    so only the pages holding touched books are read from disk.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as snapshot:
+            self.map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, isbn_size, title_size, author_size = _HEADER.unpack_from(self.map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a columnar catalog snapshot")
+
+        self.count = count
+        view = memoryview(self.map)
+        position = _HEADER.size
+
+        def column(item_size, fmt, length):
+            nonlocal position
+            section = view[position:position + item_size * length]
+            position += item_size * length
+            return section.cast(fmt)
+
+        self.total_copies = column(8, "q", count)
+        self.original_copies = column(8, "q", count)
+        self.isbn_offsets = column(8, "Q", count + 1)
+        self.title_offsets = column(8, "Q", count + 1)
+        self.author_offsets = column(8, "Q", count + 1)
+        self.genre_codes = column(1, "B", count)
+        self.isbn_heap = column(1, "B", isbn_size)
+        self.title_heap = column(1, "B", title_size)
+        self.author_heap = column(1, "B", author_size)
+
+    def close(self):
+        """Releases the column views and unmaps the file."""
+        for name in ("total_copies", "original_copies", "isbn_offsets", "title_offsets", "author_offsets",
+                     "genre_codes", "isbn_heap", "title_heap", "author_heap"):
+            getattr(self, name).release()
+        self.map.close()
+
+    def position(self, isbn):
+        """Returns the row number of the ISBN, or -1 if it is not in the snapshot."""
+        target = isbn.encode("utf-8")
+        offsets = self.isbn_offsets
+        heap = self.isbn_heap
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(heap[offsets[middle]:offsets[middle + 1]]) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and bytes(heap[offsets[low]:offsets[low + 1]]) == target:
+            return low
+        return -1
+
+    def isbn_at(self, row):
+        """Returns the ISBN stored in the given row."""
+        return bytes(self.isbn_heap[self.isbn_offsets[row]:self.isbn_offsets[row + 1]]).decode("utf-8")
+
+    def book_at(self, row):
+        """Decodes the given row into the Book record used by operations.books."""
+        return Book(
+            bytes(self.title_heap[self.title_offsets[row]:self.title_offsets[row + 1]]).decode("utf-8"),
+            bytes(self.author_heap[self.author_offsets[row]:self.author_offsets[row + 1]]).decode("utf-8"),
+            operations.genres[self.genre_codes[row]],
+            self.total_copies[row],
+            self.original_copies[row]
+        )
+
+    def __getitem__(self, isbn):
+        row = self.position(isbn) if isinstance(isbn, str) else -1
+        if row < 0:
+            raise KeyError(isbn)
+        return self.book_at(row)
+
+    def __contains__(self, isbn):
+        return isinstance(isbn, str) and self.position(isbn) >= 0
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield self.isbn_at(row)
+
+    def __len__(self):
+        return self.count
+
+
+class LazyBooks(MutableMapping):
+    """
+    Drop-in replacement for operations.books backed by a ColumnarCatalog.
+    A book is decoded the first time it is accessed and then kept in memory, so the
+    in-place updates made by the operations functions stick. Additions and deletions
+    are tracked on top of the read-only snapshot.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.loaded = {}  # ISBN -> book decoded from the snapshot or added since
+        self.added = set()  # ISBNs that are not in the snapshot
+        self.deleted = set()  # Snapshot ISBNs that have been removed
+
+    def __getitem__(self, isbn):
+        book = self.loaded.get(isbn)
+        if book is not None:
+            return book
+        if isbn in self.deleted:
+            raise KeyError(isbn)
+        book = self.loaded[isbn] = self.catalog[isbn]
+        return book
+
+    def peek(self, isbn):
+        """Returns the book like indexing does, without keeping a decoded record in memory."""
+        book = self.loaded.get(isbn)
+        if book is not None:
+            return book
+        if isbn in self.deleted:
+            raise KeyError(isbn)
+        return self.catalog[isbn]
+
+    def __contains__(self, isbn):
+        if isbn in self.loaded:
+            return True
+        return isbn not in self.deleted and isbn in self.catalog
+
+    def __setitem__(self, isbn, book):
+        if isbn in self.deleted:
+            self.deleted.discard(isbn)
+        elif isbn not in self.loaded and isbn not in self.catalog:
+            self.added.add(isbn)
+        self.loaded[isbn] = book
+
+    def __delitem__(self, isbn):
+        if isbn not in self:
+            raise KeyError(isbn)
+        self.loaded.pop(isbn, None)
+        if isbn in self.added:
+            self.added.discard(isbn)
+        else:
+            self.deleted.add(isbn)
+
+    def __iter__(self):
+        for isbn in self.catalog:
+            if isbn not in self.deleted:
+                yield isbn
+        yield from list(self.added)
+
+    def __len__(self):
+        return len(self.catalog) - len(self.deleted) + len(self.added)
+
+    def items(self):
+        """Iterates (ISBN, book) pairs in row order without caching the decoded records."""
+        catalog = self.catalog
+        if isinstance(catalog, ColumnarCatalog):
+            for row in range(catalog.count):
+                isbn = catalog.isbn_at(row)
+                if isbn in self.deleted:
+                    continue
+                book = self.loaded.get(isbn)
+                yield isbn, book if book is not None else catalog.book_at(row)
+        else:
+            yield from catalog.items()
+        for isbn in list(self.added):
+            yield isbn, self.loaded[isbn]
+
+    def clear(self):
+        # Detach from the snapshot instead of marking every record deleted
+        self.catalog = {}
+        self.loaded.clear()
+        self.added.clear()
+        self.deleted.clear()
+
+
+def open_catalog(path):
+    """
+    Serves operations.books lazily from the columnar snapshot at path.
+    Code that imported the books name directly keeps the previous dictionary,
+    so callers should go through operations.books afterwards.
+    Returns the LazyBooks mapping now installed as operations.books.
+    """
+    books = LazyBooks(ColumnarCatalog(path))
+    operations.books = books
+    operations.rebuild_indexes()
+    return books
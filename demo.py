@@ -1,39 +1,125 @@
 from operations import *
+import argparse
 import ast
+import operations
+import re
+import storage
+import sys
+import time
+
+# Rows shown per page by the browse views
+PAGE_SIZE = 20
+
 
 # Simple display functions
-def display_books():
-    """Shows all the books in the library in a readable way."""
-    if not books:
-        print("\nNo books in the library.")
+class Pager:
+    """
+    Cursor over rows produced lazily by an iterator. Each page formats only its own
+    rows and is written in one call, so showing a page costs the same however large
+    the library is. Rows read from a dictionary follow its iteration order, so the
+    library must not change while paging them; genre pages come from browse_books
+    and stay consistent.
+    """
+
+    def __init__(self, rows, format_row, page_size=PAGE_SIZE):
+        self.rows = iter(rows)
+        self.format_row = format_row
+        self.page_size = page_size
+        self.shown = 0
+        self.next_row = next(self.rows, None)  # First row of the next page, read ahead to know when to stop
+        self.done = self.next_row is None
+
+    def next_page(self):
+        """Returns the formatted lines of the next page (empty once done)."""
+        lines = []
+        while not self.done and len(lines) < self.page_size:
+            lines.append(self.format_row(self.next_row))
+            self.next_row = next(self.rows, None)
+            self.done = self.next_row is None
+        self.shown += len(lines)
+        return lines
+
+
+def book_rows(genre=None, member_id=None):
+    """
+    Yields (isbn, book) pairs lazily, optionally only of one genre or borrowed by one
+    member. The books of a genre are read in title order from the browse index, a
+    page at a time, so filtering never walks the whole library.
+    """
+    if member_id:
+        member = members.get(member_id)
+        isbns = member.borrowed_books if member is not None else ()
+        rows = ((isbn, books[isbn]) for isbn in isbns if isbn in books)
+        return ((isbn, book) for isbn, book in rows if not genre or book.genre == genre)
+    if genre:
+        return _genre_rows(genre)
+    return iter(books.items())
+
+
+def _genre_rows(genre):
+    after = None
+    while True:
+        isbns = operations.browse_books(genre=genre, after=after, limit=PAGE_SIZE)
+        rows = [(isbn, books[isbn]) for isbn in isbns]
+        if rows:
+            # A (title, ISBN) cursor stays valid even if the book changes before the next page
+            after = (rows[-1][1].title, rows[-1][0])
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+
+
+def show_pages(pager, heading, empty, out=None):
+    """Writes pages of a pager, asking after each one whether to continue."""
+    out = out if out is not None else sys.stdout
+    if pager.done:
+        out.write(f"\n{empty}\n")
         return
-    print("\n--- Books in Library ---")
-    for isbn, book in books.items():
-        print(f"ISBN: {isbn}: {book}")
+    out.write(f"\n--- {heading} ---\n")
+    while True:
+        out.write("\n".join(pager.next_page()) + "\n")
+        if pager.done:
+            out.write(f"({pager.shown} shown)\n")
+            return
+        out.flush()
+        if input(f"{pager.shown} shown. Press Enter for more or 'q' to stop: ").strip().lower() == "q":
+            return
 
 
-def display_members():
-    """Shows all the library members in a readable way."""
-    if not members:
-        print("\nNo members in the library.")
-        return
-    print("\n--- Library Members ---")
-    for member in members:
-        print(member)
+def display_books(genre=None, member_id=None, page_size=PAGE_SIZE, out=None):
+    """Shows the books in the library a page at a time, optionally filtered by genre or borrowing member."""
+    show_pages(Pager(book_rows(genre, member_id), lambda row: f"ISBN: {row[0]}: {row[1]}", page_size),
+               "Books in Library", "No books matched." if genre or member_id else "No books in the library.", out)
+
+
+def display_members(page_size=PAGE_SIZE, out=None):
+    """Shows the library members a page at a time."""
+    show_pages(Pager(members.values(), str, page_size), "Library Members", "No members in the library.", out)
+
 
+def display_summary(out=None):
+    """Shows one line of library totals, which costs the same however large the library is."""
+    summary = circulation_summary()
+    (out if out is not None else sys.stdout).write(
+        f"Library: {summary['titles']} titles, {summary['copies']} copies ({summary['on_loan']} on loan), "
+        f"{summary['members']} members.\n")
 
-def parse_input(prompt, expected_type=None):
+
+def parse_input(prompt, expected_type=None, optional=False):
     """
     This function asks the user for input and tries to convert it into the right type.
 
     - prompt: the message shown to the user
     - expected_type: if given, checks that the input is the right type (like str or int)
+    - optional: if True, a blank answer is accepted and returns None
 
     If the user makes a mistake, it tells them what kind of input is expected.
     Works for numbers, text, or other simple values.
     """
     while True:
         user_input = input(prompt).strip()
+        if optional and not user_input:
+            return None
         try:
             value = ast.literal_eval(user_input)
         except (ValueError, SyntaxError):
@@ -51,6 +137,91 @@ def parse_input(prompt, expected_type=None):
         return value
 
 
+# A batch line field: a double- or single-quoted string, or a run of non-space characters
+_FIELD_PATTERN = re.compile(r'"([^"]*)"|\'([^\']*)\'|(\S+)')
+# Number of required arguments and argument types of the operations available in batch mode;
+# the optional trailing arguments may be omitted
+BATCH_COMMANDS = {
+    "add_book": (5, (str, str, str, str, int)),
+    "add_member": (3, (str, str, str)),
+    "update_book": (1, (str, str, str, str, int)),
+    "update_member": (1, (str, str, str)),
+    "delete_book": (1, (str,)),
+    "delete_member": (1, (str,)),
+    "borrow_book": (2, (str, str)),
+    "return_book": (2, (str, str)),
+    "place_hold": (2, (str, str, int, float)),
+    "cancel_hold": (2, (str, str)),
+    "find_books": (1, (str, str)),
+}
+
+
+def parse_command(line):
+    """
+    Parses one batch line, "operation arg ...", into (operation, args). Arguments are
+    separated by spaces, quoted when they contain spaces, and converted to the types
+    in BATCH_COMMANDS; "-" stands for None (e.g. a field update_book leaves
+    unchanged). Raises ValueError for malformed lines, including lines with fewer
+    arguments than the operation requires.
+    """
+    # Only lines with quotes need the regular expression
+    if '"' in line or "'" in line:
+        fields = [double or single or bare for double, single, bare in _FIELD_PATTERN.findall(line)]
+    else:
+        fields = line.split()
+    command = BATCH_COMMANDS.get(fields[0])
+    if command is None:
+        raise ValueError(f"unknown operation {fields[0]!r}")
+    required, types = command
+    if len(fields) - 1 > len(types):
+        raise ValueError(f"{fields[0]} takes at most {len(types)} arguments")
+    if len(fields) - 1 < required:
+        raise ValueError(f"{fields[0]} takes at least {required} arguments")
+    return fields[0], [None if field == "-" else kind(field) for kind, field in zip(types, fields[1:])]
+
+
+def run_batch(lines, out=None, failures_only=False):
+    """
+    Runs one operation per line (see parse_command), skipping blank lines and lines
+    starting with "#", and writes one result line per command, or only the failed
+    ones with failures_only, followed by the totals. A line that cannot be parsed
+    counts as failed and the batch continues. Returns the totals as a dictionary.
+    """
+    out = out if out is not None else sys.stdout
+    report = []
+    succeeded = failed = 0
+    started = time.perf_counter()
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            operation, args = parse_command(line)
+        except ValueError as error:
+            failed += 1
+            report.append(f"{number}: {line} -> error: {error}")
+            continue
+        result = getattr(operations, operation)(*args)
+        if result is False:
+            failed += 1
+        else:
+            succeeded += 1
+            if failures_only:
+                continue
+        report.append(f"{number}: {line} -> {result}")
+        if len(report) >= 1000:
+            out.write("\n".join(report) + "\n")
+            report.clear()
+    seconds = time.perf_counter() - started
+    commands = succeeded + failed
+    totals = {"commands": commands, "succeeded": succeeded, "failed": failed, "seconds": seconds,
+              "ops_per_sec": commands / seconds if seconds else 0.0}
+    report.append(f"{commands} commands, {succeeded} succeeded, {failed} failed in {seconds:.3f}s "
+                  f"({totals['ops_per_sec']:.0f} ops/sec)")
+    out.write("\n".join(report) + "\n")
+    return totals
+
+
 def main_menu():
     """The main menu that shows all options and handles user choices."""
     while True:
@@ -64,9 +235,11 @@ def main_menu():
         print("7. Delete Member")
         print("8. Borrow Book")
         print("9. Return Book")
+        print("10. Browse Books")
+        print("11. Browse Members")
         print("0. Exit")
 
-        choice = input("Select an option (0-9): ").strip()
+        choice = input("Select an option (0-11): ").strip()
 
         if choice == "1":
             print("\n--- Add Book ---")
@@ -83,8 +256,7 @@ def main_menu():
             else:
                 print("Failed to add book. Check inputs, genre validity, or duplicate ISBN.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "2":
             print("\n--- Add Member ---")
@@ -98,8 +270,7 @@ def main_menu():
             else:
                 print("Failed to add member. Check inputs, email format, or duplicate Member ID.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "3":
             print("\n--- Search Books ---")
@@ -109,11 +280,10 @@ def main_menu():
             if by not in ["title", "author"]:
                 by = "title"
 
-            found = search_books(query, by)
-            print("Book(s) found!" if found else "No books matched your search.")
+            found = find_books(query, by)
+            print(f"Book(s) found: {', '.join(found)}" if found else "No books matched your search.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "4":
             print("\n--- Update Book ---")
@@ -134,8 +304,7 @@ def main_menu():
             else:
                 print("Failed to update book. Check ISBN, genre validity, or inputs.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "5":
             print("\n--- Update Member ---")
@@ -152,8 +321,7 @@ def main_menu():
             else:
                 print("Failed to update member. Check Member ID or email format.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "6":
             print("\n--- Delete Book ---")
@@ -165,8 +333,7 @@ def main_menu():
             else:
                 print("Failed to delete book. It may have borrowed copies or invalid ISBN.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "7":
             print("\n--- Delete Member ---")
@@ -178,8 +345,7 @@ def main_menu():
             else:
                 print("Failed to delete member. They may have borrowed books or invalid ID.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "8":
             print("\n--- Borrow Book ---")
@@ -193,8 +359,7 @@ def main_menu():
             else:
                 print("Failed to borrow book. Check availability, member ID, or borrowing limits.")
 
-            display_books()
-            display_members()
+            display_summary()
 
         elif choice == "9":
             print("\n--- Return Book ---")
@@ -207,7 +372,18 @@ def main_menu():
             else:
                 print("Failed to return book. Check if the member borrowed it.")
 
-            display_books()
+            display_summary()
+
+        elif choice == "10":
+            print("\n--- Browse Books ---")
+            print(f"Guideline: Filters are optional strings in quotes. Genre must be one of {genres}. "
+                  f"Leave blank to show every book.")
+            genre = parse_input("Genre (string, leave blank for all): ", expected_type=str, optional=True)
+            member_id = parse_input("Borrowed by Member ID (string, leave blank for all): ", expected_type=str,
+                                    optional=True)
+            display_books(genre, member_id)
+
+        elif choice == "11":
             display_members()
 
         elif choice == "0":
@@ -215,8 +391,22 @@ def main_menu():
             break
 
         else:
-            print("Invalid option. Please select a number between 0 and 9.")
+            print("Invalid option. Please select a number between 0 and 11.")
 
 
 if __name__ == "__main__":
-    main_menu()
+    parser = argparse.ArgumentParser(description="Run the library interactively, or run a file of commands.")
+    parser.add_argument("--batch", metavar="FILE", help="file of commands, one per line, or - for stdin")
+    parser.add_argument("--failures-only", action="store_true", help="in batch mode, report only failed commands")
+    parser.add_argument("--store", help="storage directory to load from and journal changes to")
+    arguments = parser.parse_args()
+
+    if arguments.store:
+        storage.open_store(arguments.store)
+    if arguments.batch == "-":
+        run_batch(sys.stdin, failures_only=arguments.failures_only)
+    elif arguments.batch:
+        with open(arguments.batch) as commands:
+            run_batch(commands, failures_only=arguments.failures_only)
+    else:
+        main_menu()
@@ -0,0 +1,270 @@
+import asyncio
+import collections
+import itertools
+import sys
+import threading
+import time
+
+import benchmarks
+import operations
+from records import Record
+
+# Operations whose first argument, or first item of each batch entry, is an ISBN or a member ID
+_BOOK_OPERATIONS = ("add_book", "update_book", "delete_book")
+_MEMBER_OPERATIONS = ("add_member", "update_member", "delete_member")
+_LOAN_OPERATIONS = ("borrow_book", "return_book")
+_HOLD_OPERATIONS = ("place_hold", "cancel_hold")
+_BATCH_OPERATIONS = {"add_books_bulk": "add_book", "add_members_bulk": "add_member",
+                     "borrow_many": "borrow_book", "return_many": "return_book"}
+
+
+class EventsLost(Exception):
+    """Raised when a subscriber resumes from a sequence number the bus no longer retains."""
+
+
+class Event(Record):
+    """
+    One successful mutation: the operation and its arguments, plus the state after it
+    of every book, member and hold queue it changed. Deleted books and members map to
+    None, so consumers can apply events as upserts and deletes without re-reading.
+    """
+
+    __slots__ = ("sequence", "operation", "args", "kwargs", "time", "books", "members", "holds")
+
+    def __init__(self, sequence, operation, args, kwargs, time, books, members, holds):
+        self.sequence = sequence
+        self.operation = operation
+        self.args = args
+        self.kwargs = kwargs
+        self.time = time
+        self.books = books  # ISBN -> book dict, or None if deleted
+        self.members = members  # member ID -> member dict, or None if deleted
+        self.holds = holds  # ISBN -> member IDs waiting, in queue order
+
+
+def _changed_keys(operation, args, kwargs):
+    """Returns the ISBNs and member IDs an operation may have changed, and the ISBNs whose holds changed."""
+    isbns = set()
+    member_ids = set()
+    hold_isbns = set()
+    if operation in _BATCH_OPERATIONS:
+        calls = [(_BATCH_OPERATIONS[operation], entry) for entry in args[0]]
+    elif operation == "apply_batch":
+        calls = args[0]
+    else:
+        names = ("isbn", "member_id") if operation not in _MEMBER_OPERATIONS else ("member_id",)
+        calls = [(operation, args + tuple(kwargs[name] for name in names[len(args):] if name in kwargs))]
+    for name, call_args in calls:
+        if not call_args:
+            continue
+        if name in _MEMBER_OPERATIONS:
+            member_ids.add(call_args[0])
+            # Deleting a member drops its holds, which the bus cannot see afterwards
+            continue
+        isbns.add(call_args[0])
+        if name in _LOAN_OPERATIONS or name in _HOLD_OPERATIONS:
+            member_ids.update(call_args[1:2])
+        if name in ("return_book", "delete_book") or name in _HOLD_OPERATIONS:
+            # A return may lend the copy to members waiting on a hold; a delete drops the book's holds
+            hold_isbns.add(call_args[0])
+            member_ids.update(operations.current_borrowers(call_args[0]))
+    return isbns, member_ids, hold_isbns
+
+
+class Subscription:
+    """
+    A consumer's position in the bus, read in batches. Events are not copied per
+    subscriber: each subscription reads the bus's retained events after its position,
+    so a subscriber that fell behind catches up by itself and keeps the original order.
+    """
+
+    def __init__(self, bus, after, capacity):
+        self.bus = bus
+        self.capacity = capacity  # Unread events allowed before publishers are held back
+        self.position = after  # Sequence number of the last event handed to the consumer
+        self.lagging = False  # Held a publisher back for block_timeout; not waited on until it reads again
+        self.closed = False
+
+    def lag(self):
+        """Returns the number of published events not yet read."""
+        return self.bus.sequence - self.position
+
+    def get_batch(self, max_events=256, timeout=None):
+        """
+        Returns up to max_events events after the last one returned, oldest first,
+        waiting up to timeout seconds (forever for None) for the first one. Returns
+        an empty list on timeout or once closed. Raises EventsLost if the subscriber
+        fell further behind than the bus retains.
+        """
+        bus = self.bus
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with bus.condition:
+            while bus.sequence == self.position and not self.closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                bus.condition.wait(remaining)
+            if self.closed:
+                return []
+            retained = bus.retained
+            oldest = bus.sequence - len(retained) + 1
+            if oldest > self.position + 1:
+                raise EventsLost(f"Events after {self.position} are no longer retained (oldest is {oldest})")
+            # Retained events are consecutive, so the next one is found by its offset
+            start = self.position + 1 - oldest
+            batch = list(itertools.islice(retained, start, start + max_events))
+            if not batch:
+                return batch  # max_events was not positive
+            self.position = batch[-1].sequence
+            self.lagging = False
+            bus.condition.notify_all()  # Wake publishers waiting for room
+            return batch
+
+    async def get_batch_async(self, max_events=256, timeout=None):
+        """get_batch for asyncio consumers; waits in a worker thread, not on the event loop."""
+        return await asyncio.to_thread(self.get_batch, max_events, timeout)
+
+    def __iter__(self):
+        """Yields batches until the subscription is closed."""
+        while not self.closed:
+            batch = self.get_batch()
+            if batch:
+                yield batch
+
+    def close(self):
+        """Stops the subscription and wakes any reader waiting on it."""
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe bus of change events. As a mutation listener it turns
+    each successful mutation into an Event with the next sequence number. The last
+    retain events are kept in a bounded buffer that subscribers read from, so they
+    can also resume from a sequence number, e.g. after a restart.
+    When a subscriber has capacity unread events, publishers wait up to block_timeout
+    seconds for it to read some (backpressure). After that the subscriber is marked
+    lagging and left to fall behind, without holding back later publishers until it
+    reads again; it loses events only once it is more than retain events behind.
+    Publishing runs on the mutating thread, inside threadsafe.py's locks, so
+    subscribers must not wait on library operations while publishers wait on them.
+    """
+
+    def __init__(self, retain=65_536, block_timeout=0.1):
+        self.retain = retain
+        self.block_timeout = block_timeout
+        self.sequence = 0  # Sequence number of the last published event
+        self.retained = collections.deque(maxlen=retain)
+        self.subscribers = []
+        self.condition = threading.Condition()
+        self.blocked_seconds = 0.0  # Time publishers spent waiting for slow subscribers
+
+    def attach(self):
+        """Starts publishing the mutations of the operations module."""
+        if self.publish not in operations.mutation_listeners:
+            operations.mutation_listeners.append(self.publish)
+
+    def detach(self):
+        """Stops publishing mutations."""
+        if self.publish in operations.mutation_listeners:
+            operations.mutation_listeners.remove(self.publish)
+
+    def publish(self, operation, args, kwargs):
+        """Mutation listener: publishes one event describing the change."""
+        isbns, member_ids, hold_isbns = _changed_keys(operation, args, kwargs)
+        # Read the changed records now, while the mutating thread still holds their locks
+        changed_books = {}
+        for isbn in isbns:
+            book = operations.books.get(isbn) if isinstance(isbn, str) else None
+            changed_books[isbn] = book.to_dict() if book is not None else None
+        changed_members = {}
+        for member_id in member_ids:
+            member = operations.members.get(member_id) if isinstance(member_id, str) else None
+            changed_members[member_id] = member.to_dict() if member is not None else None
+        changed_holds = {isbn: operations.hold_queue(isbn) for isbn in hold_isbns}
+        with self.condition:
+            if self.block_timeout and self._full():
+                started = time.monotonic()
+                if not self.condition.wait_for(lambda: not self._full(), self.block_timeout):
+                    for subscription in self.subscribers:
+                        if self.sequence - subscription.position >= subscription.capacity:
+                            subscription.lagging = True
+                self.blocked_seconds += time.monotonic() - started
+            self.sequence += 1
+            self.retained.append(Event(self.sequence, operation, args, kwargs, operations.clock(),
+                                       changed_books, changed_members, changed_holds))
+            self.condition.notify_all()
+
+    def _full(self):
+        return any(self.sequence - subscription.position >= subscription.capacity
+                   for subscription in self.subscribers if not subscription.lagging)
+
+    def subscribe(self, after=None, capacity=1024):
+        """
+        Returns a Subscription reading the events after sequence number after, or only
+        new events for None. Raises EventsLost if those events are no longer retained,
+        and ValueError if after is beyond the last published event.
+        """
+        with self.condition:
+            if after is not None and after > self.sequence:
+                raise ValueError(f"No event {after} has been published (the last is {self.sequence})")
+            if after is not None and after < self.sequence - len(self.retained):
+                raise EventsLost(f"Events after {after} are no longer retained")
+            subscription = Subscription(self, self.sequence if after is None else after, capacity)
+            self.subscribers.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        """Removes a subscription and wakes any reader waiting on it."""
+        with self.condition:
+            subscription.closed = True
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+            self.condition.notify_all()
+
+    def stats(self):
+        """Returns the last sequence number, events retained, time publishers were held back and subscriber lags."""
+        with self.condition:
+            return {"sequence": self.sequence, "retained": len(self.retained), "blocked_seconds": self.blocked_seconds,
+                    "lags": [subscription.lag() for subscription in self.subscribers]}
+
+
+def measure(count=100_000, batch=256):
+    """
+    Times count add_book calls with no listener and with a bus feeding one consumer
+    thread that reads batches of batch events. Returns the timings in seconds.
+    """
+    records = list(benchmarks.generate_books(count * 2))
+    operations.reset_library()
+    started = time.perf_counter()
+    for record in records[:count]:
+        operations.add_book(*record)
+    plain_seconds = time.perf_counter() - started
+
+    bus = EventBus()
+    bus.attach()
+    subscription = bus.subscribe()
+    consumed = []
+
+    def consume():
+        for events in subscription:
+            consumed.append(len(events))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    started = time.perf_counter()
+    for record in records[count:]:
+        operations.add_book(*record)
+    while sum(consumed) < count:
+        time.sleep(0.001)
+    published_seconds = time.perf_counter() - started
+    subscription.close()
+    consumer.join()
+    bus.detach()
+    return {"events": count, "plain_seconds": plain_seconds, "published_seconds": published_seconds,
+            "overhead_per_event": (published_seconds - plain_seconds) / count,
+            "mean_batch": count / len(consumed) if consumed else 0.0, "blocked_seconds": bus.blocked_seconds}
+
+
+if __name__ == "__main__":
+    print(measure(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
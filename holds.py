@@ -0,0 +1,96 @@
+import heapq
+import itertools
+
+from records import Hold
+
+
+class HoldQueues:
+    """
+    Per-ISBN reservation queues. Each queue is a heap ordered by priority (highest
+    first) and placement order, so the next hold is found in O(log n) when a copy is
+    returned. Cancelled and expired holds are discarded lazily when they surface.
+    """
+
+    def __init__(self):
+        self.queues = {}  # ISBN -> heap of (-priority, placement number, Hold)
+        self.active = {}  # (ISBN, member_id) -> Hold still waiting
+        self.by_member = {}  # member_id -> set of ISBNs the member is waiting for
+        self._order = itertools.count()
+
+    def clear(self):
+        """Removes every hold."""
+        self.queues.clear()
+        self.active.clear()
+        self.by_member.clear()
+
+    def place(self, isbn, member_id, priority, placed_at, expires_at):
+        """Queues a hold and returns it."""
+        hold = Hold(isbn, member_id, priority, placed_at, expires_at)
+        self.active[(isbn, member_id)] = hold
+        self.by_member.setdefault(member_id, set()).add(isbn)
+        heapq.heappush(self.queues.setdefault(isbn, []), (-priority, next(self._order), hold))
+        return hold
+
+    def get(self, isbn, member_id):
+        """Returns the waiting hold of the member on the book, or None."""
+        return self.active.get((isbn, member_id))
+
+    def cancel(self, isbn, member_id):
+        """Withdraws a hold. Returns the hold, or None if there was none."""
+        hold = self.active.pop((isbn, member_id), None)
+        if hold is None:
+            return None
+        waiting = self.by_member[member_id]
+        waiting.discard(isbn)
+        if not waiting:
+            del self.by_member[member_id]
+        return hold
+
+    def drop_book(self, isbn):
+        """Withdraws every hold on a book."""
+        for entry in self.queues.pop(isbn, ()):
+            self.cancel(isbn, entry[2].member_id)
+
+    def drop_member(self, member_id):
+        """Withdraws every hold of a member."""
+        for isbn in list(self.by_member.get(member_id, ())):
+            self.cancel(isbn, member_id)
+
+    def pop_next(self, isbn, now, eligible):
+        """
+        Removes and returns the first waiting, unexpired hold on the book whose member
+        passes eligible(member_id), or None. Expired holds met on the way are withdrawn;
+        ineligible ones keep their place in the queue.
+        """
+        queue = self.queues.get(isbn)
+        skipped = []
+        found = None
+        while queue:
+            entry = heapq.heappop(queue)
+            hold = entry[2]
+            if self.active.get((isbn, hold.member_id)) is not hold:
+                continue
+            if hold.expires_at is not None and hold.expires_at <= now:
+                self.cancel(isbn, hold.member_id)
+                continue
+            if eligible(hold.member_id):
+                found = hold
+                self.cancel(isbn, hold.member_id)
+                break
+            skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(queue, entry)
+        if queue is not None and not queue:
+            del self.queues[isbn]
+        return found
+
+    def waiting(self, isbn, now):
+        """Returns the unexpired holds on a book in the order they will be served."""
+        entries = sorted(self.queues.get(isbn, ()), key=lambda entry: entry[:2])
+        return [entry[2] for entry in entries
+                if self.active.get((isbn, entry[2].member_id)) is entry[2]
+                and (entry[2].expires_at is None or entry[2].expires_at > now)]
+
+    def all_holds(self):
+        """Returns every waiting hold, each queue in serving order, e.g. for snapshots."""
+        return [hold for isbn in list(self.queues) for hold in self.waiting(isbn, float("-inf"))]
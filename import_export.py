@@ -0,0 +1,194 @@
+import argparse
+import csv
+import json
+import time
+from itertools import islice
+
+import operations
+import storage
+
+# Columns of each record kind, in file order
+BOOK_FIELDS = ("isbn", "title", "author", "genre", "total_copies", "original_copies")
+MEMBER_FIELDS = ("member_id", "name", "email", "borrowed_books")
+
+
+def _file_format(path, fmt):
+    """Returns "csv" or "jsonl", taken from fmt or else from the file extension."""
+    fmt = fmt or path.rsplit(".", 1)[-1].lower()
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unsupported format {fmt!r}; use 'csv' or 'jsonl'")
+    return fmt
+
+
+def read_rows(path, fmt=None):
+    """
+    Yields (line_number, row) pairs from a CSV file with a header row or a JSONL file,
+    one row at a time. Rows are dicts; a JSONL line that does not hold a JSON object
+    is yielded as None so the caller can reject it.
+    """
+    fmt = _file_format(path, fmt)
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as source:
+        if fmt == "csv":
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else None
+
+
+def _book_record(row):
+    """
+    Converts a row into add_book arguments, or returns a reason string if it cannot.
+    Loans are not exported, so a row's original_copies, when present, is the number
+    of copies added; total_copies counts only the copies that were on the shelf.
+    """
+    try:
+        isbn, title, author, genre, total_copies = (row[field] for field in BOOK_FIELDS[:5])
+    except (KeyError, TypeError):
+        return "missing field"
+    field = "total_copies"
+    if row.get("original_copies") not in (None, ""):
+        field = "original_copies"
+        total_copies = row[field]
+    if isinstance(total_copies, str):
+        try:
+            total_copies = int(total_copies)
+        except ValueError:
+            return f"{field} is not an integer"
+    return isbn, title, author, genre, total_copies
+
+
+def _member_record(row):
+    """Converts a row into add_member arguments, or returns a reason string if it cannot."""
+    try:
+        return tuple(row[field] for field in MEMBER_FIELDS[:3])
+    except (KeyError, TypeError):
+        return "missing field"
+
+
+def _import(rows, convert, add_bulk, problem, duplicate, batch_size, on_reject):
+    """
+    Feeds converted rows to add_bulk in batches and returns the import report. A record
+    add_bulk rejects is reported with problem(*record), or duplicate if its fields are valid.
+    """
+    started = time.perf_counter()
+    report = {"rows": 0, "imported": 0, "rejected": 0}
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        report["rows"] += len(batch)
+        records = []
+        positions = []
+        for line_number, row in batch:
+            record = convert(row) if row is not None else "not a JSON object"
+            if isinstance(record, str):
+                report["rejected"] += 1
+                if on_reject is not None:
+                    on_reject(line_number, row, record)
+            else:
+                records.append(record)
+                positions.append((line_number, row))
+        for position, ((line_number, row), added) in enumerate(zip(positions, add_bulk(records))):
+            if added:
+                report["imported"] += 1
+            else:
+                report["rejected"] += 1
+                if on_reject is not None:
+                    on_reject(line_number, row, problem(*records[position]) or duplicate)
+    report["seconds"] = time.perf_counter() - started
+    report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+
+def import_books(path, fmt=None, batch_size=10_000, on_reject=None):
+    """
+    Streams books from a CSV or JSONL file into the library through add_books_bulk,
+    so every row gets the same validation as add_book. Each book is added with its
+    original_copies (all copies owned) when the row has one, since loans are not
+    imported, so exported books import back with their full stock.
+    Memory use is bounded by batch_size. on_reject(line_number, row, reason) is
+    called for each rejected row, with the reason add_book fails with (such as
+    "unknown_genre" or "duplicate_isbn") or why the row could not be converted.
+    Returns counts, elapsed seconds and rows per second.
+    """
+    return _import(read_rows(path, fmt), _book_record, operations.add_books_bulk, operations._book_problem,
+                   "duplicate_isbn", batch_size, on_reject)
+
+
+def import_members(path, fmt=None, batch_size=10_000, on_reject=None):
+    """
+    Streams members from a CSV or JSONL file into the library through add_members_bulk,
+    so every row gets the same validation as add_member. borrowed_books is ignored.
+    Behaves like import_books otherwise.
+    """
+    return _import(read_rows(path, fmt), _member_record, operations.add_members_bulk, operations._member_problem,
+                   "duplicate_member", batch_size, on_reject)
+
+
+def _export(path, fmt, fields, rows):
+    """Writes rows (tuples ordered like fields) one at a time and returns the report."""
+    fmt = _file_format(path, fmt)
+    started = time.perf_counter()
+    count = 0
+    with open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as target:
+        if fmt == "csv":
+            writer = csv.writer(target)
+            writer.writerow(fields)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                target.write(json.dumps(dict(zip(fields, row))) + "\n")
+                count += 1
+    seconds = time.perf_counter() - started
+    return {"rows": count, "seconds": seconds, "rows_per_second": count / seconds if seconds else 0.0}
+
+
+def export_books(path, fmt=None):
+    """Streams every book to a CSV or JSONL file. Returns the row count and throughput."""
+    rows = ((isbn, book.title, book.author, book.genre, book.total_copies, book.original_copies)
+            for isbn, book in operations.books.items())
+    return _export(path, fmt, BOOK_FIELDS, rows)
+
+
+def export_members(path, fmt=None):
+    """
+    Streams every member to a CSV or JSONL file. In CSV the borrowed ISBNs are joined
+    with ";". Returns the row count and throughput.
+    """
+    fmt = _file_format(path, fmt)
+    rows = ((member.member_id, member.name, member.email,
+             ";".join(member.borrowed_books) if fmt == "csv" else list(member.borrowed_books))
+            for member in operations.members.values())
+    return _export(path, fmt, MEMBER_FIELDS, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export library records as CSV or JSONL.")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("kind", choices=("books", "members"))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--store", help="storage directory to load from and journal imports to")
+    arguments = parser.parse_args()
+
+    if arguments.store:
+        storage.open_store(arguments.store)
+
+    if arguments.action == "import":
+        importer = import_books if arguments.kind == "books" else import_members
+        print(importer(arguments.path, arguments.format,
+                       on_reject=lambda line, row, reason: print(f"line {line}: {reason}: {row}")))
+    else:
+        exporter = export_books if arguments.kind == "books" else export_members
+        print(exporter(arguments.path, arguments.format))
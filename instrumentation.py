@@ -0,0 +1,207 @@
+import argparse
+import bisect
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+
+import operations
+
+# Public operations wrapped while instrumentation is enabled
+OPERATIONS = ("add_book", "add_member", "find_books", "fuzzy_find_books", "search_books", "browse_books", "update_book",
+              "update_member", "delete_book", "delete_member", "borrow_book", "return_book", "add_books_bulk",
+              "add_members_bulk", "borrow_many", "return_many", "current_borrowers", "member_loans", "overdue_loans",
+              "place_hold", "cancel_hold", "hold_queue", "circulation_summary", "genre_stats", "title_stats",
+              "apply_batch")
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 0.1, 1.0)
+
+_originals = {}  # operation name -> uninstrumented function, while enabled
+_profilers = {}  # operation name -> profiler attached with attach_profiler
+_metrics = {}  # operation name -> OperationMetrics
+_metrics_lock = threading.Lock()
+_state = threading.local()  # Per thread: failure reason of the running operation and its nesting depth
+
+
+class OperationMetrics:
+    """Call counts, failure reasons and a latency histogram for one operation."""
+
+    __slots__ = ("calls", "failures", "reasons", "buckets", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.reasons = {}  # failure reason -> count
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Non-cumulative counts per bucket
+        self.seconds = 0.0
+
+    def to_dict(self):
+        """Returns the metrics as a plain dictionary."""
+        return {"calls": self.calls, "failures": self.failures, "reasons": dict(self.reasons),
+                "buckets": list(self.buckets), "seconds": self.seconds}
+
+
+def _record_failure(reason):
+    _state.reason = reason
+
+
+def _instrument(name, func):
+    """Wraps one operation so each call is counted, timed and, if attached, profiled."""
+    metrics = _metrics.setdefault(name, OperationMetrics())
+    clock = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_state, "depth", 0):
+            # Operations calling other operations are counted as the outer call only
+            return func(*args, **kwargs)
+        profiler = _profilers.get(name)
+        _state.reason = None
+        if profiler is not None:
+            profiler.enable()
+        _state.depth = 1
+        started = clock()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            elapsed = clock() - started
+            _state.depth = 0
+            if profiler is not None:
+                profiler.disable()
+        reason = _state.reason
+        with _metrics_lock:
+            metrics.calls += 1
+            metrics.seconds += elapsed
+            metrics.buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            if result is False:
+                metrics.failures += 1
+                reason = reason or "unspecified"
+                metrics.reasons[reason] = metrics.reasons.get(reason, 0) + 1
+        return result
+
+    # operations.py calls borrow_book.__wrapped__ to skip journaling, so it must keep
+    # pointing at the undecorated function rather than at the mutation wrapper
+    wrapper.__wrapped__ = getattr(func, "__wrapped__", func)
+    return wrapper
+
+
+def enable():
+    """
+    Instruments every operation in OPERATIONS by replacing it on the operations module,
+    so callers that go through the module (threadsafe, service, storage and the CLIs)
+    are measured. Names bound earlier with "from operations import ..." are not.
+    Disabled, the operations run unwrapped, so instrumentation costs nothing.
+    """
+    if _originals:
+        return
+    operations.failure_hook = _record_failure
+    for name in OPERATIONS:
+        _originals[name] = getattr(operations, name)
+        setattr(operations, name, _instrument(name, _originals[name]))
+
+
+def disable():
+    """Restores the uninstrumented operations. Collected metrics are kept."""
+    for name, func in _originals.items():
+        setattr(operations, name, func)
+    _originals.clear()
+    operations.failure_hook = None
+
+
+def enabled():
+    """Returns True while the operations are instrumented."""
+    return bool(_originals)
+
+
+def reset():
+    """Discards every collected metric."""
+    with _metrics_lock:
+        for metrics in _metrics.values():
+            metrics.__init__()
+
+
+def metrics():
+    """Returns {operation: {"calls", "failures", "reasons", "buckets", "seconds"}} for called operations."""
+    with _metrics_lock:
+        return {name: metrics.to_dict() for name, metrics in _metrics.items() if metrics.calls}
+
+
+def attach_profiler(name, profiler=None):
+    """
+    Profiles every call of the named operation while instrumentation is enabled.
+    profiler is any object with enable() and disable() methods, such as a sampling
+    profiler adapter; by default a new cProfile.Profile is used. Returns the profiler.
+    cProfile only sees the thread that enabled it, so calls are profiled per thread.
+    """
+    if name not in OPERATIONS:
+        raise ValueError(f"Unknown operation {name!r}")
+    _profilers[name] = profiler = profiler if profiler is not None else cProfile.Profile()
+    return profiler
+
+
+def detach_profiler(name):
+    """Stops profiling the named operation and returns its profiler, or None."""
+    return _profilers.pop(name, None)
+
+
+def profile_report(profiler, limit=20):
+    """Returns the top limit functions of a cProfile profiler by cumulative time, as text."""
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def export_prometheus():
+    """Returns the collected metrics in the Prometheus text exposition format."""
+    snapshot = metrics()
+    lines = ["# HELP library_operation_calls_total Operation calls, successful or not.",
+             "# TYPE library_operation_calls_total counter"]
+    lines += [f'library_operation_calls_total{{operation="{name}"}} {values["calls"]}'
+              for name, values in snapshot.items()]
+    lines += ["# HELP library_operation_failures_total Operation calls that returned False, by reason.",
+              "# TYPE library_operation_failures_total counter"]
+    lines += [f'library_operation_failures_total{{operation="{name}",reason="{_label(reason)}"}} {count}'
+              for name, values in snapshot.items() for reason, count in sorted(values["reasons"].items())]
+    lines += ["# HELP library_operation_duration_seconds Operation latency.",
+              "# TYPE library_operation_duration_seconds histogram"]
+    for name, values in snapshot.items():
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), values["buckets"]):
+            cumulative += count
+            lines.append(f'library_operation_duration_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'library_operation_duration_seconds_sum{{operation="{name}"}} {values["seconds"]}')
+        lines.append(f'library_operation_duration_seconds_count{{operation="{name}"}} {values["calls"]}')
+    caches = operations.search_cache_stats()
+    for metric, key, help_text in (("hits", "hits", "Search result cache hits."),
+                                   ("misses", "misses", "Search result cache misses."),
+                                   ("evictions", "evictions", "Search results evicted to bound the cache."),
+                                   ("invalidations", "invalidations", "Search results dropped by catalog changes.")):
+        lines += [f"# HELP library_search_cache_{metric}_total {help_text}",
+                  f"# TYPE library_search_cache_{metric}_total counter"]
+        lines += [f'library_search_cache_{metric}_total{{field="{field}"}} {values[key]}'
+                  for field, values in caches.items()]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    import benchmarks
+
+    parser = argparse.ArgumentParser(description="Run the benchmarks instrumented and print the collected metrics.")
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--profile", help="operation to profile with cProfile")
+    arguments = parser.parse_args()
+
+    enable()
+    if arguments.profile:
+        attach_profiler(arguments.profile)
+    benchmarks.run_size(arguments.size, arguments.samples)
+    print(export_prometheus(), end="")
+    if arguments.profile:
+        print(profile_report(detach_profiler(arguments.profile)))
@@ -0,0 +1,98 @@
+import heapq
+import itertools
+
+from records import Loan
+
+# Default loan period in seconds (two weeks)
+LOAN_PERIOD = 14 * 24 * 60 * 60
+
+
+class LoanRegistry:
+    """
+    Active loans indexed both ways (ISBN -> borrowers and member -> loans), plus a
+    min-heap ordered by due time so overdue sweeps only pop expired loans.
+    Returned loans stay in the heap until they surface or the heap is compacted.
+    """
+
+    def __init__(self, loan_period=LOAN_PERIOD):
+        self.loan_period = loan_period
+        self.by_isbn = {}  # ISBN -> {member_id: Loan}
+        self.by_member = {}  # member_id -> {ISBN: Loan}
+        self.due_queue = []  # (due_at, tie breaker, Loan) heap, including returned loans
+        self.stale = 0  # Estimated number of heap entries whose loan was returned
+        self.count = 0  # Active loans
+        self._order = itertools.count()
+
+    def clear(self):
+        """Removes every loan."""
+        self.by_isbn.clear()
+        self.by_member.clear()
+        self.due_queue.clear()
+        self.stale = 0
+        self.count = 0
+
+    def open(self, isbn, member_id, borrowed_at, due_at=None):
+        """Records a new loan and returns it. due_at defaults to borrowed_at plus the loan period."""
+        if due_at is None:
+            due_at = borrowed_at + self.loan_period
+        self.close(isbn, member_id)
+        loan = Loan(isbn, member_id, borrowed_at, due_at)
+        self.by_isbn.setdefault(isbn, {})[member_id] = loan
+        self.by_member.setdefault(member_id, {})[isbn] = loan
+        heapq.heappush(self.due_queue, (due_at, next(self._order), loan))
+        self.count += 1
+        return loan
+
+    def close(self, isbn, member_id):
+        """Removes a loan when the book is returned. Returns the loan, or None if there was none."""
+        holders = self.by_isbn.get(isbn)
+        loan = holders.pop(member_id, None) if holders is not None else None
+        if loan is None:
+            return None
+        if not holders:
+            del self.by_isbn[isbn]
+        held = self.by_member[member_id]
+        del held[isbn]
+        if not held:
+            del self.by_member[member_id]
+        self.count -= 1
+        self.stale += 1
+        if self.stale > 1024 and self.stale > len(self.due_queue) // 2:
+            self._compact()
+        return loan
+
+    def get(self, isbn, member_id):
+        """Returns the active loan of the book by the member, or None."""
+        return self.by_member.get(member_id, {}).get(isbn)
+
+    def borrowers(self, isbn):
+        """Returns the member IDs currently holding a copy of the book, in borrow order."""
+        return list(self.by_isbn.get(isbn, ()))
+
+    def loans_of(self, member_id):
+        """Returns the member's active loans in borrow order."""
+        return list(self.by_member.get(member_id, {}).values())
+
+    def pop_overdue(self, now):
+        """
+        Removes and returns the active loans due before now, earliest first.
+        Each overdue loan is reported once; it stays active until the book is returned.
+        """
+        overdue = []
+        queue = self.due_queue
+        while queue and queue[0][0] < now:
+            loan = heapq.heappop(queue)[2]
+            if self.get(loan.isbn, loan.member_id) is loan:
+                overdue.append(loan)
+            else:
+                self.stale -= 1
+        return overdue
+
+    def __len__(self):
+        return self.count
+
+    def _compact(self):
+        active = {id(loan) for held in self.by_member.values() for loan in held.values()}
+        self.due_queue = [entry for entry in self.due_queue if id(entry[2]) in active]
+        heapq.heapify(self.due_queue)
+        self.stale = 0
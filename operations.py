@@ -1,85 +1,264 @@
+import functools
+import time
+
+from browse_index import BrowseIndex, key_isbn, title_key
+from holds import HoldQueues
+from loans import LoanRegistry
+from records import Book, Member
+from search_index import SearchIndex
+from stats import CirculationStats
+
 # Global data structures
 books = {}  # Stores books using ISBN as the key
-members = []  # List of dictionaries representing library members
+members = {}  # Stores members using member ID as the key (insertion ordered)
 genres = ("Fiction", "Non-Fiction", "Sci-Fi", "Mystery", "Biography")  # Predefined book categories
+title_index = SearchIndex()  # Substring index over book titles
+author_index = SearchIndex()  # Substring index over book authors
+browse_index = BrowseIndex()  # Title-ordered indexes of all books, by genre and by author
+loans = LoanRegistry()  # Active loans by ISBN and by member, with a due-date queue
+holds = HoldQueues()  # Reservation queues served by return_book
+stats = CirculationStats()  # Circulation counters read by the dashboard queries
+clock = time.time  # Source of loan timestamps; replaced while replaying a journal
+commit_version = 0  # Bumped before and after each apply_batch; odd while a batch is being applied
+generation = 0  # Bumped by every successful change and index rebuild; caches compare it to detect they are stale
+failure_hook = None  # Callable given the reason whenever an operation fails; set by instrumentation.py
+mutation_listeners = []  # Callables notified as listener(operation, args, kwargs) after each successful change
+# Listeners must be thread-safe: threadsafe.py runs operations on different books concurrently
 
-# Add Book
-def add_book(isbn, title, author, genre, total_copies):
+
+def _notify(operation, args, kwargs):
+    """Passes one successful change to every mutation listener."""
+    for listener in mutation_listeners:
+        listener(operation, args, kwargs)
+
+
+def _changed():
+    """Bumps the generation after a change made outside the _mutation decorator."""
+    global generation
+    generation += 1
+
+
+def _fail(reason):
+    """Reports why an operation failed to the failure hook, if any, and returns False."""
+    if failure_hook is not None:
+        failure_hook(reason)
+    return False
+
+
+def _mutation(func):
+    """Notifies the mutation listeners whenever the wrapped operation succeeds."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global generation
+        result = func(*args, **kwargs)
+        if result:
+            generation += 1
+            if mutation_listeners:
+                _notify(func.__name__, args, kwargs)
+        return result
+    return wrapper
+
+# Reset Library
+def reset_library():
     """
-    Registers a new book in the library inventory.
-    Ensures the ISBN is unique, the genre is recognized, and the total copies are valid.
-    Returns True if the book is successfully added, otherwise returns False.
+    Removes every book, member and hold and clears all derived indexes.
+    Mutation listeners stay registered.
+    """
+    books.clear()
+    members.clear()
+    holds.clear()
+    rebuild_indexes()
+
+# Rebuild Indexes
+def rebuild_indexes():
     """
+    Recomputes every derived index from the current books and members.
+    Used after loading state directly into the dictionaries, e.g. from a snapshot.
+    The search indexes are rebuilt lazily by the next search.
+    """
+    global generation
+    generation += 1
+    _reload_catalog_indexes()
+    # Borrow times are not kept on members, so rebuilt loans start now unless restored
+    loans.clear()
+    now = clock()
+    for member_id, member in members.items():
+        for isbn in member.borrowed_books:
+            loans.open(isbn, member_id, now)
+
+def _reload_catalog_indexes():
+    """Schedules the search and browse indexes and the statistics to be rebuilt lazily. Loans are left alone."""
+    title_index.load(lambda: ((isbn, book.title) for isbn, book in books.items()))
+    author_index.load(lambda: ((isbn, book.author) for isbn, book in books.items()))
+    browse_index.load(lambda: books.items())
+    stats.load(lambda: (book for _, book in books.items()), lambda: members.values())
+
+def _book_problem(isbn, title, author, genre, total_copies):
+    """Returns the reason add_book would reject the fields, without the duplicate check, or None."""
     if not isinstance(isbn, str):
-        return False
+        return "invalid_isbn"
     if not isinstance(title, str):
-        return False
+        return "invalid_title"
     if not isinstance(author, str):
-        return False
+        return "invalid_author"
     if not isinstance(genre, str):
-        return False
+        return "invalid_genre"
     if not isinstance(total_copies, int) or total_copies < 0:
-        return False
+        return "invalid_copies"
     if genre not in genres:
+        return "unknown_genre"
+    return None
+
+
+def _valid_book(isbn, title, author, genre, total_copies):
+    """Checks the field types and values accepted by add_book, without the duplicate check."""
+    problem = _book_problem(isbn, title, author, genre, total_copies)
+    return _fail(problem) if problem else True
+
+
+def _member_problem(member_id, name, email):
+    """Returns the reason add_member would reject the fields, without the duplicate check, or None."""
+    if not isinstance(member_id, str):
+        return "invalid_member_id"
+    if not isinstance(name, str) or len(name.strip()) == 0:
+        return "invalid_name"
+    if not isinstance(email, str) or "@" not in email or "." not in email:
+        return "invalid_email"
+    return None
+
+
+def _valid_member(member_id, name, email):
+    """Checks the field types and values accepted by add_member, without the duplicate check."""
+    problem = _member_problem(member_id, name, email)
+    return _fail(problem) if problem else True
+
+# Add Book
+@_mutation
+def add_book(isbn, title, author, genre, total_copies):
+    """
+    Registers a new book in the library inventory.
+    Ensures the ISBN is unique, the genre is recognized, and the total copies are valid.
+    Returns True if the book is successfully added, otherwise returns False.
+    """
+    if not _valid_book(isbn, title, author, genre, total_copies):
         return False
     if isbn in books:
-        return False
+        return _fail("duplicate_isbn")
 
-    books[isbn] = {
-        "title": title,
-        "author": author,
-        "genre": genre,
-        "total_copies": total_copies,
-        "original_copies": total_copies
-    }
+    _insert_book(isbn, title, author, genre, total_copies)
     return True
 
+
+def _insert_book(isbn, title, author, genre, total_copies):
+    """Stores a validated new book and indexes it."""
+    # Share the predefined genre string instead of storing a copy per book
+    book = books[isbn] = Book(title, author, genres[genres.index(genre)], total_copies, total_copies)
+    stats.add_book(book)
+    title_index.add(isbn, title)
+    author_index.add(isbn, author)
+    browse_index.add(isbn, title, author, book.genre)
+
 # Add Member
+@_mutation
 def add_member(member_id, name, email):
     """
     Enrolls a new member into the library system.
     Validates uniqueness of member ID and proper email formatting.
     Returns True upon successful addition, otherwise False.
     """
-    if not isinstance(member_id, str):
-        return False
-    if not isinstance(name, str) or len(name.strip()) == 0:
-        return False
-    if not isinstance(email, str) or "@" not in email or "." not in email:
+    if not _valid_member(member_id, name, email):
         return False
-    for member in members:
-        if member["member_id"] == member_id:
-            return False
-
-    members.append({
-        "member_id": member_id,
-        "name": name,
-        "email": email,
-        "borrowed_books": []
-    })
+    if member_id in members:
+        return _fail("duplicate_member")
+
+    _insert_member(member_id, name, email)
     return True
 
+
+def _insert_member(member_id, name, email):
+    """Stores a validated new member."""
+    member = members[member_id] = Member(member_id, name, email)
+    stats.add_member(member)
+
+# Find Books
+def find_books(query, by="title", offset=0, limit=None):
+    """
+    Performs a case-insensitive substring search for books by title or author.
+    Returns the matching ISBNs ranked by match position, sliced by offset and limit.
+    Returns an empty list for invalid arguments.
+    """
+    if not isinstance(query, str):
+        return []
+    if not isinstance(by, str):
+        return []
+    if not isinstance(offset, int) or offset < 0:
+        return []
+    if limit is not None and (not isinstance(limit, int) or limit < 0):
+        return []
+
+    index = author_index if by.lower() == "author" else title_index
+    return index.search(query, offset, limit)
+
+# Fuzzy Find Books
+def fuzzy_find_books(query, by="title", offset=0, limit=None, max_distance=None):
+    """
+    Typo-tolerant search for books by title or author: every word of the query must
+    be within max_distance edits of a word of the field (by default 0 edits for words
+    of up to 2 letters, 1 up to 5 letters, else 2).
+    Returns the matching ISBNs ranked by total edits, sliced by offset and limit.
+    Returns an empty list for invalid arguments.
+    """
+    if not isinstance(query, str):
+        return []
+    if not isinstance(by, str):
+        return []
+    if not isinstance(offset, int) or offset < 0:
+        return []
+    if limit is not None and (not isinstance(limit, int) or limit < 0):
+        return []
+    if max_distance is not None and (not isinstance(max_distance, int) or max_distance < 0):
+        return []
+
+    index = author_index if by.lower() == "author" else title_index
+    return index.fuzzy(query, max_distance, None if limit is None else offset + limit)[offset:]
+
 # Search Books
 def search_books(query, by="title"):
     """
     Performs a case-insensitive search for books by title or author.
     Returns True if at least one matching book is found, otherwise returns False.
     """
-    if not isinstance(query, str):
-        return False
-    if not isinstance(by, str):
-        return False
+    return len(find_books(query, by, limit=1)) > 0
 
-    for isbn, book in books.items():
-        if by.lower() == "author":
-            if query.lower() in book["author"].lower():
-                return True
-        else:
-            if query.lower() in book["title"].lower():
-                return True
-    return False
+# Browse Books
+def browse_books(genre=None, author=None, after=None, limit=20, descending=False):
+    """
+    Lists books in title order (then ISBN), optionally only one genre and/or one
+    author (case and spacing insensitive), a page of at most limit at a time.
+    after continues from the previous page: pass its last ISBN, or the (title, ISBN)
+    pair of that book, which stays valid even if the book is changed or deleted.
+    Each page costs O(log n + limit) through the browse index, whatever the offset.
+    Returns an empty list for invalid arguments or an unknown cursor ISBN.
+    """
+    if genre is not None and genre not in genres:
+        return []
+    if author is not None and not isinstance(author, str):
+        return []
+    if not isinstance(limit, int) or limit < 0:
+        return []
+    if isinstance(after, str):
+        after = browse_index.key(after)
+        if after is None:
+            return []
+    elif after is not None:
+        if (not isinstance(after, (tuple, list)) or len(after) != 2
+                or not all(isinstance(part, str) for part in after)):
+            return []
+        after = title_key(*after)
+    return [key_isbn(key) for key in browse_index.page(genre, author, after, limit, bool(descending))]
 
 # Update Book
+@_mutation
 def update_book(isbn, title=None, author=None, genre=None, total_copies=None):
     """
     Modifies details of an existing book in the library.
@@ -87,41 +266,51 @@ def update_book(isbn, title=None, author=None, genre=None, total_copies=None):
     Returns True immediately after updating a valid field, otherwise False.
     """
     if not isinstance(isbn, str) or isbn not in books:
-        return False
+        return _fail("unknown_book")
 
     book = books[isbn]
 
     if title is not None:
         if not isinstance(title, str):
-            return False
-        book["title"] = title
+            return _fail("invalid_title")
+        book.title = title
+        title_index.add(isbn, title)
+        browse_index.add(isbn, title, book.author, book.genre)
         return True
 
     if author is not None:
         if not isinstance(author, str):
-            return False
-        book["author"] = author
+            return _fail("invalid_author")
+        book.author = author
+        author_index.add(isbn, author)
+        browse_index.add(isbn, book.title, author, book.genre)
         return True
 
     if genre is not None:
         if not isinstance(genre, str) or genre not in genres:
-            return False
-        book["genre"] = genre
+            return _fail("invalid_genre")
+        stats.remove_book(book)
+        book.genre = genres[genres.index(genre)]
+        stats.add_book(book)
+        browse_index.add(isbn, book.title, book.author, book.genre)
         return True
 
     if total_copies is not None:
         if not isinstance(total_copies, int) or total_copies < 0:
-            return False
-        borrowed_count = book["original_copies"] - book["total_copies"]
+            return _fail("invalid_copies")
+        borrowed_count = book.original_copies - book.total_copies
         if total_copies < borrowed_count:
-            return False
-        book["total_copies"] = total_copies
-        book["original_copies"] = max(book.get("original_copies", total_copies), total_copies)
+            return _fail("copies_on_loan")
+        stats.remove_book(book)
+        book.total_copies = total_copies
+        book.original_copies = max(book.original_copies, total_copies)
+        stats.add_book(book)
         return True
 
-    return False
+    return _fail("nothing_to_update")
 
 # Update Member
+@_mutation
 def update_member(member_id, name=None, email=None):
     """
     Updates information of a library member.
@@ -129,102 +318,520 @@ def update_member(member_id, name=None, email=None):
     Returns True upon successful update, otherwise False.
     """
     if not isinstance(member_id, str):
-        return False
+        return _fail("invalid_member_id")
 
-    for member in members:
-        if member["member_id"] == member_id:
-            if name is not None:
-                if not isinstance(name, str) or len(name.strip()) == 0:
-                    return False
-                member["name"] = name
-                return True
-            if email is not None:
-                if not isinstance(email, str) or "@" not in email or "." not in email:
-                    return False
-                member["email"] = email
-                return True
-    return False
+    member = members.get(member_id)
+    if member is None:
+        return _fail("unknown_member")
+
+    if name is not None:
+        if not isinstance(name, str) or len(name.strip()) == 0:
+            return _fail("invalid_name")
+        member.name = name
+        return True
+    if email is not None:
+        if not isinstance(email, str) or "@" not in email or "." not in email:
+            return _fail("invalid_email")
+        member.email = email
+        return True
+    return _fail("nothing_to_update")
 
 # Delete Book
+@_mutation
 def delete_book(isbn):
     """
     Removes a book from the library inventory if no copies are borrowed.
     Returns True if deletion succeeds, otherwise False.
     """
     if not isinstance(isbn, str) or isbn not in books:
-        return False
+        return _fail("unknown_book")
 
     book = books[isbn]
-    borrowed_count = book["original_copies"] - book["total_copies"]
+    borrowed_count = book.original_copies - book.total_copies
     if borrowed_count > 0:
-        return False
+        return _fail("copies_on_loan")
 
     del books[isbn]
+    stats.remove_book(book)
+    holds.drop_book(isbn)
+    title_index.remove(isbn)
+    author_index.remove(isbn)
+    browse_index.remove(isbn)
     return True
 
 # Delete Member
+@_mutation
 def delete_member(member_id):
     """
     Deletes a library member if they have no borrowed books.
     Returns True if deletion succeeds, otherwise False.
     """
     if not isinstance(member_id, str):
-        return False
+        return _fail("invalid_member_id")
 
-    for member in members:
-        if member["member_id"] == member_id:
-            if len(member["borrowed_books"]) > 0:
-                return False
-            members.remove(member)
-            return True
-    return False
+    member = members.get(member_id)
+    if member is None:
+        return _fail("unknown_member")
+    if len(member.borrowed_books) > 0:
+        return _fail("books_on_loan")
+
+    del members[member_id]
+    stats.remove_member(member)
+    holds.drop_member(member_id)
+    return True
 
 # Borrow Book
+@_mutation
 def borrow_book(isbn, member_id):
     """
     Allows a member to borrow a book, adhering to availability and borrowing limits.
     Returns True if the book is successfully borrowed, otherwise False.
     """
     if not isinstance(isbn, str) or not isinstance(member_id, str):
-        return False
+        return _fail("invalid_arguments")
     if isbn not in books:
-        return False
+        return _fail("unknown_book")
 
     book = books[isbn]
-    if book["total_copies"] <= 0:
-        return False
+    if book.total_copies <= 0:
+        return _fail("no_copies_available")
 
-    for member in members:
-        if member["member_id"] == member_id:
-            if not isinstance(member["borrowed_books"], list):
-                return False
-            if len(member["borrowed_books"]) >= 3:
-                return False
-            if isbn in member["borrowed_books"]:
-                return False
-            member["borrowed_books"].append(isbn)
-            book["total_copies"] -= 1
-            return True
-    return False
+    member = members.get(member_id)
+    if member is None:
+        return _fail("unknown_member")
+    if not isinstance(member.borrowed_books, tuple):
+        return _fail("invalid_member_record")
+    if len(member.borrowed_books) >= 3:
+        return _fail("borrow_limit_reached")
+    if isbn in member.borrowed_books:
+        return _fail("already_borrowed")
+
+    stats.remove_book(book)
+    stats.remove_member(member)
+    member.borrowed_books += (isbn,)
+    book.total_copies -= 1
+    stats.add_book(book)
+    stats.add_member(member)
+    loans.open(isbn, member_id, clock())
+    return True
 
 # Return Book
+@_mutation
 def return_book(isbn, member_id):
     """
     Processes the return of a borrowed book by a member.
+    The copy goes straight to the next eligible member waiting on a hold, if any.
     Returns True if successful, otherwise False.
     """
-    if not isinstance(isbn, str) or not isinstance(member_id, str):
+    if not _return_copy(isbn, member_id):
         return False
+    _fulfill_holds(isbn)
+    return True
+
+
+def _return_copy(isbn, member_id):
+    """Puts a borrowed copy back on the shelf without serving holds."""
+    if not isinstance(isbn, str) or not isinstance(member_id, str):
+        return _fail("invalid_arguments")
     if isbn not in books:
-        return False
+        return _fail("unknown_book")
 
-    for member in members:
-        if member["member_id"] == member_id:
-            if not isinstance(member["borrowed_books"], list):
-                return False
-            if isbn not in member["borrowed_books"]:
-                return False
-            member["borrowed_books"].remove(isbn)
-            books[isbn]["total_copies"] += 1
-            return True
-    return False
+    member = members.get(member_id)
+    if member is None:
+        return _fail("unknown_member")
+    if not isinstance(member.borrowed_books, tuple):
+        return _fail("invalid_member_record")
+    if isbn not in member.borrowed_books:
+        return _fail("not_borrowed")
+
+    book = books[isbn]
+    stats.remove_book(book)
+    stats.remove_member(member)
+    member.borrowed_books = tuple(borrowed for borrowed in member.borrowed_books if borrowed != isbn)
+    book.total_copies += 1
+    stats.add_book(book)
+    stats.add_member(member)
+    loans.close(isbn, member_id)
+    return True
+
+
+def _fulfill_holds(isbn):
+    """Lends the copies on the shelf to the members waiting for the book, in queue order."""
+    book = books[isbn]
+    now = clock()
+
+    def eligible(member_id):
+        member = members.get(member_id)
+        return member is not None and len(member.borrowed_books) < 3 and isbn not in member.borrowed_books
+
+    while book.total_copies > 0:
+        hold = holds.pop_next(isbn, now, eligible)
+        if hold is None:
+            break
+        borrow_book.__wrapped__(isbn, hold.member_id)
+
+# Add Books Bulk
+def add_books_bulk(records, atomic=False):
+    """
+    Registers many books given as (isbn, title, author, genre, total_copies) tuples.
+    Each record is validated like add_book, and duplicates are detected both against the
+    inventory and within the batch. Returns a list with one True/False per record.
+    With atomic=True nothing is added unless every record is valid, and a single
+    True/False for the whole batch is returned instead.
+    """
+    records = [tuple(record) for record in records]
+    seen = set()
+    results = []
+    for record in records:
+        valid = len(record) == 5 and _valid_book(*record)
+        isbn = record[0] if valid else None
+        valid = valid and isbn not in books and isbn not in seen
+        if valid:
+            seen.add(isbn)
+        results.append(valid)
+    if atomic and not all(results):
+        return _fail("batch_rejected")
+
+    # Indexing a batch at least as large as the catalog one book at a time costs more
+    # than rebuilding the search indexes lazily afterwards
+    if len(seen) >= len(books):
+        _reload_catalog_indexes()
+    for record, valid in zip(records, results):
+        if valid:
+            _insert_book(*record)
+    if seen:
+        _changed()
+    if seen and mutation_listeners:
+        _notify("add_books_bulk", ([record for record, valid in zip(records, results) if valid],), {})
+    return True if atomic else results
+
+# Add Members Bulk
+def add_members_bulk(records, atomic=False):
+    """
+    Enrolls many members given as (member_id, name, email) tuples.
+    Each record is validated like add_member, and duplicate member IDs are detected both
+    against the registry and within the batch. Returns a list with one True/False per
+    record, or a single True/False for the whole batch with atomic=True.
+    """
+    records = [tuple(record) for record in records]
+    seen = set()
+    results = []
+    for record in records:
+        valid = len(record) == 3 and _valid_member(*record)
+        member_id = record[0] if valid else None
+        valid = valid and member_id not in members and member_id not in seen
+        if valid:
+            seen.add(member_id)
+        results.append(valid)
+    if atomic and not all(results):
+        return _fail("batch_rejected")
+
+    for record, valid in zip(records, results):
+        if valid:
+            _insert_member(*record)
+    if seen:
+        _changed()
+    if seen and mutation_listeners:
+        _notify("add_members_bulk", ([record for record, valid in zip(records, results) if valid],), {})
+    return True if atomic else results
+
+# Borrow Many
+def borrow_many(pairs, atomic=False):
+    """
+    Processes many (isbn, member_id) checkouts in order, applying the same rules as
+    borrow_book. Returns a list with one True/False per pair. With atomic=True the
+    checkouts already made are undone if any pair fails, and a single True/False
+    for the whole batch is returned instead.
+    """
+    return _circulate_many(pairs, atomic, "borrow_many", borrow_book.__wrapped__, _return_copy)
+
+# Return Many
+def return_many(pairs, atomic=False):
+    """
+    Processes many (isbn, member_id) returns in order, applying the same rules as
+    return_book; holds on the returned books are served after the batch. Returns a
+    list with one True/False per pair, or a single True/False for the whole batch
+    with atomic=True.
+    """
+    return _circulate_many(pairs, atomic, "return_many", _return_copy, borrow_book.__wrapped__)
+
+
+def _circulate_many(pairs, atomic, operation, apply, undo):
+    """Shared loop of borrow_many and return_many."""
+    pairs = [tuple(pair) for pair in pairs]
+    results = [False] * len(pairs)
+    applied = []  # (isbn, member_id, borrowed books and loan before the change) for rollback
+    for position, pair in enumerate(pairs):
+        if len(pair) != 2:
+            done = False
+        elif atomic:
+            member = members.get(pair[1]) if isinstance(pair[1], str) else None
+            before = member.borrowed_books if member is not None else None
+            loan = loans.get(*pair) if member is not None and isinstance(pair[0], str) else None
+            done = apply(*pair)
+            if done:
+                applied.append((pair[0], pair[1], before, loan))
+        else:
+            done = apply(*pair)
+        if done:
+            results[position] = True
+        elif atomic:
+            for isbn, member_id, previous, loan in reversed(applied):
+                undo(isbn, member_id)
+                members[member_id].borrowed_books = previous
+                if loan is not None:
+                    loans.open(isbn, member_id, loan.borrowed_at, loan.due_at)
+            return _fail("batch_rolled_back")
+
+    if operation == "return_many":
+        # Serve holds only once the whole batch has been applied, so rollbacks stay exact
+        for isbn in dict.fromkeys(pair[0] for pair, done in zip(pairs, results) if done):
+            _fulfill_holds(isbn)
+    if any(results):
+        _changed()
+    if mutation_listeners and any(results):
+        _notify(operation, ([pair for pair, done in zip(pairs, results) if done],), {})
+    return True if atomic else results
+
+# Current Borrowers
+def current_borrowers(isbn):
+    """
+    Lists the member IDs currently holding a copy of the book, in borrow order.
+    Returns an empty list for unknown or non-string ISBNs.
+    """
+    if not isinstance(isbn, str):
+        return []
+    return loans.borrowers(isbn)
+
+# Member Loans
+def member_loans(member_id):
+    """
+    Lists the member's active loans (ISBN, borrow time and due time) in borrow order.
+    Returns an empty list for unknown or non-string member IDs.
+    """
+    if not isinstance(member_id, str):
+        return []
+    return loans.loans_of(member_id)
+
+# Overdue Loans
+def overdue_loans(now=None):
+    """
+    Returns the loans that became overdue since the previous sweep, earliest due first.
+    Only expired loans are visited. now defaults to the current clock time.
+    """
+    return loans.pop_overdue(clock() if now is None else now)
+
+# Place Hold
+@_mutation
+def place_hold(isbn, member_id, priority=0, expires_in=None):
+    """
+    Queues a member for the next copy of a book that has none on the shelf.
+    Higher priorities are served first; expires_in (seconds) limits how long the hold waits.
+    Returns False if the book or member is unknown, copies are available, the member
+    already holds the book or a hold on it, or the arguments are invalid.
+    """
+    if not isinstance(isbn, str) or not isinstance(member_id, str):
+        return _fail("invalid_arguments")
+    if not isinstance(priority, int):
+        return _fail("invalid_priority")
+    if expires_in is not None and (not isinstance(expires_in, (int, float)) or expires_in <= 0):
+        return _fail("invalid_expiry")
+    book = books.get(isbn)
+    member = members.get(member_id)
+    if book is None or member is None:
+        return _fail("unknown_book_or_member")
+    if book.total_copies > 0:
+        return _fail("copies_available")
+    if isbn in member.borrowed_books or holds.get(isbn, member_id) is not None:
+        return _fail("already_on_hold")
+
+    now = clock()
+    holds.place(isbn, member_id, priority, now, None if expires_in is None else now + expires_in)
+    return True
+
+# Cancel Hold
+@_mutation
+def cancel_hold(isbn, member_id):
+    """
+    Withdraws a member's hold on a book.
+    Returns True if a hold was withdrawn, otherwise False.
+    """
+    if not isinstance(isbn, str) or not isinstance(member_id, str):
+        return _fail("invalid_arguments")
+    if holds.cancel(isbn, member_id) is None:
+        return _fail("no_hold")
+    return True
+
+# Hold Queue
+def hold_queue(isbn):
+    """
+    Lists the member IDs waiting for a book, in the order they will be served.
+    Returns an empty list for unknown or non-string ISBNs.
+    """
+    if not isinstance(isbn, str):
+        return []
+    return [hold.member_id for hold in holds.waiting(isbn, clock())]
+
+# Circulation Summary
+def circulation_summary():
+    """
+    Returns library-wide counters: titles, copies, copies on loan, utilization, titles
+    with no copy on the shelf, members and members at the borrowing limit.
+    Read from incrementally maintained totals, without scanning the catalog.
+    """
+    return stats.summary()
+
+# Genre Stats
+def genre_stats():
+    """Returns titles, copies, copies on loan and utilization per genre, without scanning the catalog."""
+    return stats.genre_stats()
+
+# Title Stats
+def title_stats(isbn):
+    """
+    Returns copies, copies on loan, utilization and waiting holds for one book,
+    or None for unknown ISBNs.
+    """
+    if not isinstance(isbn, str):
+        return None
+    book = books.get(isbn)
+    if book is None:
+        return None
+    on_loan = book.original_copies - book.total_copies
+    return {
+        "copies": book.original_copies,
+        "on_loan": on_loan,
+        "utilization": on_loan / book.original_copies if book.original_copies else 0.0,
+        "holds": len(holds.waiting(isbn, clock()))
+    }
+
+# Search Cache Stats
+def search_cache_stats():
+    """Returns the hit, miss, eviction and invalidation counts of the title and author result caches."""
+    return {"title": title_index.cache_stats(), "author": author_index.cache_stats()}
+
+# Apply Batch
+# Operations that can be grouped into one atomic batch
+BATCH_OPERATIONS = ("add_book", "add_member", "update_book", "update_member", "delete_book", "delete_member",
+                    "borrow_book", "return_book", "place_hold", "cancel_hold")
+
+
+def apply_batch(calls):
+    """
+    Applies (operation name, args) calls in order as one atomic change: if any call
+    fails, every change made by the batch is undone and False is returned.
+    The records the batch touches are replaced by copies before they change
+    (copy-on-write), so a record read before the batch never changes under its reader.
+    commit_version is odd while the batch runs, so readers can detect a batch that
+    overlapped their reads and retry (see transactions.read).
+    Listeners are notified once, with the whole batch.
+    """
+    global commit_version
+    try:
+        calls = [(name, tuple(args)) for name, args in calls]
+    except (TypeError, ValueError):
+        return _fail("invalid_arguments")
+    if any(name not in BATCH_OPERATIONS for name, _ in calls):
+        return _fail("invalid_arguments")
+
+    isbns = set()
+    member_ids = set()
+    for name, args in calls:
+        if not args:
+            continue
+        if name in ("add_member", "update_member", "delete_member"):
+            member_ids.add(args[0])
+        else:
+            isbns.add(args[0])
+            if len(args) > 1 and name in ("borrow_book", "return_book", "place_hold", "cancel_hold"):
+                member_ids.add(args[1])
+    isbns = {isbn for isbn in isbns if isinstance(isbn, str)}
+    member_ids = {member_id for member_id in member_ids if isinstance(member_id, str)}
+    # Returns may lend the copy to a waiting member, and deleting a member drops its holds
+    for isbn in list(isbns):
+        member_ids.update(hold_queue(isbn))
+    for member_id in member_ids:
+        isbns.update(holds.by_member.get(member_id, ()))
+
+    savepoint = _savepoint(isbns, member_ids)
+    commit_version += 1
+    try:
+        for name, args in calls:
+            if not globals()[name].__wrapped__(*args):
+                _restore(savepoint)
+                return _fail("batch_rolled_back")
+    except BaseException:
+        _restore(savepoint)
+        raise
+    finally:
+        commit_version += 1
+    _changed()
+    if mutation_listeners:
+        # The list built above, since calls may have been a generator that is now used up
+        _notify("apply_batch", (calls,), {})
+    return True
+
+
+def _savepoint(isbns, member_ids):
+    """
+    Saves the books, members, loans and holds of the given keys, and puts copies of
+    the records in their place so the batch changes the copies only.
+    """
+    saved_books = {isbn: books.get(isbn) for isbn in isbns}
+    saved_members = {member_id: members.get(member_id) for member_id in member_ids}
+    for isbn, book in saved_books.items():
+        if book is not None:
+            books[isbn] = Book(book.title, book.author, book.genre, book.total_copies, book.original_copies)
+    for member_id, member in saved_members.items():
+        if member is not None:
+            members[member_id] = Member(member_id, member.name, member.email, member.borrowed_books)
+    saved_loans = {(loan.isbn, loan.member_id): loan for isbn in isbns for loan in loans.by_isbn.get(isbn, {}).values()}
+    saved_loans.update(((loan.isbn, loan.member_id), loan) for member_id in member_ids
+                       for loan in loans.loans_of(member_id))
+    saved_holds = {isbn: holds.waiting(isbn, float("-inf")) for isbn in isbns}
+    return saved_books, saved_members, list(saved_loans.values()), saved_holds
+
+
+def _restore(savepoint):
+    """Puts back everything saved by _savepoint, along with the indexes and counters."""
+    saved_books, saved_members, saved_loans, saved_holds = savepoint
+    for isbn, book in saved_books.items():
+        current = books.get(isbn)
+        if current is not None:
+            stats.remove_book(current)
+        if book is None:
+            if current is not None:
+                del books[isbn]
+            title_index.remove(isbn)
+            author_index.remove(isbn)
+            browse_index.remove(isbn)
+        else:
+            books[isbn] = book
+            stats.add_book(book)
+            title_index.add(isbn, book.title)
+            author_index.add(isbn, book.author)
+            browse_index.add(isbn, book.title, book.author, book.genre)
+    for member_id, member in saved_members.items():
+        current = members.get(member_id)
+        if current is not None:
+            stats.remove_member(current)
+        if member is None:
+            if current is not None:
+                del members[member_id]
+        else:
+            members[member_id] = member
+            stats.add_member(member)
+
+    for isbn in saved_books:
+        for member_id in loans.borrowers(isbn):
+            loans.close(isbn, member_id)
+    for member_id in saved_members:
+        for loan in loans.loans_of(member_id):
+            loans.close(loan.isbn, member_id)
+    for loan in saved_loans:
+        loans.open(loan.isbn, loan.member_id, loan.borrowed_at, loan.due_at)
+
+    for isbn, waiting in saved_holds.items():
+        holds.drop_book(isbn)
+        for hold in waiting:
+            holds.place(isbn, hold.member_id, hold.priority, hold.placed_at, hold.expires_at)
@@ -0,0 +1,180 @@
+import sys
+import tracemalloc
+
+
+class Record:
+    """
+    Base class for the compact records stored in operations.books and operations.members.
+    Fields live in __slots__ instead of a per-record dict, while item access
+    (record["title"], record.get(...), dict(record)) keeps working like the dicts
+    these records replace.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def get(self, key, default=None):
+        """Returns the field value, or default for unknown fields."""
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        """Returns the field names in declaration order."""
+        return self.__slots__
+
+    def to_dict(self):
+        """Returns the record as a plain dictionary, e.g. for JSON serialization."""
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class Book(Record):
+    """A book in the inventory. total_copies counts the copies currently on the shelf."""
+
+    __slots__ = ("title", "author", "genre", "total_copies", "original_copies")
+
+    def __init__(self, title, author, genre, total_copies, original_copies):
+        self.title = title
+        self.author = author
+        self.genre = genre
+        self.total_copies = total_copies
+        self.original_copies = original_copies
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a book from its dictionary form."""
+        return cls(data["title"], data["author"], data["genre"], data["total_copies"], data["original_copies"])
+
+
+class Member(Record):
+    """
+    A library member. borrowed_books is a tuple of at most three ISBNs, which avoids
+    the per-member list and its over-allocation; members with no loans share the
+    empty tuple.
+    """
+
+    __slots__ = ("member_id", "name", "email", "borrowed_books")
+
+    def __init__(self, member_id, name, email, borrowed_books=()):
+        self.member_id = member_id
+        self.name = name
+        self.email = email
+        self.borrowed_books = borrowed_books
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a member from its dictionary form."""
+        return cls(data["member_id"], data["name"], data["email"], tuple(data["borrowed_books"]))
+
+
+class Loan(Record):
+    """One copy of a book held by a member, with the borrow and due times (epoch seconds)."""
+
+    __slots__ = ("isbn", "member_id", "borrowed_at", "due_at")
+
+    def __init__(self, isbn, member_id, borrowed_at, due_at):
+        self.isbn = isbn
+        self.member_id = member_id
+        self.borrowed_at = borrowed_at
+        self.due_at = due_at
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a loan from its dictionary form."""
+        return cls(data["isbn"], data["member_id"], data["borrowed_at"], data["due_at"])
+
+
+class Hold(Record):
+    """
+    A member waiting for a copy of a book. Higher priorities are served first, ties in
+    placement order. expires_at is None for holds that never expire.
+    """
+
+    __slots__ = ("isbn", "member_id", "priority", "placed_at", "expires_at")
+
+    def __init__(self, isbn, member_id, priority, placed_at, expires_at):
+        self.isbn = isbn
+        self.member_id = member_id
+        self.priority = priority
+        self.placed_at = placed_at
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a hold from its dictionary form."""
+        return cls(data["isbn"], data["member_id"], data["priority"], data["placed_at"], data["expires_at"])
+
+
+def _traced_size(build, rows):
+    """Returns the bytes allocated by building one object per row."""
+    built = [None] * len(rows)
+    tracemalloc.start()
+    for position, row in enumerate(rows):
+        built[position] = build(*row)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used
+
+
+def measure_memory(count=100_000):
+    """
+    Compares the memory taken by count books and count members stored as plain dicts
+    against the same data stored as records. Members hold 0 to 3 loans. The strings
+    are created up front and shared by both layouts, so the figures are the
+    per-record container overhead. Returns bytes per record and the reduction factors.
+    """
+    genres = ("Fiction", "Non-Fiction", "Sci-Fi", "Mystery", "Biography")
+    book_rows = [(f"Title {number}", f"Author {number}", genres[number % len(genres)], 3, 3)
+                 for number in range(count)]
+    member_rows = [(f"M{number:07d}", f"Member {number}", f"member{number}@example.com",
+                    [f"B{number + loan:07d}" for loan in range(number % 4)]) for number in range(count)]
+
+    book_dict = _traced_size(lambda title, author, genre, total, original: {
+        "title": title, "author": author, "genre": genre, "total_copies": total, "original_copies": original
+    }, book_rows) / count
+    book_record = _traced_size(Book, book_rows) / count
+    member_dict = _traced_size(lambda member_id, name, email, borrowed: {
+        "member_id": member_id, "name": name, "email": email, "borrowed_books": list(borrowed)
+    }, member_rows) / count
+    member_record = _traced_size(lambda member_id, name, email, borrowed: Member(
+        member_id, name, email, tuple(borrowed)
+    ), member_rows) / count
+    return {
+        "book_dict_bytes": book_dict,
+        "book_record_bytes": book_record,
+        "book_reduction": book_dict / book_record,
+        "member_dict_bytes": member_dict,
+        "member_record_bytes": member_record,
+        "member_reduction": member_dict / member_record
+    }
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(measure_memory(total))
@@ -0,0 +1,335 @@
+import heapq
+import re
+from collections import OrderedDict
+
+# Splits text into lowercase word tokens
+_TOKEN_PATTERN = re.compile(r"\w+")
+# Default number of query results kept by each index's LRU cache
+CACHE_SIZE = 1024
+# Default bound on the ISBNs held across all cached results, so broad queries cannot
+# take unbounded memory; a single larger result is not cached
+CACHE_MAX_RESULTS = 500_000
+# Changed texts remembered for checking cached results; entries older than the log are recomputed
+CHANGE_LOG_SIZE = 4096
+
+
+def tokenize(text):
+    """Returns the distinct lowercase word tokens found in the text."""
+    return set(_TOKEN_PATTERN.findall(text.lower()))
+
+
+def trigrams(token):
+    """Returns the distinct three-character grams of a token padded with "$" at both ends."""
+    padded = f"${token}$"
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def edit_distance(first, second, limit):
+    """
+    Returns the Levenshtein distance between two strings, or limit + 1 as soon as it
+    is known to exceed limit, so distant pairs cost little.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for row, char in enumerate(first, start=1):
+        current = [row]
+        for column, other in enumerate(second, start=1):
+            current.append(min(previous[column] + 1, current[column - 1] + 1,
+                               previous[column - 1] + (char != other)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def typo_budget(token):
+    """Returns the default number of edits tolerated in a query token of this length."""
+    if len(token) <= 2:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+
+class SearchIndex:
+    """
+    Incrementally maintained substring index over one text field of the catalog.
+    Keeps token postings (token -> ISBNs) and a suffix trie over the distinct tokens,
+    so a query only touches the tokens that can contain it instead of every book.
+    Ranked results are kept in an LRU cache keyed on the lowercased query. A change
+    to a book's text can only alter the results of queries that its old or new text
+    contains, so changes are logged and a cached entry is dropped only if one of the
+    texts changed since it was last checked contains its query. The check happens on
+    the entry's next hit, which keeps writes O(1).
+    """
+
+    def __init__(self, cache_size=CACHE_SIZE, cache_max_results=CACHE_MAX_RESULTS):
+        self.texts = {}  # ISBN -> lowercased field value
+        self.postings = {}  # token -> set of ISBNs whose field contains the token
+        self.trie = {}  # suffix trie: char -> child node, None -> tokens ending a suffix here
+        self.trigrams = None  # trigram -> tokens containing it; built by the first fuzzy search
+        self.pending = None  # Callable producing (ISBN, text) pairs still to be indexed
+        self.cache_size = cache_size
+        self.cache_max_results = cache_max_results
+        self.cached_results = 0  # ISBNs held across all cached results
+        self.cache = OrderedDict()  # lowercased query -> (change log position checked, ranked keys), oldest first
+        self.changes = []  # Old and new lowercased texts of changed books, oldest first
+        self.changes_start = 0  # Log position of changes[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # Entries dropped to stay within cache_size
+        self.invalidations = 0  # Entries dropped because a change could alter their results
+
+    def clear(self):
+        """Removes every book from the index."""
+        self.texts.clear()
+        self.postings.clear()
+        self.trie.clear()
+        self.trigrams = None
+        self.pending = None
+        self.invalidations += len(self.cache)
+        self.cache.clear()
+        self.changes.clear()
+        self.cached_results = 0
+
+    def load(self, source):
+        """
+        Replaces the index contents with the (ISBN, text) pairs returned by source().
+        Indexing is deferred until the next search, so source must read the live
+        catalog; add and remove calls made in the meantime are already reflected there.
+        """
+        self.clear()
+        self.pending = source
+
+    def add(self, isbn, text):
+        """Indexes the field value of a book, replacing any previous value."""
+        if self.pending is not None:
+            return
+        if isbn in self.texts:
+            self.remove(isbn)
+        lowered = text.lower()
+        self.texts[isbn] = lowered
+        for token in tokenize(lowered):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = set()
+                self._insert_token(token)
+            posting.add(isbn)
+        if self.cache:
+            self._log_change(lowered)
+
+    def remove(self, isbn):
+        """Drops a book from the index. Unknown ISBNs are ignored."""
+        if self.pending is not None:
+            return
+        lowered = self.texts.pop(isbn, None)
+        if lowered is None:
+            return
+        for token in tokenize(lowered):
+            posting = self.postings[token]
+            posting.discard(isbn)
+            if not posting:
+                del self.postings[token]
+                self._remove_token(token)
+        if self.cache:
+            self._log_change(lowered)
+
+    def search(self, query, offset=0, limit=None):
+        """
+        Returns the ISBNs whose field contains the query (case-insensitive), ranked by
+        match position, then field length, then ISBN, sliced by offset and limit.
+        """
+        ranked = self._lookup(query)
+        return [isbn for _, _, isbn in ranked[offset:None if limit is None else offset + limit]]
+
+    def ranked(self, query, count=None):
+        """
+        Returns the first count (match position, field length, ISBN) keys that search
+        ranks by, in order, or all of them for None. Lets results from several indexes
+        be merged, e.g. across shards.
+        """
+        return self._lookup(query)[:count]
+
+    def _lookup(self, query):
+        """Returns the ranked keys of a query from the cache, ranking and caching them on a miss."""
+        if self.pending is not None:
+            self._build()
+        lowered = query.lower()
+        position = self.changes_start + len(self.changes)
+        entry = self.cache.get(lowered)
+        if entry is not None:
+            checked, ranked = entry
+            if checked >= self.changes_start and not any(
+                    lowered in text for text in self.changes[checked - self.changes_start:]):
+                self.hits += 1
+                self.cache[lowered] = (position, ranked)
+                self.cache.move_to_end(lowered)
+                return ranked
+            self._uncache(lowered)
+            self.invalidations += 1
+        self.misses += 1
+        ranked = self._rank(lowered)
+        if self.cache_size > 0 and len(ranked) <= self.cache_max_results:
+            self.cache[lowered] = (position, ranked)
+            self.cached_results += len(ranked)
+            while len(self.cache) > self.cache_size or self.cached_results > self.cache_max_results:
+                self._uncache(next(iter(self.cache)))
+                self.evictions += 1
+        return ranked
+
+    def cache_stats(self):
+        """Returns the cache size in entries and ISBNs, hit and miss counts, hit rate, evictions and invalidations."""
+        lookups = self.hits + self.misses
+        return {"entries": len(self.cache), "results": self.cached_results, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+    def _uncache(self, lowered):
+        _, ranked = self.cache.pop(lowered)
+        self.cached_results -= len(ranked)
+
+    def _log_change(self, text):
+        self.changes.append(text)
+        if len(self.changes) > CHANGE_LOG_SIZE:
+            dropped = len(self.changes) // 2
+            del self.changes[:dropped]
+            self.changes_start += dropped
+
+    def _rank(self, lowered):
+        candidates = None
+        for fragment in sorted(tokenize(lowered), key=len, reverse=True):
+            matched = set()
+            for token in self._tokens_containing(fragment):
+                matched |= self.postings[token]
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+        if candidates is None:
+            # Queries without word characters cannot use the postings
+            candidates = self.texts.keys()
+
+        ranked = []
+        for isbn in candidates:
+            text = self.texts[isbn]
+            position = text.find(lowered)
+            if position >= 0:
+                ranked.append((position, len(text), isbn))
+        ranked.sort()
+        return ranked
+
+    def _build(self):
+        source = self.pending
+        self.pending = None
+        texts = self.texts
+        postings = self.postings
+        for isbn, text in source():
+            lowered = text.lower()
+            texts[isbn] = lowered
+            for token in tokenize(lowered):
+                posting = postings.get(token)
+                if posting is None:
+                    postings[token] = {isbn}
+                else:
+                    posting.add(isbn)
+        for token in postings:
+            self._insert_token(token)
+
+    def fuzzy(self, query, max_distance=None, count=None):
+        """
+        Returns the ISBNs whose field has, for every word of the query, a word within
+        max_distance edits of it (default: typo_budget of each query word), ranked by
+        the total number of edits, then field length, then ISBN. Only the first count
+        are returned (all for None).
+        Candidate words come from the trigram postings: a word within d edits of a
+        query word shares all but at most 3 * d of its trigrams, so distances are
+        only computed for words sharing enough trigrams, never for the whole catalog.
+        """
+        if self.pending is not None:
+            self._build()
+        if self.trigrams is None:
+            self.trigrams = {}
+            for token in self.postings:
+                self._insert_trigrams(token)
+        words = sorted(tokenize(query))
+        if not words:
+            return []
+
+        scores = None  # ISBN -> total edits so far
+        for word in words:
+            limit = typo_budget(word) if max_distance is None else max_distance
+            grams = trigrams(word)
+            shared = {}
+            for gram in grams:
+                for token in self.trigrams.get(gram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            needed = max(1, len(grams) - 3 * limit)
+            best = {}  # ISBN -> fewest edits to any of its words for this query word
+            for token, hits in shared.items():
+                if hits < needed:
+                    continue
+                distance = edit_distance(word, token, limit)
+                if distance > limit:
+                    continue
+                for isbn in self.postings[token]:
+                    if distance < best.get(isbn, limit + 1):
+                        best[isbn] = distance
+            if scores is None:
+                scores = best
+            else:
+                scores = {isbn: score + best[isbn] for isbn, score in scores.items() if isbn in best}
+            if not scores:
+                return []
+        texts = self.texts
+        keys = ((score, len(texts[isbn]), isbn) for isbn, score in scores.items())
+        ranked = sorted(keys) if count is None else heapq.nsmallest(count, keys)
+        return [isbn for _, _, isbn in ranked]
+
+    def _insert_trigrams(self, token):
+        for gram in trigrams(token):
+            self.trigrams.setdefault(gram, set()).add(token)
+
+    def _insert_token(self, token):
+        if self.trigrams is not None:
+            self._insert_trigrams(token)
+        for start in range(len(token)):
+            node = self.trie
+            for char in token[start:]:
+                node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(token)
+
+    def _remove_token(self, token):
+        if self.trigrams is not None:
+            for gram in trigrams(token):
+                tokens = self.trigrams[gram]
+                tokens.discard(token)
+                if not tokens:
+                    del self.trigrams[gram]
+        for start in range(len(token)):
+            path = [self.trie]
+            for char in token[start:]:
+                path.append(path[-1][char])
+            ending = path[-1][None]
+            ending.discard(token)
+            if not ending:
+                del path[-1][None]
+            # Prune nodes that no longer lead to any token
+            for depth in range(len(path) - 1, 0, -1):
+                if path[depth]:
+                    break
+                del path[depth - 1][token[start + depth - 1]]
+
+    def _tokens_containing(self, fragment):
+        node = self.trie
+        for char in fragment:
+            node = node.get(char)
+            if node is None:
+                return set()
+        tokens = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    tokens |= child
+                else:
+                    stack.append(child)
+        return tokens
@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import operations
+import storage
+
+# Largest number of queued requests applied to the store in one batch
+MAX_BATCH = 512
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found"}
+
+
+class LibraryService:
+    """
+    Asyncio HTTP/JSON front-end over the operations module.
+    Connection handlers only parse requests; every store call goes through one queue
+    drained by a single batcher task, so the store is never touched concurrently.
+    Consecutive borrow and return requests in a batch are coalesced into one
+    borrow_many or return_many call.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH):
+        self.max_batch = max_batch
+        self.queue = None
+        self.port = None  # Port actually listened on, useful when serving on port 0
+        self.batches = 0  # Batches applied so far
+        self.batched_requests = 0  # Requests applied through those batches
+
+    async def submit(self, operation, *args):
+        """Queues one store call and waits for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((operation, args, future))
+        return await future
+
+    async def run_batches(self):
+        """Applies queued store calls in batches until cancelled."""
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.batches += 1
+            self.batched_requests += len(batch)
+
+            start = 0
+            while start < len(batch):
+                operation = batch[start][0]
+                end = start + 1
+                if operation in (operations.borrow_book, operations.return_book):
+                    while end < len(batch) and batch[end][0] is operation:
+                        end += 1
+                run = batch[start:end]
+                try:
+                    if len(run) > 1:
+                        many = operations.borrow_many if operation is operations.borrow_book else operations.return_many
+                        results = many([args for _, args, _ in run])
+                    else:
+                        results = [operation(*run[0][1])]
+                except Exception as error:  # Report the failure to the waiting request only
+                    for _, _, future in run:
+                        future.set_exception(error)
+                else:
+                    for (_, _, future), result in zip(run, results):
+                        future.set_result(result)
+                start = end
+
+    async def dispatch(self, method, path, query, body):
+        """Maps one HTTP request to a store call. Returns (status, payload)."""
+        parts = [part for part in path.split("/") if part]
+
+        if parts == ["books"] and method == "POST":
+            ok = await self.submit(operations.add_book, body.get("isbn"), body.get("title"), body.get("author"),
+                                   body.get("genre"), body.get("total_copies"))
+            return 200, {"ok": ok}
+        if parts == ["books", "search"] and method == "GET":
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query["limit"][0]) if "limit" in query else None
+            search = operations.fuzzy_find_books if query.get("fuzzy", ["0"])[0] == "1" else operations.find_books
+            isbns = await self.submit(search, query.get("q", [""])[0], query.get("by", ["title"])[0], offset, limit)
+            return 200, {"isbns": isbns}
+        if parts == ["books", "browse"] and method == "GET":
+            after = query["after"][0] if "after" in query else None
+            isbns = await self.submit(operations.browse_books, query.get("genre", [None])[0],
+                                      query.get("author", [None])[0], after, int(query.get("limit", ["20"])[0]),
+                                      query.get("desc", ["0"])[0] == "1")
+            return 200, {"isbns": isbns, "next": isbns[-1] if isbns else None}
+        if len(parts) == 2 and parts[0] == "books":
+            isbn = parts[1]
+            if method == "GET":
+                book = operations.books.get(isbn)
+                return (200, {"isbn": isbn, **book.to_dict()}) if book is not None else (404, {"ok": False})
+            if method == "PATCH":
+                ok = await self.submit(operations.update_book, isbn, body.get("title"), body.get("author"),
+                                       body.get("genre"), body.get("total_copies"))
+                return 200, {"ok": ok}
+            if method == "DELETE":
+                return 200, {"ok": await self.submit(operations.delete_book, isbn)}
+        if parts == ["members"] and method == "POST":
+            ok = await self.submit(operations.add_member, body.get("member_id"), body.get("name"), body.get("email"))
+            return 200, {"ok": ok}
+        if len(parts) == 2 and parts[0] == "members":
+            member_id = parts[1]
+            if method == "GET":
+                member = operations.members.get(member_id)
+                return (200, member.to_dict()) if member is not None else (404, {"ok": False})
+            if method == "PATCH":
+                ok = await self.submit(operations.update_member, member_id, body.get("name"), body.get("email"))
+                return 200, {"ok": ok}
+            if method == "DELETE":
+                return 200, {"ok": await self.submit(operations.delete_member, member_id)}
+        if parts == ["stats"] and method == "GET":
+            return 200, {"summary": operations.circulation_summary(), "genres": operations.genre_stats()}
+        if parts in (["borrow"], ["return"]) and method == "POST":
+            operation = operations.borrow_book if parts == ["borrow"] else operations.return_book
+            return 200, {"ok": await self.submit(operation, body.get("isbn"), body.get("member_id"))}
+        return 404, {"ok": False, "error": "unknown endpoint"}
+
+    async def handle_connection(self, reader, writer):
+        """Serves HTTP/1.1 requests on one keep-alive connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                raw_body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                url = urlsplit(target)
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                    if not isinstance(body, dict):
+                        raise ValueError("body must be a JSON object")
+                    status, payload = await self.dispatch(method, url.path, parse_qs(url.query), body)
+                except ValueError as error:
+                    status, payload = 400, {"ok": False, "error": str(error)}
+
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8080, ready=None):
+        """Runs the HTTP server and the batcher until cancelled. Sets ready once listening."""
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.run_batches())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+async def send_request(reader, writer, method, path, body=None):
+    """Sends one request on a keep-alive connection and returns the decoded JSON reply."""
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: library\r\nContent-Length: {len(data)}\r\n\r\n"
+                 .encode("latin-1") + data)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+async def generate_load(host="127.0.0.1", port=8080, connections=32, requests=10_000, books=1000, members=1000):
+    """
+    Load generator: seeds books and members, then sends a borrow/return/search mix over
+    several keep-alive connections. Returns requests per second and latency percentiles.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    for number in range(books):
+        await send_request(reader, writer, "POST", "/books", {"isbn": f"LG{number:06d}", "title": f"Load Title {number}",
+                                                          "author": "Load Author", "genre": "Fiction",
+                                                          "total_copies": 5})
+    for number in range(members):
+        await send_request(reader, writer, "POST", "/members", {"member_id": f"LM{number:06d}", "name": "Load Member",
+                                                            "email": "load@example.com"})
+    writer.close()
+
+    latencies = []
+
+    async def client(seed, count):
+        generator = random.Random(seed)
+        client_reader, client_writer = await asyncio.open_connection(host, port)
+        for _ in range(count):
+            choice = generator.random()
+            started = time.perf_counter()
+            if choice < 0.1:
+                await send_request(client_reader, client_writer, "GET", f"/books/search?q=title+{generator.randrange(books)}")
+            else:
+                path = "/borrow" if choice < 0.55 else "/return"
+                await send_request(client_reader, client_writer, "POST", path,
+                               {"isbn": f"LG{generator.randrange(books):06d}",
+                                "member_id": f"LM{generator.randrange(members):06d}"})
+            latencies.append(time.perf_counter() - started)
+        client_writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(seed, requests // connections) for seed in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+
+async def _serve_and_load(arguments):
+    """Starts a service in this process and runs the load generator against it."""
+    ready = asyncio.Event()
+    service = LibraryService()
+    server = asyncio.create_task(service.serve(arguments.host, arguments.port, ready))
+    await ready.wait()
+    try:
+        report = await generate_load(arguments.host, arguments.port, arguments.connections, arguments.requests)
+    finally:
+        server.cancel()
+    report["average_batch"] = service.batched_requests / service.batches if service.batches else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the library over HTTP/JSON or load test it.")
+    parser.add_argument("mode", choices=("serve", "load", "bench"),
+                        help="serve, load an already running server, or bench (serve and load in one process)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--store", help="storage directory to load from and journal changes to")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10_000)
+    arguments = parser.parse_args()
+
+    if arguments.store:
+        storage.open_store(arguments.store)
+    if arguments.mode == "serve":
+        asyncio.run(LibraryService().serve(arguments.host, arguments.port))
+    elif arguments.mode == "load":
+        print(asyncio.run(generate_load(arguments.host, arguments.port, arguments.connections, arguments.requests)))
+    else:
+        print(asyncio.run(_serve_and_load(arguments)))
@@ -0,0 +1,419 @@
+import argparse
+import heapq
+import itertools
+import multiprocessing
+import random
+import time
+import zlib
+
+import benchmarks
+import operations
+
+# Operations a shard runs on its own records, by the key that picks the owning shard
+BOOK_OPERATIONS = ("add_book", "update_book", "delete_book", "current_borrowers")
+MEMBER_OPERATIONS = ("add_member", "update_member", "delete_member", "member_loans")
+CIRCULATION_OPERATIONS = ("borrow_book", "return_book")
+
+_prepared = {}  # Inside a shard: transaction ID -> change applied by _prepare, until commit or abort
+
+
+class RemoteError(Exception):
+    """An operation raised inside a shard process; the message is the shard's repr of it."""
+
+
+def _set_copies(book, total_copies):
+    operations.stats.remove_book(book)
+    book.total_copies = total_copies
+    operations.stats.add_book(book)
+
+
+def _set_borrowed(member, borrowed_books):
+    operations.stats.remove_member(member)
+    member.borrowed_books = borrowed_books
+    operations.stats.add_member(member)
+
+
+def _prepare(txid, side, kind, isbn, member_id):
+    """
+    Phase one of a cross-shard borrow ("borrow") or return ("return"), run by the shard
+    owning the book (side "book") or the member (side "member"). Checks this shard's
+    half of the rules and applies its half of the change tentatively, so a concurrent
+    round cannot take the same copy or borrowing slot. Returns True if it can commit.
+    """
+    if side == "book":
+        book = operations.books.get(isbn)
+        if book is None:
+            return operations._fail("unknown_book")
+        if kind == "borrow" and book.total_copies <= 0:
+            return operations._fail("no_copies_available")
+        previous = book.total_copies
+        _set_copies(book, previous - 1 if kind == "borrow" else previous + 1)
+    else:
+        member = operations.members.get(member_id)
+        if member is None:
+            return operations._fail("unknown_member")
+        if not isinstance(member.borrowed_books, tuple):
+            return operations._fail("invalid_member_record")
+        previous = member.borrowed_books
+        if kind == "borrow":
+            if len(previous) >= 3:
+                return operations._fail("borrow_limit_reached")
+            if isbn in previous:
+                return operations._fail("already_borrowed")
+            _set_borrowed(member, previous + (isbn,))
+        else:
+            if isbn not in previous:
+                return operations._fail("not_borrowed")
+            _set_borrowed(member, tuple(borrowed for borrowed in previous if borrowed != isbn))
+    _prepared[txid] = (side, kind, isbn, member_id, previous)
+    return True
+
+
+def _commit(txid, now):
+    """Phase two: makes a prepared change final and records the loan on this shard."""
+    _, kind, isbn, member_id, _ = _prepared.pop(txid)
+    if kind == "borrow":
+        operations.loans.open(isbn, member_id, now)
+    else:
+        operations.loans.close(isbn, member_id)
+    return True
+
+
+def _abort(txid):
+    """Phase two: undoes a prepared change. Unknown IDs (failed prepares) are ignored."""
+    change = _prepared.pop(txid, None)
+    if change is None:
+        return False
+    side, _, isbn, member_id, previous = change
+    if side == "book":
+        _set_copies(operations.books[isbn], previous)
+    else:
+        _set_borrowed(operations.members[member_id], previous)
+    return True
+
+
+def _ranked(query, by, count):
+    """Returns this shard's first count search keys (all for None), for merging across shards."""
+    index = operations.author_index if by.lower() == "author" else operations.title_index
+    return index.ranked(query, count)
+
+
+def _overdue(now):
+    """Returns the overdue loans of this shard's books; member-side copies are dropped silently."""
+    return [loan for loan in operations.overdue_loans(now) if loan.isbn in operations.books]
+
+
+_HANDLERS = {"_prepare": _prepare, "_commit": _commit, "_abort": _abort, "_ranked": _ranked, "_overdue": _overdue}
+
+
+def _serve_shard(connection):
+    """Shard process: applies each batch of (name, args) calls it receives and sends back the results."""
+    # A forked shard starts with a copy of the parent's library and listeners
+    operations.mutation_listeners.clear()
+    operations.reset_library()
+    handlers = dict(_HANDLERS)
+    for name in BOOK_OPERATIONS + MEMBER_OPERATIONS + CIRCULATION_OPERATIONS + (
+            "add_books_bulk", "add_members_bulk", "search_books", "circulation_summary"):
+        handlers[name] = getattr(operations, name)
+    while True:
+        try:
+            batch = connection.recv()
+        except EOFError:
+            break
+        if batch is None:
+            break
+        results = []
+        for name, args in batch:
+            try:
+                results.append(handlers[name](*args))
+            except Exception as error:  # Reported to the caller instead of killing the shard
+                results.append(RemoteError(repr(error)))
+        connection.send(results)
+    connection.close()
+
+
+class ShardedLibrary:
+    """
+    Library partitioned across worker processes. Books are assigned to shards by a hash
+    of the ISBN and members by a hash of the member ID, and each call runs on the shard
+    owning its key. A borrow or return whose book and member live on different shards
+    uses two-phase commit: both shards prepare (check and tentatively apply their half),
+    then both commit, or both abort if either side refused.
+
+    call_many sends a batch of calls to every shard at once, so shards work in parallel.
+    Hold queues are not available in sharded mode.
+    """
+
+    def __init__(self, workers=4):
+        self.connections = []
+        self.processes = []
+        for _ in range(workers):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_shard, args=(child,), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.transactions = itertools.count()
+        self.cross_shard = 0  # Borrows and returns that needed two-phase commit
+
+    def close(self):
+        """Stops every shard process."""
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def shard_of(self, key):
+        """Returns the shard number owning a book or member key. Non-string keys go to shard 0."""
+        if not isinstance(key, str):
+            return 0
+        return zlib.crc32(key.encode("utf-8")) % len(self.connections)
+
+    def _exchange(self, batches):
+        """
+        Sends {shard: [(name, args), ...]} to the shards and returns {shard: results}.
+        If a call raised, the transactions the batches prepared are aborted on their
+        shards before the first error is raised, so no tentative change is left behind.
+        """
+        for shard, batch in batches.items():
+            self.connections[shard].send(batch)
+        replies = {shard: self.connections[shard].recv() for shard in batches}
+        errors = [result for results in replies.values() for result in results if isinstance(result, RemoteError)]
+        if errors:
+            aborts = {}
+            for shard, batch in batches.items():
+                for (name, args), result in zip(batch, replies[shard]):
+                    if name == "_prepare" and result is True:
+                        aborts.setdefault(shard, []).append(("_abort", (args[0],)))
+            if aborts:
+                self._exchange(aborts)
+            raise errors[0]
+        return replies
+
+    def _broadcast(self, name, args):
+        """Runs one call on every shard and returns the results in shard order."""
+        replies = self._exchange({shard: [(name, args)] for shard in range(len(self.connections))})
+        return [replies[shard][0] for shard in range(len(self.connections))]
+
+    def _route(self, name, args):
+        """Returns (book shard, member shard) for circulation calls, else (shard, shard)."""
+        if name in CIRCULATION_OPERATIONS and len(args) == 2:
+            return self.shard_of(args[0]), self.shard_of(args[1])
+        if name in BOOK_OPERATIONS or name in MEMBER_OPERATIONS or name in CIRCULATION_OPERATIONS:
+            shard = self.shard_of(args[0] if args else None)
+            return shard, shard
+        raise ValueError(f"Operation {name!r} cannot be routed to a shard")
+
+    def call_many(self, calls):
+        """
+        Runs (name, args) calls for the single-key operations and borrow/return, and
+        returns their results in order. Calls are grouped into rounds; a round sends each
+        shard its calls in one message. Cross-shard borrows and returns are applied after
+        the other calls of their round, so a round closes before any call that touches a
+        key of a pending cross-shard call.
+        """
+        results = [None] * len(calls)
+        round_calls = []
+        cross_keys = set()
+        for position, (name, args) in enumerate(calls):
+            args = tuple(args)
+            book_shard, member_shard = self._route(name, args)
+            if name in CIRCULATION_OPERATIONS and len(args) == 2:
+                keys = {("isbn", args[0]), ("member", args[1])}
+            else:
+                keys = {("member" if name in MEMBER_OPERATIONS else "isbn", args[0] if args else None)}
+            if keys & cross_keys:
+                self._run_round(round_calls, results)
+                round_calls = []
+                cross_keys = set()
+            cross = book_shard != member_shard
+            if cross:
+                cross_keys |= keys
+            round_calls.append((position, name, args, book_shard, member_shard))
+        self._run_round(round_calls, results)
+        return results
+
+    def _run_round(self, round_calls, results):
+        batches = {}
+        local = []  # (result position, shard, index in the shard's batch)
+        cross = []  # (result position, txid, book shard, index, member shard, index)
+        for position, name, args, book_shard, member_shard in round_calls:
+            if book_shard == member_shard:
+                batch = batches.setdefault(book_shard, [])
+                local.append((position, book_shard, len(batch)))
+                batch.append((name, args))
+                continue
+            txid = next(self.transactions)
+            kind = "borrow" if name == "borrow_book" else "return"
+            book_batch = batches.setdefault(book_shard, [])
+            member_batch = batches.setdefault(member_shard, [])
+            cross.append((position, txid, book_shard, len(book_batch), member_shard, len(member_batch)))
+            book_batch.append(("_prepare", (txid, "book", kind) + args))
+            member_batch.append(("_prepare", (txid, "member", kind) + args))
+        if not batches:
+            return
+        replies = self._exchange(batches)
+        for position, shard, index in local:
+            results[position] = replies[shard][index]
+        if not cross:
+            return
+
+        self.cross_shard += len(cross)
+        now = operations.clock()
+        decisions = {}
+        for position, txid, book_shard, book_index, member_shard, member_index in cross:
+            ok = replies[book_shard][book_index] is True and replies[member_shard][member_index] is True
+            results[position] = ok
+            call = ("_commit", (txid, now)) if ok else ("_abort", (txid,))
+            decisions.setdefault(book_shard, []).append(call)
+            decisions.setdefault(member_shard, []).append(call)
+        self._exchange(decisions)
+
+    def _split(self, name, records):
+        """Runs a bulk insert as one sub-batch per shard and returns the per-record results."""
+        records = [tuple(record) for record in records]
+        positions = {}
+        for position, record in enumerate(records):
+            positions.setdefault(self.shard_of(record[0] if record else None), []).append(position)
+        replies = self._exchange({shard: [(name, ([records[position] for position in owned],))]
+                                  for shard, owned in positions.items()})
+        results = [False] * len(records)
+        for shard, owned in positions.items():
+            for position, added in zip(owned, replies[shard][0]):
+                results[position] = added
+        return results
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        """Sharded operations.add_book."""
+        return self.call_many([("add_book", (isbn, title, author, genre, total_copies))])[0]
+
+    def add_member(self, member_id, name, email):
+        """Sharded operations.add_member."""
+        return self.call_many([("add_member", (member_id, name, email))])[0]
+
+    def update_book(self, isbn, title=None, author=None, genre=None, total_copies=None):
+        """Sharded operations.update_book."""
+        return self.call_many([("update_book", (isbn, title, author, genre, total_copies))])[0]
+
+    def update_member(self, member_id, name=None, email=None):
+        """Sharded operations.update_member."""
+        return self.call_many([("update_member", (member_id, name, email))])[0]
+
+    def delete_book(self, isbn):
+        """Sharded operations.delete_book."""
+        return self.call_many([("delete_book", (isbn,))])[0]
+
+    def delete_member(self, member_id):
+        """Sharded operations.delete_member."""
+        return self.call_many([("delete_member", (member_id,))])[0]
+
+    def borrow_book(self, isbn, member_id):
+        """Sharded operations.borrow_book, with two-phase commit across shards."""
+        return self.call_many([("borrow_book", (isbn, member_id))])[0]
+
+    def return_book(self, isbn, member_id):
+        """Sharded operations.return_book, with two-phase commit across shards."""
+        return self.call_many([("return_book", (isbn, member_id))])[0]
+
+    def borrow_many(self, pairs):
+        """Sharded operations.borrow_many without the atomic option."""
+        return self.call_many([("borrow_book", pair) for pair in pairs])
+
+    def return_many(self, pairs):
+        """Sharded operations.return_many without the atomic option."""
+        return self.call_many([("return_book", pair) for pair in pairs])
+
+    def add_books_bulk(self, records):
+        """Sharded operations.add_books_bulk without the atomic option."""
+        return self._split("add_books_bulk", records)
+
+    def add_members_bulk(self, records):
+        """Sharded operations.add_members_bulk without the atomic option."""
+        return self._split("add_members_bulk", records)
+
+    def current_borrowers(self, isbn):
+        """Sharded operations.current_borrowers."""
+        return self.call_many([("current_borrowers", (isbn,))])[0]
+
+    def member_loans(self, member_id):
+        """Sharded operations.member_loans."""
+        return self.call_many([("member_loans", (member_id,))])[0]
+
+    def find_books(self, query, by="title", offset=0, limit=None):
+        """Sharded operations.find_books: every shard searches its books and the rankings are merged."""
+        if not isinstance(query, str) or not isinstance(by, str):
+            return []
+        if not isinstance(offset, int) or offset < 0:
+            return []
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            return []
+        end = None if limit is None else offset + limit
+        merged = heapq.merge(*self._broadcast("_ranked", (query, by, end)))
+        return [isbn for _, _, isbn in itertools.islice(merged, offset, end)]
+
+    def search_books(self, query, by="title"):
+        """Sharded operations.search_books."""
+        return len(self.find_books(query, by, limit=1)) > 0
+
+    def overdue_loans(self, now=None):
+        """Sharded operations.overdue_loans."""
+        now = operations.clock() if now is None else now
+        return sorted(itertools.chain(*self._broadcast("_overdue", (now,))), key=lambda loan: loan.due_at)
+
+    def circulation_summary(self):
+        """Sharded operations.circulation_summary, summed over the shards."""
+        summaries = self._broadcast("circulation_summary", ())
+        total = {key: sum(summary[key] for summary in summaries) for key in summaries[0] if key != "utilization"}
+        total["utilization"] = total["on_loan"] / total["copies"] if total["copies"] else 0.0
+        return total
+
+
+def benchmark(worker_counts=(1, 2, 4), size=100_000, calls=200_000, batch_size=2000, seed=0):
+    """
+    Loads size books and members into libraries with each worker count, then times
+    calls random borrows and returns sent in batches of batch_size. Returns the
+    throughput per worker count and the speedup over the first count.
+    """
+    generator = random.Random(seed)
+    isbns = [f"BK{number:08d}" for number in range(size)]
+    member_ids = [f"MB{number:08d}" for number in range(size)]
+    workload = [("borrow_book" if generator.random() < 0.55 else "return_book",
+                 (generator.choice(isbns), generator.choice(member_ids))) for _ in range(calls)]
+    runs = []
+    for workers in worker_counts:
+        with ShardedLibrary(workers) as library:
+            library.add_books_bulk(benchmarks.generate_books(size, seed))
+            library.add_members_bulk(benchmarks.generate_members(size, seed))
+            started = time.perf_counter()
+            for start in range(0, calls, batch_size):
+                library.call_many(workload[start:start + batch_size])
+            elapsed = time.perf_counter() - started
+            runs.append({"workers": workers, "ops_per_second": calls / elapsed,
+                         "cross_shard_fraction": library.cross_shard / calls})
+    for run in runs:
+        run["speedup"] = run["ops_per_second"] / runs[0]["ops_per_second"]
+    return {"cpus": multiprocessing.cpu_count(), "size": size, "calls": calls, "runs": runs}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the sharded library at several worker counts.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=2000)
+    arguments = parser.parse_args()
+
+    report = benchmark(arguments.workers, arguments.size, arguments.calls, arguments.batch)
+    print(f"{report['cpus']} CPUs, {report['size']} books and members, {report['calls']} borrows and returns")
+    for run in report["runs"]:
+        print(f"{run['workers']:3} workers {run['ops_per_second']:>12,.0f} ops/s   speedup {run['speedup']:5.2f}x   "
+              f"cross-shard {run['cross_shard_fraction']:.0%}")
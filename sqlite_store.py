@@ -0,0 +1,495 @@
+import argparse
+import contextlib
+import os
+import sqlite3
+import tempfile
+import time
+from collections.abc import Mapping
+
+import benchmarks
+import operations
+from loans import LOAN_PERIOD
+from records import Book, Loan, Member
+
+# Tables and indexes; the trigram table indexes titles and authors for substring search
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    isbn TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    total_copies INTEGER NOT NULL,
+    original_copies INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS books_title ON books (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS books_author ON books (author COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS members (
+    member_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS loans (
+    loan_id INTEGER PRIMARY KEY,
+    isbn TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    borrowed_at REAL NOT NULL,
+    due_at REAL NOT NULL,
+    overdue_reported INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (isbn, member_id)
+);
+CREATE INDEX IF NOT EXISTS loans_member ON loans (member_id);
+CREATE INDEX IF NOT EXISTS loans_due ON loans (overdue_reported, due_at);
+"""
+# Trigram index of titles and authors, kept by the operations themselves: FTS5 tables
+# fed row by row from triggers index several times slower than in batched inserts
+TEXT_SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS book_text USING fts5(
+    title, author, content='books', content_rowid='rowid', tokenize='trigram'
+);
+"""
+# Same borrowing limit as operations.borrow_book
+BORROW_LIMIT = 3
+# Genre strings shared by every book read back, like operations._insert_book does
+_GENRES = {genre: genre for genre in operations.genres}
+
+
+class _RolledBack(Exception):
+    """Raised inside a transaction to undo an atomic batch that had a failed entry."""
+
+
+class _Books(Mapping):
+    """Read-only view of the books table as {isbn: Book}, like operations.books."""
+
+    def __init__(self, library):
+        self.library = library
+
+    def __getitem__(self, isbn):
+        row = self.library.connection.execute(
+            "SELECT title, author, genre, total_copies, original_copies FROM books WHERE isbn = ?", (isbn,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(isbn)
+        return Book(row[0], row[1], _GENRES.get(row[2], row[2]), row[3], row[4])
+
+    def __contains__(self, isbn):
+        return self.library.connection.execute("SELECT 1 FROM books WHERE isbn = ?", (isbn,)).fetchone() is not None
+
+    def __iter__(self):
+        return (isbn for isbn, in self.library.connection.execute("SELECT isbn FROM books ORDER BY rowid"))
+
+    def __len__(self):
+        return self.library.connection.execute("SELECT count(*) FROM books").fetchone()[0]
+
+
+class _Members(Mapping):
+    """Read-only view of the members table as {member_id: Member}, in enrollment order."""
+
+    def __init__(self, library):
+        self.library = library
+
+    def __getitem__(self, member_id):
+        row = self.library.connection.execute(
+            "SELECT name, email FROM members WHERE member_id = ?", (member_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(member_id)
+        return Member(member_id, row[0], row[1], self.library._borrowed(member_id))
+
+    def __contains__(self, member_id):
+        return self.library.connection.execute(
+            "SELECT 1 FROM members WHERE member_id = ?", (member_id,)
+        ).fetchone() is not None
+
+    def __iter__(self):
+        return (member_id for member_id, in self.library.connection.execute(
+            "SELECT member_id FROM members ORDER BY rowid"))
+
+    def __len__(self):
+        return self.library.connection.execute("SELECT count(*) FROM members").fetchone()[0]
+
+
+class SQLiteLibrary:
+    """
+    The operations API backed by a SQLite database instead of the in-memory
+    dictionaries, for catalogs larger than RAM and for several processes sharing one
+    library file. Each instance keeps one connection, whose statement cache reuses
+    the prepared statements of every operation. File databases run in WAL mode, so
+    readers in other processes are not blocked by a writer. Every check and change of
+    an operation runs in one IMMEDIATE transaction, so the availability and borrowing
+    limit checks of a borrow hold even with other processes borrowing concurrently.
+    Substring searches go through a trigram full-text index when SQLite provides one.
+    A connection must only be used by one thread; hold queues are not available.
+    """
+
+    def __init__(self, path=":memory:", timeout=30.0):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, cached_statements=256)
+        # Python's lowercasing, so matches and ranks agree with operations.find_books beyond ASCII
+        self.connection.create_function("py_lower", 1, str.lower, deterministic=True)
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(TEXT_SEARCH_SCHEMA)
+            self.text_search = True
+        except sqlite3.OperationalError:  # SQLite built without FTS5 or its trigram tokenizer
+            self.text_search = False
+        self.books = _Books(self)
+        self.members = _Members(self)
+
+    def close(self):
+        """Closes the connection."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Runs the block in one write transaction, rolled back if it raises."""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def _borrowed(self, member_id):
+        return tuple(isbn for isbn, in self.connection.execute(
+            "SELECT isbn FROM loans WHERE member_id = ? ORDER BY loan_id", (member_id,)))
+
+    def reset_library(self):
+        """Removes every book, member and loan."""
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM loans")
+            connection.execute("DELETE FROM books")
+            connection.execute("DELETE FROM members")
+            if self.text_search:
+                # The index has external content, so its rows must be dropped along with the books
+                connection.execute("INSERT INTO book_text (book_text) VALUES ('delete-all')")
+
+    def _index_text(self, rows):
+        """Adds (rowid, title, author) rows of new book versions to the trigram index."""
+        if self.text_search and rows:
+            self.connection.executemany("INSERT INTO book_text (rowid, title, author) VALUES (?, ?, ?)", rows)
+
+    def _unindex_text(self, rows):
+        """Removes (rowid, title, author) rows of old book versions from the trigram index."""
+        if self.text_search and rows:
+            self.connection.executemany(
+                "INSERT INTO book_text (book_text, rowid, title, author) VALUES ('delete', ?, ?, ?)", rows)
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        """SQLite operations.add_book."""
+        if not operations._valid_book(isbn, title, author, genre, total_copies):
+            return False
+        with self._transaction() as connection:
+            try:
+                rowid = connection.execute("INSERT INTO books VALUES (?, ?, ?, ?, ?, ?)",
+                                           (isbn, title, author, genre, total_copies, total_copies)).lastrowid
+            except sqlite3.IntegrityError:
+                return operations._fail("duplicate_isbn")
+            self._index_text([(rowid, title, author)])
+        return True
+
+    def add_member(self, member_id, name, email):
+        """SQLite operations.add_member."""
+        if not operations._valid_member(member_id, name, email):
+            return False
+        try:
+            self.connection.execute("INSERT INTO members VALUES (?, ?, ?)", (member_id, name, email))
+        except sqlite3.IntegrityError:
+            return operations._fail("duplicate_member")
+        return True
+
+    def add_books_bulk(self, records, atomic=False):
+        """SQLite operations.add_books_bulk: one transaction and one prepared insert for the batch."""
+        return self._insert_many("INSERT OR IGNORE INTO books VALUES (?, ?, ?, ?, ?, ?)", records, 5,
+                                 lambda record: operations._valid_book(*record) and record + (record[4],),
+                                 "duplicate_isbn", atomic, lambda rowid, row: (rowid, row[1], row[2]))
+
+    def add_members_bulk(self, records, atomic=False):
+        """SQLite operations.add_members_bulk."""
+        return self._insert_many("INSERT OR IGNORE INTO members VALUES (?, ?, ?)", records, 3,
+                                 lambda record: operations._valid_member(*record) and record,
+                                 "duplicate_member", atomic, None)
+
+    def _insert_many(self, statement, records, fields, prepare, duplicate_reason, atomic, text_row):
+        records = [tuple(record) for record in records]
+        results = []
+        text_rows = []
+        try:
+            with self._transaction() as connection:
+                for record in records:
+                    row = len(record) == fields and prepare(record)
+                    if row:
+                        cursor = connection.execute(statement, row)
+                        # INSERT OR IGNORE changes no row for a duplicate, in the table or earlier in the batch
+                        if cursor.rowcount == 1:
+                            if text_row is not None:
+                                text_rows.append(text_row(cursor.lastrowid, row))
+                        else:
+                            row = operations._fail(duplicate_reason)
+                    results.append(bool(row))
+                    if atomic and not row:
+                        raise _RolledBack
+                self._index_text(text_rows)
+        except _RolledBack:
+            return operations._fail("batch_rolled_back")
+        return True if atomic else results
+
+    def find_books(self, query, by="title", offset=0, limit=None):
+        """
+        SQLite operations.find_books, ranked the same way. Queries of three or more
+        ASCII characters are matched through the trigram index; others scan the table.
+        """
+        if not isinstance(query, str) or not isinstance(by, str):
+            return []
+        if not isinstance(offset, int) or offset < 0:
+            return []
+        if limit is not None and (not isinstance(limit, int) or limit < 0):
+            return []
+        column = "author" if by.lower() == "author" else "title"
+        lowered = query.lower()
+        ranking = (f"ORDER BY instr(py_lower({column}), :query), length({column}), isbn "
+                   f"LIMIT :limit OFFSET :offset")
+        parameters = {"query": lowered, "limit": -1 if limit is None else limit, "offset": offset}
+        if self.text_search and len(lowered) >= 3 and lowered.isascii() and not any(c in lowered for c in "%_"):
+            # The trigram index narrows the candidates; instr then checks them exactly
+            statement = (f"SELECT isbn FROM books WHERE rowid IN "
+                         f"(SELECT rowid FROM book_text WHERE {column} LIKE :pattern) "
+                         f"AND instr(py_lower({column}), :query) > 0 {ranking}")
+            parameters["pattern"] = f"%{lowered}%"
+        else:
+            statement = f"SELECT isbn FROM books WHERE instr(py_lower({column}), :query) > 0 {ranking}"
+        return [isbn for isbn, in self.connection.execute(statement, parameters)]
+
+    def search_books(self, query, by="title"):
+        """SQLite operations.search_books."""
+        return len(self.find_books(query, by, limit=1)) > 0
+
+    def update_book(self, isbn, title=None, author=None, genre=None, total_copies=None):
+        """SQLite operations.update_book: like it, applies only the first field given."""
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT rowid, title, author, total_copies, original_copies FROM books WHERE isbn = ?", (isbn,)
+            ).fetchone() if isinstance(isbn, str) else None
+            if row is None:
+                return operations._fail("unknown_book")
+            rowid, old_title, old_author, shelf, original = row
+            if title is not None or author is not None:
+                if title is not None and not isinstance(title, str):
+                    return operations._fail("invalid_title")
+                if title is None and not isinstance(author, str):
+                    return operations._fail("invalid_author")
+                new_title, new_author = (title, old_author) if title is not None else (old_title, author)
+                self._unindex_text([(rowid, old_title, old_author)])
+                connection.execute("UPDATE books SET title = ?, author = ? WHERE rowid = ?",
+                                   (new_title, new_author, rowid))
+                self._index_text([(rowid, new_title, new_author)])
+                return True
+            if genre is not None:
+                if not isinstance(genre, str) or genre not in operations.genres:
+                    return operations._fail("invalid_genre")
+                connection.execute("UPDATE books SET genre = ? WHERE isbn = ?", (genre, isbn))
+                return True
+            if total_copies is not None:
+                if not isinstance(total_copies, int) or total_copies < 0:
+                    return operations._fail("invalid_copies")
+                if total_copies < original - shelf:
+                    return operations._fail("copies_on_loan")
+                connection.execute("UPDATE books SET total_copies = ?, original_copies = ? WHERE isbn = ?",
+                                   (total_copies, max(original, total_copies), isbn))
+                return True
+            return operations._fail("nothing_to_update")
+
+    def update_member(self, member_id, name=None, email=None):
+        """SQLite operations.update_member: applies only the first field given."""
+        if not isinstance(member_id, str):
+            return operations._fail("invalid_member_id")
+        if member_id not in self.members:
+            return operations._fail("unknown_member")
+        if name is not None:
+            if not isinstance(name, str) or len(name.strip()) == 0:
+                return operations._fail("invalid_name")
+            self.connection.execute("UPDATE members SET name = ? WHERE member_id = ?", (name, member_id))
+            return True
+        if email is not None:
+            if not isinstance(email, str) or "@" not in email or "." not in email:
+                return operations._fail("invalid_email")
+            self.connection.execute("UPDATE members SET email = ? WHERE member_id = ?", (email, member_id))
+            return True
+        return operations._fail("nothing_to_update")
+
+    def delete_book(self, isbn):
+        """SQLite operations.delete_book."""
+        if not isinstance(isbn, str):
+            return operations._fail("unknown_book")
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT rowid, title, author, total_copies, original_copies FROM books WHERE isbn = ?", (isbn,)
+            ).fetchone()
+            if row is None:
+                return operations._fail("unknown_book")
+            if row[4] - row[3] > 0:
+                return operations._fail("copies_on_loan")
+            self._unindex_text([row[:3]])
+            connection.execute("DELETE FROM books WHERE rowid = ?", (row[0],))
+        return True
+
+    def delete_member(self, member_id):
+        """SQLite operations.delete_member."""
+        if not isinstance(member_id, str):
+            return operations._fail("invalid_member_id")
+        with self._transaction() as connection:
+            if member_id not in self.members:
+                return operations._fail("unknown_member")
+            if connection.execute("SELECT 1 FROM loans WHERE member_id = ? LIMIT 1", (member_id,)).fetchone():
+                return operations._fail("books_on_loan")
+            connection.execute("DELETE FROM members WHERE member_id = ?", (member_id,))
+        return True
+
+    def borrow_book(self, isbn, member_id):
+        """SQLite operations.borrow_book; the checks and the change form one transaction."""
+        if not isinstance(isbn, str) or not isinstance(member_id, str):
+            return operations._fail("invalid_arguments")
+        with self._transaction():
+            return self._borrow(isbn, member_id)
+
+    def _borrow(self, isbn, member_id):
+        connection = self.connection
+        row = connection.execute("SELECT total_copies FROM books WHERE isbn = ?", (isbn,)).fetchone()
+        if row is None:
+            return operations._fail("unknown_book")
+        if row[0] <= 0:
+            return operations._fail("no_copies_available")
+        if member_id not in self.members:
+            return operations._fail("unknown_member")
+        borrowed = self._borrowed(member_id)
+        if len(borrowed) >= BORROW_LIMIT:
+            return operations._fail("borrow_limit_reached")
+        if isbn in borrowed:
+            return operations._fail("already_borrowed")
+        now = operations.clock()
+        connection.execute("UPDATE books SET total_copies = total_copies - 1 WHERE isbn = ?", (isbn,))
+        connection.execute("INSERT INTO loans (isbn, member_id, borrowed_at, due_at) VALUES (?, ?, ?, ?)",
+                           (isbn, member_id, now, now + LOAN_PERIOD))
+        return True
+
+    def return_book(self, isbn, member_id):
+        """SQLite operations.return_book."""
+        if not isinstance(isbn, str) or not isinstance(member_id, str):
+            return operations._fail("invalid_arguments")
+        with self._transaction():
+            return self._return(isbn, member_id)
+
+    def _return(self, isbn, member_id):
+        connection = self.connection
+        if isbn not in self.books:
+            return operations._fail("unknown_book")
+        if member_id not in self.members:
+            return operations._fail("unknown_member")
+        if connection.execute("DELETE FROM loans WHERE isbn = ? AND member_id = ?", (isbn, member_id)).rowcount == 0:
+            return operations._fail("not_borrowed")
+        connection.execute("UPDATE books SET total_copies = total_copies + 1 WHERE isbn = ?", (isbn,))
+        return True
+
+    def borrow_many(self, pairs, atomic=False):
+        """SQLite operations.borrow_many, in one transaction."""
+        return self._circulate_many(pairs, atomic, self._borrow)
+
+    def return_many(self, pairs, atomic=False):
+        """SQLite operations.return_many, in one transaction."""
+        return self._circulate_many(pairs, atomic, self._return)
+
+    def _circulate_many(self, pairs, atomic, apply):
+        pairs = [tuple(pair) for pair in pairs]
+        results = []
+        try:
+            with self._transaction():
+                for pair in pairs:
+                    done = len(pair) == 2 and all(isinstance(key, str) for key in pair) and apply(*pair)
+                    results.append(done)
+                    if atomic and not done:
+                        raise _RolledBack
+        except _RolledBack:
+            return operations._fail("batch_rolled_back")
+        return True if atomic else results
+
+    def current_borrowers(self, isbn):
+        """SQLite operations.current_borrowers."""
+        return [member_id for member_id, in self.connection.execute(
+            "SELECT member_id FROM loans WHERE isbn = ? ORDER BY loan_id", (isbn,))]
+
+    def member_loans(self, member_id):
+        """SQLite operations.member_loans."""
+        return [Loan(*row) for row in self.connection.execute(
+            "SELECT isbn, member_id, borrowed_at, due_at FROM loans WHERE member_id = ? ORDER BY loan_id",
+            (member_id,))]
+
+    def overdue_loans(self, now=None):
+        """SQLite operations.overdue_loans: each overdue loan is reported once."""
+        now = operations.clock() if now is None else now
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT loan_id, isbn, member_id, borrowed_at, due_at FROM loans "
+                "WHERE overdue_reported = 0 AND due_at < ? ORDER BY due_at, loan_id", (now,)).fetchall()
+            connection.executemany("UPDATE loans SET overdue_reported = 1 WHERE loan_id = ?",
+                                   [(row[0],) for row in rows])
+        return [Loan(*row[1:]) for row in rows]
+
+
+def measure(count=100_000, samples=10_000, directory=None):
+    """
+    Loads count synthetic books and members into the in-memory library and into a
+    SQLite file, then times samples borrow/return pairs and title searches on both.
+    Returns the per-call timings in seconds.
+    """
+    books = list(benchmarks.generate_books(count))
+    members = [(f"M{number:07d}", f"Member {number}", f"m{number}@example.com") for number in range(count)]
+    pairs = [(books[number % count][0], members[number * 7 % count][0]) for number in range(samples)]
+    queries = [book[1].split()[0][1:] for book in books[:samples // 10 or 1]]
+
+    def run(library):
+        started = time.perf_counter()
+        for pair in pairs:
+            library.borrow_book(*pair)
+            library.return_book(*pair)
+        circulation = (time.perf_counter() - started) / (2 * len(pairs))
+        started = time.perf_counter()
+        for query in queries:
+            library.find_books(query, limit=20)
+        return circulation, (time.perf_counter() - started) / len(queries)
+
+    operations.reset_library()
+    operations.add_books_bulk(books)
+    operations.add_members_bulk(members)
+    memory_circulation, memory_search = run(operations)
+    operations.reset_library()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(directory or scratch, "library.db")
+        with SQLiteLibrary(path) as library:
+            started = time.perf_counter()
+            library.add_books_bulk(books)
+            library.add_members_bulk(members)
+            load_seconds = time.perf_counter() - started
+            sqlite_circulation, sqlite_search = run(library)
+            library.reset_library()
+    return {"books": count, "sqlite_load_seconds": load_seconds,
+            "memory_circulation": memory_circulation, "sqlite_circulation": sqlite_circulation,
+            "memory_search": memory_search, "sqlite_search": sqlite_search}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the SQLite backend with the in-memory library.")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--samples", type=int, default=10_000)
+    parser.add_argument("--directory", help="directory for the database file (default: a temporary one)")
+    arguments = parser.parse_args()
+    print(measure(arguments.size, arguments.samples, arguments.directory))
@@ -0,0 +1,110 @@
+import threading
+
+# Members holding this many books cannot borrow more
+BORROW_LIMIT = 3
+
+
+class CirculationStats:
+    """
+    Incrementally maintained circulation aggregates, so dashboards read counters
+    instead of scanning every book and member. Each change is applied as "remove the
+    record's old contribution, add its new one", which costs O(1) per operation.
+    Updates take a lock, since threadsafe.py runs operations on different books
+    concurrently.
+    """
+
+    def __init__(self):
+        self.titles = {}  # genre -> number of titles
+        self.copies = {}  # genre -> copies owned (original_copies)
+        self.on_loan = {}  # genre -> copies currently lent out
+        self.unavailable = 0  # Titles with copies but none on the shelf
+        self.members = 0
+        self.members_at_limit = 0  # Members holding BORROW_LIMIT books
+        self.pending = None  # (books source, members source) still to be counted
+        self.lock = threading.RLock()
+
+    def clear(self):
+        """Resets every counter to zero."""
+        self.titles.clear()
+        self.copies.clear()
+        self.on_loan.clear()
+        self.unavailable = 0
+        self.members = 0
+        self.members_at_limit = 0
+        self.pending = None
+
+    def load(self, books_source, members_source):
+        """
+        Replaces the counters with totals over the books and members returned by the
+        sources. Like SearchIndex.load, counting is deferred until the next read, so the
+        sources must read the live data; changes made in the meantime are ignored.
+        """
+        self.clear()
+        self.pending = (books_source, members_source)
+
+    def add_book(self, book, sign=1):
+        """Adds a book's contribution to the counters (or removes it with sign=-1)."""
+        if self.pending is not None:
+            return
+        genre = book.genre
+        with self.lock:
+            self.titles[genre] = self.titles.get(genre, 0) + sign
+            self.copies[genre] = self.copies.get(genre, 0) + sign * book.original_copies
+            self.on_loan[genre] = self.on_loan.get(genre, 0) + sign * (book.original_copies - book.total_copies)
+            if book.total_copies == 0 and book.original_copies > 0:
+                self.unavailable += sign
+
+    def remove_book(self, book):
+        """Removes a book's contribution, e.g. before the book changes."""
+        self.add_book(book, -1)
+
+    def add_member(self, member, sign=1):
+        """Adds a member's contribution to the counters (or removes it with sign=-1)."""
+        if self.pending is not None:
+            return
+        with self.lock:
+            self.members += sign
+            if len(member.borrowed_books) >= BORROW_LIMIT:
+                self.members_at_limit += sign
+
+    def remove_member(self, member):
+        """Removes a member's contribution, e.g. before the member changes."""
+        self.add_member(member, -1)
+
+    def _build(self):
+        """Counts the pending sources, if any."""
+        with self.lock:
+            if self.pending is None:
+                return
+            books_source, members_source = self.pending
+            self.pending = None
+            for book in books_source():
+                self.add_book(book)
+            for member in members_source():
+                self.add_member(member)
+
+    def genre_stats(self):
+        """Returns {genre: {"titles", "copies", "on_loan", "utilization"}} for genres with titles."""
+        self._build()
+        with self.lock:
+            return {genre: {"titles": titles, "copies": self.copies[genre], "on_loan": self.on_loan[genre],
+                            "utilization": self.on_loan[genre] / self.copies[genre] if self.copies[genre] else 0.0}
+                    for genre, titles in self.titles.items() if titles}
+
+    def summary(self):
+        """Returns the library-wide totals."""
+        self._build()
+        with self.lock:
+            titles = sum(self.titles.values())
+            copies = sum(self.copies.values())
+            on_loan = sum(self.on_loan.values())
+            unavailable, members, members_at_limit = self.unavailable, self.members, self.members_at_limit
+        return {
+            "titles": titles,
+            "copies": copies,
+            "on_loan": on_loan,
+            "utilization": on_loan / copies if copies else 0.0,
+            "unavailable_titles": unavailable,
+            "members": members,
+            "members_at_limit": members_at_limit
+        }
@@ -0,0 +1,231 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+import columnar
+import operations
+from records import Book, Member, Record
+
+# File names used inside a storage directory
+JOURNAL_FILE = "journal.log"
+SNAPSHOT_FILE = "snapshot.json"
+
+
+class Journal:
+    """
+    Append-only write-ahead log of successful mutations in the operations module.
+    Records are buffered and written with a single fsync per batch (group commit):
+    the buffer is flushed once it holds batch_size records, and a timer flushes it at
+    most flush_interval seconds after the first record buffered, even if no further
+    mutation arrives. After compact_every records the state is compacted into a
+    snapshot and the log is truncated. When mutations run on several threads, pass
+    compact_every=None and compact through threadsafe.compact instead, which pauses
+    the other threads so the snapshot matches the log position. With
+    columnar_books=True the books are snapshotted in the memory-mapped columnar
+    format and served lazily on reload.
+    """
+
+    def __init__(self, directory, batch_size=256, flush_interval=0.05, compact_every=100_000, columnar_books=False):
+        self.directory = directory
+        self.columnar_books = columnar_books
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.sequence = 0  # Sequence number of the last journaled record
+        self.since_snapshot = 0  # Records appended since the last snapshot
+        self.replayed = 0  # Records replayed from the log when the store was opened
+        self.replay_seconds = 0.0  # Time spent loading the snapshot and replaying the log
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.file = None
+        self.timer = None  # Pending flush of the buffered records
+        self.lock = threading.Lock()  # Mutations may be journaled from several threads
+
+    def record(self, operation, args, kwargs):
+        """Mutation listener: appends one operation to the log."""
+        with self.lock:
+            self.sequence += 1
+            self.since_snapshot += 1
+            # The clock reading lets replay reproduce loan timestamps
+            record = [self.sequence, operation, args, kwargs, operations.clock()]
+            self.buffer.append(json.dumps(record, separators=(",", ":")) + "\n")
+            if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self._flush_due)
+                self.timer.daemon = True
+                self.timer.start()
+            if self.compact_every and self.since_snapshot >= self.compact_every:
+                self._compact()
+
+    def flush(self):
+        """Writes the buffered records and forces them to disk."""
+        with self.lock:
+            self._flush()
+
+    def _flush_due(self):
+        """Timer callback: writes the records buffered since the timer was started."""
+        with self.lock:
+            self.timer = None
+            if self.file is not None:
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.buffer.clear()
+        self.last_flush = time.monotonic()
+
+    def compact(self):
+        """Writes the current state to a snapshot and truncates the log."""
+        with self.lock:
+            self._compact()
+
+    def _compact(self):
+        self._flush()
+        state = {
+            "sequence": self.sequence,
+            "members": operations.members,
+            "loans": [loan for held in operations.loans.by_member.values() for loan in held.values()],
+            "holds": operations.holds.all_holds()
+        }
+        if self.columnar_books:
+            books_file = f"books-{self.sequence}.col"
+            columnar.write_catalog(os.path.join(self.directory, books_file), operations.books)
+            state["books_file"] = books_file
+        else:
+            books = operations.books
+            state["books"] = books if isinstance(books, dict) else dict(books.items())
+
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as snapshot:
+            json.dump(state, snapshot, separators=(",", ":"), default=Record.to_dict)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+        for name in os.listdir(self.directory):
+            if name.startswith("books-") and name.endswith(".col") and name != state.get("books_file"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass  # Still mapped on platforms that forbid removing open files
+        # Records up to the snapshot sequence are skipped on replay, so a crash
+        # before the truncation below cannot apply them twice.
+        self.file.seek(0)
+        self.file.truncate()
+        self.since_snapshot = 0
+
+    def close(self):
+        """Flushes the log and stops journaling further mutations."""
+        with self.lock:
+            if self.file is None:
+                return
+            self._flush()
+            self.file.close()
+            self.file = None
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if self.record in operations.mutation_listeners:
+            operations.mutation_listeners.remove(self.record)
+
+
+def open_store(directory, batch_size=256, flush_interval=0.05, compact_every=100_000, columnar_books=False):
+    """
+    Loads the library from the snapshot and log in the directory, then journals every
+    later mutation there. Any books and members already in memory are discarded.
+    A snapshot written in the columnar format replaces operations.books with a lazy
+    mapping, so code should read operations.books rather than an imported name.
+    Returns the Journal, which reports the replay statistics.
+    """
+    os.makedirs(directory, exist_ok=True)
+    journal = Journal(directory, batch_size, flush_interval, compact_every, columnar_books)
+    started = time.perf_counter()
+
+    operations.reset_library()
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, encoding="utf-8") as snapshot:
+            state = json.load(snapshot)
+        journal.sequence = state["sequence"]
+        operations.members.update(
+            (member_id, Member.from_dict(member)) for member_id, member in state["members"].items()
+        )
+        if "books_file" in state:
+            columnar.open_catalog(os.path.join(directory, state["books_file"]))
+        else:
+            operations.books.update((isbn, Book.from_dict(book)) for isbn, book in state["books"].items())
+            operations.rebuild_indexes()
+        for loan in state.get("loans", ()):
+            operations.loans.open(loan["isbn"], loan["member_id"], loan["borrowed_at"], loan["due_at"])
+        for hold in state.get("holds", ()):
+            operations.holds.place(hold["isbn"], hold["member_id"], hold["priority"], hold["placed_at"],
+                                   hold["expires_at"])
+
+    journal_path = os.path.join(directory, JOURNAL_FILE)
+    if os.path.exists(journal_path):
+        clock = operations.clock
+        with open(journal_path, "r+b") as log:
+            valid_length = 0
+            for line in log:
+                try:
+                    record = json.loads(line)
+                    sequence, operation, args, kwargs = record[:4]
+                except (ValueError, TypeError):
+                    break  # Torn write at the tail of the log
+                # Records written before loans were tracked carry no clock reading
+                recorded_at = record[4] if len(record) > 4 else clock()
+                valid_length += len(line)
+                if sequence <= journal.sequence:
+                    continue
+                operations.clock = lambda: recorded_at
+                try:
+                    getattr(operations, operation)(*args, **kwargs)
+                finally:
+                    operations.clock = clock
+                journal.sequence = sequence
+                journal.replayed += 1
+            # Drop the torn tail so new records are not appended after it
+            log.truncate(valid_length)
+    journal.since_snapshot = journal.replayed
+    journal.replay_seconds = time.perf_counter() - started
+
+    journal.file = open(journal_path, "a", encoding="utf-8")
+    operations.mutation_listeners.append(journal.record)
+    atexit.register(journal.close)
+    return journal
+
+
+def measure(directory, count=100_000):
+    """
+    Journals count add_book calls into the directory, then reopens the store.
+    Returns the per-mutation write overhead and the reload time in seconds.
+    """
+    journal = open_store(directory)
+    started = time.perf_counter()
+    for number in range(count):
+        operations.add_book(f"B{number:07d}", f"Title {number}", f"Author {number % 1000}", "Fiction", 1)
+    journal.close()
+    write_seconds = time.perf_counter() - started
+
+    journal = open_store(directory)
+    journal.close()
+    return {
+        "records": count,
+        "write_seconds_per_mutation": write_seconds / count,
+        "reload_seconds": journal.replay_seconds
+    }
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as scratch:
+        print(measure(scratch, total))
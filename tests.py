@@ -3,6 +3,31 @@
 # This allows the test script to access all library management operations such as
 # adding, updating, deleting books and members, as well as borrowing and returning books.
 from operations import *
+import analytics
+import asyncio
+import benchmarks
+import browse_index
+import columnar
+import demo
+import events
+import import_export
+import instrumentation
+import io
+import json
+import operations
+import random
+import service
+import search_index
+import sharding
+import sqlite_store
+import storage
+import sys
+import tempfile
+import threading
+import time
+import transactions
+import threadsafe
+import workload
 
 #TEST CASES
 
@@ -115,6 +140,20 @@ assert search_books("Emotional Intelligence", by="title") == False
 #Search for non-existent author returns False
 assert search_books("Mohamed Kamara", by="author") == False
 
+# Find Books
+# Substring matches inside a word are found through the index
+assert find_books("thon") == ["SL001"]
+
+# Results are ranked by match position and can be paginated
+assert find_books("s") == ["SL004", "SL002", "SL005", "SL003"]
+assert find_books("s", offset=1, limit=2) == ["SL002", "SL005"]
+
+# Search by author returns every book by that author
+assert find_books("kargbo", by="author") == ["SL001", "SL003"]
+
+# Fail: Non-string query returns no results
+assert find_books(None) == []
+
 # Delete Book Cases
 # Delete book SL005 successfully
 assert delete_book("SL005") == True
@@ -182,4 +221,793 @@ assert return_book("SL010", "905000001") == False
 # Fail: Member does not exist
 assert return_book("SL001", "905099999") == False
 
+# Member Registry
+# Members are keyed by member ID and keep their enrollment order
+assert list(members) == ["905000001", "905000002"]
+
+# Deleted members are no longer present in the registry
+assert "905000003" not in members
+
+# Compact Records
+# Books and members still read like dictionaries
+assert books["SL004"] == {"title": "Discrete Mathematics", "author": "Ibrahim Swarray", "genre": "Non-Fiction",
+                          "total_copies": 2, "original_copies": 2}
+assert dict(members["905000001"]) == {"member_id": "905000001", "name": "Sorie Kamara",
+                                      "email": "sorie.kamara@gmail.com", "borrowed_books": ("SL003", "SL001")}
+
+# Genre strings are shared with the predefined genres tuple
+assert books["SL002"]["genre"] is genres[0]
+
+# Bulk Operations
+# Each record gets its own result; duplicates within the batch and against the store are rejected
+assert add_books_bulk([
+    ("SL401", "Graph Theory", "Kumba Sesay", "Non-Fiction", 2),
+    ("SL402", "Number Theory", "Kumba Sesay", "Non-Fiction", 1),
+    ("SL402", "Duplicate In Batch", "Kumba Sesay", "Non-Fiction", 1),
+    ("SL001", "Duplicate In Store", "Kumba Sesay", "Non-Fiction", 1),
+    ("SL403", "Bad Genre", "Kumba Sesay", "Article", 1)
+]) == [True, True, False, False, False]
+assert search_books("graph") == True
+
+# Fail: An atomic batch with an invalid record adds nothing
+assert add_books_bulk([("SL404", "Topology", "Haja Barrie", "Non-Fiction", 1),
+                       ("SL405", "Geometry", "Haja Barrie", "Non-Fiction", -1)], atomic=True) == False
+assert "SL404" not in books
+
+assert add_members_bulk([
+    ("905040001", "Isata Koroma", "isata.koroma@gmail.com"),
+    ("905040001", "Isata Koroma", "isata.koroma@gmail.com"),
+    ("905040002", "", "empty.name@gmail.com")
+]) == [True, False, False]
+
+assert borrow_many([("SL401", "905040001"), ("SL402", "905040001"), ("SL402", "905040001")]) == [True, True, False]
+assert return_many([("SL402", "905040001"), ("SL010", "905040001")]) == [True, False]
+
+# Fail: An atomic batch is rolled back when a checkout fails
+assert borrow_many([("SL402", "905040001"), ("SL010", "905040001")], atomic=True) == False
+assert members["905040001"]["borrowed_books"] == ("SL401",)
+assert books["SL402"]["total_copies"] == 1
+assert return_many([("SL401", "905040001")], atomic=True) == True
+
+# Loans
+# Borrowers are indexed by ISBN and loans by member, with borrow and due times
+operations.clock = lambda: 1_000_000.0
+assert add_book("SL701", "Due Dates", "Kumba Sesay", "Fiction", 2) == True
+assert borrow_book("SL701", "905000001") == True
+operations.clock = lambda: 1_000_100.0
+assert borrow_book("SL701", "905000002") == False  # At the 3-book limit
+assert borrow_book("SL701", "905040001") == True
+assert current_borrowers("SL701") == ["905000001", "905040001"]
+loan = member_loans("905000001")[-1]
+assert (loan.isbn, loan.borrowed_at, loan.due_at) == ("SL701", 1_000_000.0, 1_000_000.0 + loans.loan_period)
+
+# A bulk add larger than the catalog rebuilds the indexes but keeps the open loans' times
+operations.clock = lambda: 1_000_200.0
+filler = [(f"SL8{number:04}", "Bulk Filler", "Kumba Sesay", "Fiction", 1) for number in range(len(books) + 1)]
+assert add_books_bulk(filler, atomic=True) == True
+assert member_loans("905000001")[-1].borrowed_at == 1_000_000.0
+assert all(delete_book(record[0]) for record in filler)
+
+# Overdue sweeps report each expired loan once, earliest first
+assert [loan.member_id for loan in overdue_loans(1_000_000.0 + loans.loan_period + 1)
+        if loan.isbn == "SL701"] == ["905000001"]
+assert overdue_loans(1_000_000.0 + loans.loan_period + 1) == []
+
+# Returned loans disappear from both indexes
+assert return_book("SL701", "905040001") == True
+assert current_borrowers("SL701") == ["905000001"]
+assert all(loan.isbn != "SL701" for loan in member_loans("905040001"))
+assert return_book("SL701", "905000001") == True
+operations.clock = time.time
+
+# Holds
+# Holds queue by priority, then placement order, and skip expired entries
+assert add_book("HL0001", "Held Title", "Held Author", "Fiction", 1)
+for member_id in ("HM0001", "HM0002", "HM0003", "HM0004"):
+    assert add_member(member_id, "Hold Member", "hold@example.com")
+assert not place_hold("HL0001", "HM0002")  # Fail: A copy is still on the shelf
+assert borrow_book("HL0001", "HM0001")
+assert place_hold("HL0001", "HM0002")
+assert place_hold("HL0001", "HM0003", priority=5)
+operations.clock = lambda: 1_000_000.0
+assert place_hold("HL0001", "HM0004", priority=9, expires_in=60)
+assert not place_hold("HL0001", "HM0001", expires_in=0)  # Fail: Invalid expiry
+operations.clock = lambda: 1_000_061.0  # HM0004's hold has expired
+assert not place_hold("HL0001", "HM0002")  # Fail: Already waiting
+assert not place_hold("HL0001", "HM0001")  # Fail: Already holds the book
+assert hold_queue("HL0001") == ["HM0003", "HM0002"]
+# A return hands the copy straight to the next waiting member
+assert return_book("HL0001", "HM0001")
+assert books["HL0001"].total_copies == 0
+assert members["HM0003"].borrowed_books == ("HL0001",)
+assert current_borrowers("HL0001") == ["HM0003"]
+assert hold_queue("HL0001") == ["HM0002"]
+assert cancel_hold("HL0001", "HM0002")
+assert not cancel_hold("HL0001", "HM0002")
+assert return_book("HL0001", "HM0003")
+assert books["HL0001"].total_copies == 1
+operations.clock = time.time
+
+# Circulation Stats
+# Counters maintained by each operation match a full rescan of the catalog
+
+
+def rescanned_stats():
+    scan = operations.CirculationStats()
+    scan.load(lambda: books.values(), lambda: members.values())
+    return scan
+
+
+def rescanned_summary():
+    return rescanned_stats().summary()
+
+
+before = circulation_summary()
+assert before == rescanned_summary()
+assert add_book("ST0001", "Counted", "Stat Author", "Mystery", 2)
+assert add_member("STM001", "Stat Member", "stat@example.com")
+assert borrow_book("ST0001", "STM001")
+assert borrow_book("ST0001", "905000002") == False
+summary = circulation_summary()
+assert summary["titles"] == before["titles"] + 1
+assert summary["copies"] == before["copies"] + 2
+assert summary["on_loan"] == before["on_loan"] + 1
+assert summary["members"] == before["members"] + 1
+assert genre_stats() == rescanned_stats().genre_stats()
+assert title_stats("ST0001") == {"copies": 2, "on_loan": 1, "utilization": 0.5, "holds": 0}
+assert title_stats("missing") is None
+assert update_book("ST0001", genre="Biography")
+assert genre_stats() == rescanned_stats().genre_stats()
+assert return_book("ST0001", "STM001")
+assert update_book("ST0001", total_copies=5)
+assert circulation_summary() == rescanned_summary()
+assert delete_book("ST0001")
+assert delete_member("STM001")
+assert circulation_summary() == before
+
+# Instrumentation
+# Enabled instrumentation counts calls through the operations module, with failure reasons
+instrumentation.reset()
+instrumentation.enable()
+assert operations.add_book("IN0001", "Measured", "Metric Author", "Poetry", 1) == False
+assert operations.add_book("IN0001", "Measured", "Metric Author", "Fiction", 1) == True
+assert operations.add_book("IN0001", "Measured", "Metric Author", "Fiction", 1) == False
+assert operations.borrow_many([("IN0001", "905000002"), ("IN0001", "905040001")]) == [False, True]
+assert operations.search_books("Measured") == True  # Runs find_books internally
+profiler = instrumentation.attach_profiler("return_book")
+assert operations.return_book("IN0001", "905040001") == True
+assert instrumentation.detach_profiler("return_book") is profiler
+instrumentation.disable()
+assert operations.delete_book("IN0001") == True
+assert operations.delete_book is delete_book
+assert "delete_book" not in instrumentation.metrics()
+recorded = instrumentation.metrics()["add_book"]
+assert recorded["calls"] == 3
+assert recorded["failures"] == 2
+assert recorded["reasons"] == {"unknown_genre": 1, "duplicate_isbn": 1}
+# Calls operations make to each other are counted as the outer call only
+assert instrumentation.metrics()["search_books"]["calls"] == 1
+assert "find_books" not in instrumentation.metrics()
+assert "return_book" in instrumentation.profile_report(profiler)
+exported = instrumentation.export_prometheus()
+assert 'library_operation_failures_total{operation="add_book",reason="duplicate_isbn"} 1' in exported
+assert 'library_operation_duration_seconds_count{operation="borrow_many"} 1' in exported
+assert 'library_operation_duration_seconds_bucket{operation="add_book",le="+Inf"} 3' in exported
+
+# Sharding
+# Calls are routed to the owning shard, and cross-shard borrows commit or abort on both shards
+
+
+def sharding_tests():
+    with sharding.ShardedLibrary(workers=2) as library:
+        isbns = [f"SH{number:04d}" for number in range(6)]
+        member_ids = [f"SM{number:04d}" for number in range(6)]
+        assert library.add_books_bulk([(isbn, f"Shard Title {isbn}", "Shard Author", "Fiction", 1)
+                                       for isbn in isbns])
+        assert all(library.add_members_bulk([(member_id, "Shard Member", "shard@example.com")
+                                             for member_id in member_ids]))
+        isbn = next(isbn for isbn in isbns if library.shard_of(isbn) != library.shard_of(member_ids[0]))
+        other = next(member_id for member_id in member_ids
+                     if library.shard_of(member_id) == library.shard_of(member_ids[0]) and member_id != member_ids[0])
+        pairs = [(isbn, member_ids[0]), (isbn, other), (isbn, member_ids[0])]
+        assert library.borrow_many(pairs) == [True, False, False]
+        assert library.current_borrowers(isbn) == [member_ids[0]]
+        assert [loan.isbn for loan in library.member_loans(member_ids[0])] == [isbn]
+        assert library.circulation_summary()["on_loan"] == 1
+        assert library.cross_shard == 3
+        assert library.return_book(isbn, other) == False
+        assert library.return_book(isbn, member_ids[0]) == True
+        assert library.circulation_summary()["on_loan"] == 0
+        assert library.find_books("shard title", limit=2) == isbns[:2]
+        assert library.add_book(isbns[0], "Duplicate", "Shard Author", "Fiction", 1) == False
+        # A failed prepare aborts the other shard's tentative half of the transaction
+        member_id = next(member_id for member_id in member_ids if library.shard_of(member_id) != library.shard_of(None))
+        txid = next(library.transactions)
+        batches = {library.shard_of(None): [("_prepare", (txid, "book", "borrow", [isbns[1]], member_id))],
+                   library.shard_of(member_id): [("_prepare", (txid, "member", "borrow", isbns[1], member_id))]}
+        try:
+            library._exchange(batches)
+            assert False, "an unhashable ISBN should fail the book shard's prepare"
+        except sharding.RemoteError:
+            pass
+        assert library._broadcast("_abort", (txid,)) == [False, False]  # Nothing left prepared
+        assert library.borrow_many([(isbn, member_id) for isbn in isbns[1:4]]) == [True, True, True]
+
+
+# Spawned shard processes import this script, so they must not start shards of their own
+if __name__ == "__main__":
+    sharding_tests()
+
+# Transactions
+# A committed transaction applies every staged call; records read earlier keep their values
+assert add_book("TX0001", "Before", "Tx Author", "Fiction", 2)
+assert add_member("TXM001", "Tx Member", "tx@example.com")
+before_book = books["TX0001"]
+with transactions.begin() as transaction:
+    transaction.update_book("TX0001", title="After", total_copies=3)
+    transaction.borrow_book("TX0001", "TXM001")
+assert transaction.committed == True
+assert (books["TX0001"].title, books["TX0001"].total_copies) == ("After", 2)
+assert (before_book.title, before_book.total_copies) == ("Before", 2)
+assert find_books("after") == ["TX0001"]
+assert current_borrowers("TX0001") == ["TXM001"]
+
+# Fail: One failing call rolls back the whole transaction, indexes and counters included
+summary = circulation_summary()
+transaction = transactions.begin()
+transaction.add_book("TX0002", "Rolled Back", "Tx Author", "Fiction", 1)
+transaction.return_book("TX0001", "TXM001")
+transaction.update_member("TXM001", name="Renamed")
+transaction.borrow_book("TX0001", "905000002")  # At the borrowing limit
+assert transaction.commit() == False
+assert "TX0002" not in books
+assert find_books("rolled back") == []
+assert members["TXM001"].borrowed_books == ("TX0001",)
+assert members["TXM001"].name == "Tx Member"
+assert books["TX0001"].total_copies == 2
+assert current_borrowers("TX0001") == ["TXM001"]
+assert circulation_summary() == summary == rescanned_summary()
+assert transactions.read(lambda: (books["TX0001"].total_copies, members["TXM001"].borrowed_books)) == (2, ("TX0001",))
+assert return_book("TX0001", "TXM001")
+assert delete_book("TX0001")
+assert delete_member("TXM001")
+
+# Fuzzy Search
+# Misspelled words still find books, closest matches first
+assert add_book("FZ0001", "The Hobbit", "John Tolkien", "Fiction", 1)
+assert add_book("FZ0002", "The Habit Loop", "Jon Toklien", "Non-Fiction", 1)
+assert fuzzy_find_books("hobit") == ["FZ0001", "FZ0002"]
+assert fuzzy_find_books("hobit", offset=1, limit=1) == ["FZ0002"]
+assert fuzzy_find_books("hobit", limit=1) == ["FZ0001"]
+assert fuzzy_find_books("Tolkein", by="author") == ["FZ0001"]  # "Toklien" is 3 edits away
+assert fuzzy_find_books("hobbit loop") == ["FZ0002"]
+assert fuzzy_find_books("hobbit", max_distance=0) == ["FZ0001"]
+assert fuzzy_find_books("xyzzy") == []
+assert fuzzy_find_books(7) == []
+assert fuzzy_find_books("hobit", limit=-1) == []
+assert update_book("FZ0001", title="The Silmarillion")
+assert fuzzy_find_books("silmarilion") == ["FZ0001"]
+assert fuzzy_find_books("hobit") == ["FZ0002"]
+assert delete_book("FZ0001")
+assert delete_book("FZ0002")
+assert fuzzy_find_books("habit") == []
+
+# Search Cache
+# Repeated queries are served from the cache; only changes to matching texts invalidate them
+cache_before = search_cache_stats()["title"]
+assert add_book("SC0001", "Cached Lighthouse", "Cache Author", "Fiction", 1)
+assert find_books("lighthouse") == ["SC0001"]
+assert find_books("LIGHTHOUSE") == ["SC0001"]
+assert add_book("SC0002", "Unrelated Harbour", "Cache Author", "Fiction", 1)
+assert find_books("lighthouse") == ["SC0001"]
+assert update_book("SC0002", title="Harbour Lighthouse")
+assert find_books("lighthouse") == ["SC0001", "SC0002"]
+cache_after = search_cache_stats()["title"]
+assert cache_after["hits"] - cache_before["hits"] == 2
+assert cache_after["misses"] - cache_before["misses"] == 2
+assert cache_after["invalidations"] - cache_before["invalidations"] == 1
+assert delete_book("SC0001")
+assert delete_book("SC0002")
+assert find_books("lighthouse") == []
+
+# The least recently used entry is evicted first
+index = search_index.SearchIndex(cache_size=2)
+index.add("A", "alpha beta")
+assert index.search("alpha") == index.search("beta") == ["A"]
+assert index.search("alpha") == ["A"]
+assert index.search("gamma") == []
+assert index.search("alpha") == ["A"]
+assert index.search("beta") == ["A"]
+assert index.cache_stats()["evictions"] == 2
+assert index.cache_stats()["hits"] == 2
+
+# Analytics
+# Column reports follow catalog changes and agree with a scan of the dictionary
+columns = analytics.CatalogColumns()
+columns.attach()
+assert add_book("AN0001", "Column One", "Analytics Author", "Sci-Fi", 10)
+assert add_book("AN0002", "Column Two", "Analytics Author", "Sci-Fi", 4)
+assert add_members_bulk([("ANM001", "Analyst", "an@example.com"), ("ANM002", "Analyst", "an@example.com")])
+assert borrow_many([("AN0001", "ANM001"), ("AN0001", "ANM002"), ("AN0002", "ANM001")], atomic=True)
+assert update_book("AN0001", genre="Mystery")
+assert add_books_bulk([("AN0003", "Column Three", "A", "Fiction", 0)])
+assert delete_book("AN0003")
+availability, low, histogram = analytics._dict_reports(0.9)
+assert columns.availability_by_genre() == availability
+assert columns.low_availability(0.9) == low
+assert "AN0001" in low
+assert columns.on_loan_histogram() == [histogram.get(lent, 0) for lent in range(max(histogram) + 1)]
+assert len(columns.free) == 1
+assert add_book("AN0004", "Column Four", "A", "Fiction", 1)
+assert not columns.free
+# The NumPy reports and the loops over the columns agree (only the loops run without NumPy)
+vectorized = analytics.numpy
+reports = []
+for backend in dict.fromkeys((vectorized, None)):
+    analytics.numpy = backend
+    reports.append((columns.availability_by_genre(), columns.low_availability(0.9), columns.on_loan_histogram()))
+analytics.numpy = vectorized
+assert all(report == reports[0] for report in reports)
+columns.detach()
+# Changes made while detached are noticed even when the number of books stays the same
+assert update_book("AN0004", genre="Biography")
+assert columns.availability_by_genre() == analytics._dict_reports()[0]
+assert return_many([("AN0001", "ANM001"), ("AN0001", "ANM002"), ("AN0002", "ANM001")], atomic=True)
+assert all(delete_book(isbn) for isbn in ("AN0001", "AN0002", "AN0004"))
+assert delete_member("ANM001")
+assert delete_member("ANM002")
+
+# Change Events
+# Successful mutations become ordered events carrying the changed records; consumers resume by sequence
+bus = events.EventBus(retain=4, block_timeout=0)
+bus.attach()
+subscription = bus.subscribe(capacity=2)
+assert add_book("EV0001", "Event Book", "Event Author", "Fiction", 1)
+assert not add_book("EV0001", "Again", "A", "Fiction", 1)
+assert add_member("EVM001", "Eve", "eve@example.com")
+assert borrow_book("EV0001", "EVM001")
+batch = subscription.get_batch(timeout=0)
+assert [event.operation for event in batch] == ["add_book", "add_member", "borrow_book"]
+assert [event.sequence for event in batch] == [1, 2, 3]
+assert subscription.get_batch(timeout=0) == []
+assert batch[2].books["EV0001"]["total_copies"] == 0
+assert batch[2].members["EVM001"]["borrowed_books"] == ("EV0001",)
+assert add_member("EVM002", "Ева", "eva@example.com")
+assert place_hold("EV0001", "EVM002")
+assert return_book("EV0001", "EVM001")  # Lends the copy to the member waiting on a hold
+returned = subscription.get_batch(max_events=5, timeout=0)[-1]
+assert returned.members["EVM002"]["borrowed_books"] == ("EV0001",)
+assert returned.holds == {"EV0001": []}
+resumed = bus.subscribe(after=4)
+assert [event.operation for event in resumed.get_batch(timeout=0)] == ["place_hold", "return_book"]
+assert return_book("EV0001", "EVM002")
+assert delete_book("EV0001")
+assert delete_member("EVM001")
+assert subscription.get_batch(max_events=1, timeout=0)[0].operation == "return_book"
+assert delete_member("EVM002")  # The bus now retains events 7 to 10
+assert bus.stats()["lags"] == [3, 4]
+assert subscription.get_batch(timeout=0)[-1].members == {"EVM002": None}
+waiter = threading.Thread(target=lambda: consumed.extend(subscription.get_batch(timeout=5)))
+consumed = []
+waiter.start()
+assert add_book("EV0002", "Event Book", "Event Author", "Fiction", 1)
+waiter.join()
+assert [event.books for event in consumed] == [{"EV0002": books["EV0002"].to_dict()}]
+try:  # Event 7 has left the buffer
+    resumed.get_batch(timeout=0)
+    assert False, "events beyond the retained buffer should be reported lost"
+except events.EventsLost:
+    pass
+assert asyncio.run(subscription.get_batch_async(timeout=0)) == []
+subscription.close()
+resumed.close()
+bus.detach()
+slow = events.EventBus(block_timeout=0.01)  # Publishers wait for a subscriber holding capacity unread events
+slow.attach()
+slow.subscribe(capacity=1)
+assert update_book("EV0002", title="Slow Reader")
+assert delete_book("EV0002")
+assert slow.stats()["blocked_seconds"] >= 0.01
+assert slow.stats()["lags"] == [2]
+slow.detach()
+# An abandoned subscriber holds back only the first publish that finds it full
+abandoned = events.EventBus(block_timeout=0.05)
+abandoned.attach()
+reader = abandoned.subscribe(capacity=1)
+assert add_book("EV0003", "Abandoned", "Event Author", "Fiction", 1)
+for copies in range(2, 12):
+    assert update_book("EV0003", total_copies=copies)
+assert reader.lagging == True
+assert abandoned.stats()["blocked_seconds"] < 0.25  # Waiting on every publish would take 0.5 seconds
+assert len(reader.get_batch(timeout=0)) == 11
+assert reader.lagging == False  # Reading again restores backpressure
+assert delete_book("EV0003")
+abandoned.detach()
+# An empty batch leaves the position alone, and resuming beyond the last event is rejected
+pending = slow.subscribe(after=0)
+assert pending.get_batch(max_events=0, timeout=0) == []
+assert pending.lag() == 2
+assert [event.sequence for event in pending.get_batch(timeout=0)] == [1, 2]
+try:
+    slow.subscribe(after=3)
+    assert False, "resuming after an event not yet published should be rejected"
+except ValueError:
+    pass
+
+# Demo Views
+# Pages format only their own rows; filters and the summary line never walk the whole library
+# More books than one browse page, so the genre filter reads several pages
+assert add_books_bulk([(f"DV{number:04}", f"Demo {number:02}", "Demo Author", "Biography", 1) for number in range(25)],
+                      atomic=True)
+pager = demo.Pager(demo.book_rows(genre="Biography"), lambda row: row[0], page_size=2)
+pages = []
+while not pager.done:
+    pages.append(pager.next_page())
+shown = [isbn for page in pages for isbn in page]
+assert all(len(page) == 2 for page in pages[:-1])
+# Genre pages come from the browse index in title order
+assert shown == browse_books(genre="Biography", limit=len(books))
+assert [isbn for isbn in shown if isbn.startswith("DV")] == [f"DV{number:04}" for number in range(25)]
+assert pager.shown == len(shown) == sum(1 for book in books.values() if book.genre == "Biography")
+assert pager.next_page() == []
+assert add_member("DVM001", "Demo Reader", "demo@example.com")
+assert borrow_book("DV0003", "DVM001")
+output = io.StringIO()
+demo.display_books(member_id="DVM001", out=output)
+assert "ISBN: DV0003" in output.getvalue()
+assert "(1 shown)" in output.getvalue()
+output = io.StringIO()
+demo.display_summary(output)
+assert output.getvalue().startswith(f"Library: {len(books)} titles")
+assert output.getvalue().count("\n") == 1
+# Optional filters re-prompt on malformed input instead of raising, and a blank answer means no filter
+answers = iter(["'Fiction", "Fiction", "'Fiction'", ""])
+demo.input = lambda prompt: next(answers)
+sys.stdout = io.StringIO()
+assert demo.parse_input("Genre: ", expected_type=str, optional=True) == "Fiction"
+assert demo.parse_input("Member ID: ", expected_type=str, optional=True) is None
+sys.stdout = sys.__stdout__
+del demo.input
+assert return_book("DV0003", "DVM001")
+assert delete_member("DVM001")
+assert all(delete_book(f"DV{number:04}") for number in range(25))
+# Batch mode parses typed fields without literal_eval and keeps going after a bad line
+assert demo.parse_command('add_book DV0100 "Batch Book" \'A. Author\' Fiction 2') == (
+    "add_book", ["DV0100", "Batch Book", "A. Author", "Fiction", 2])
+assert demo.parse_command("update_book DV0100 - - Mystery") == ("update_book", ["DV0100", None, None, "Mystery"])
+output = io.StringIO()
+script = ['add_book DV0100 "Batch Book" Author Fiction 1', "# comment", "", "add_member DVM002 Reader r@example.com",
+          "borrow_book DV0100 DVM002", "borrow_book DV0100 DVM002", "lend DV0100", "add_book DV0101 T A Fiction x",
+          "borrow_book DV0100", "return_book DV0100 DVM002", "delete_member DVM002", "delete_book DV0100"]
+totals = demo.run_batch(script, output, failures_only=True)
+assert totals["commands"] == 10
+assert totals["succeeded"] == 6
+assert totals["failed"] == 4
+assert totals["ops_per_sec"] > 0
+assert output.getvalue().splitlines()[0] == "6: borrow_book DV0100 DVM002 -> False"
+# A line missing required arguments is reported as failed instead of stopping the batch
+assert output.getvalue().splitlines()[3] == "9: borrow_book DV0100 -> error: borrow_book takes at least 2 arguments"
+assert len(output.getvalue().splitlines()) == 5
+
+# SQLite Backend
+# The assertions from the top of this file down to Holds pass unchanged against the SQLite store
+with tempfile.TemporaryDirectory() as directory:
+    library = sqlite_store.SQLiteLibrary(f"{directory}/library.db")
+    namespace = {name: getattr(library, name) for name in (
+        "add_book", "add_member", "update_book", "update_member", "search_books", "find_books", "delete_book",
+        "delete_member", "borrow_book", "return_book", "add_books_bulk", "add_members_bulk", "borrow_many",
+        "return_many", "current_borrowers", "member_loans", "overdue_loans")}
+    namespace.update(books=library.books, members=library.members, genres=genres, operations=operations,
+                     loans=operations.loans, time=time)
+    with open(__file__, encoding="utf-8") as source:
+        script = source.read()
+    exec(script[script.index("#TEST CASES"):script.index("# Holds")], namespace)
+    assert library.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert library.text_search
+    # A second connection, as another process would open, shares the data and the borrowing limit
+    other = sqlite_store.SQLiteLibrary(f"{directory}/library.db")
+    assert other.members["905000002"]["borrowed_books"] == library.members["905000002"]["borrowed_books"]
+    assert len(other.members["905000002"]["borrowed_books"]) == 3
+    assert other.borrow_book("SL401", "905000002") == False
+    assert other.add_book("SL901", "Über Python", "Zoë Author", "Fiction", 1)
+    assert library.find_books("über") == ["SL901"]
+    assert library.find_books("THON") == other.find_books("thon") == ["SL901", "SL001"]  # Ranked by match position
+    other.close()
+    # A reset also empties the trigram index, so reused row IDs do not corrupt it
+    library.reset_library()
+    assert library.add_book("SL902", "Python Again", "Zoë Author", "Fiction", 1)
+    assert library.find_books("python") == ["SL902"]
+    library.connection.execute("INSERT INTO book_text (book_text, rank) VALUES ('integrity-check', 1)")
+    library.close()
+
+# Browse
+# Genre and author indexes list books in title order, a keyset page at a time
+assert add_books_bulk([("BR0003", "beta Browse", "Ann  Lee", "Mystery", 1), ("BR0001", "Alpha Browse", "ann lee", "Mystery", 1),
+                       ("BR0002", "Alpha Browse", "Bo Chan", "Sci-Fi", 1)], atomic=True)
+assert browse_books(author="ANN LEE") == ["BR0001", "BR0003"]
+assert browse_books(author="Ann Lee", descending=True) == ["BR0003", "BR0001"]
+mysteries = sorted((book.title.lower(), isbn) for isbn, book in books.items() if book.genre == "Mystery")
+assert browse_books(genre="Mystery", limit=len(books)) == [isbn for _, isbn in mysteries]
+assert browse_books(genre="Mystery", author="ann lee", after="BR0001") == ["BR0003"]
+first = browse_books(limit=2)
+assert first + browse_books(after=first[-1], limit=len(books)) == [isbn for _, isbn in sorted(
+    (book.title.lower(), isbn) for isbn, book in books.items())]
+assert update_book("BR0001", genre="Sci-Fi")
+assert browse_books(genre="Sci-Fi", after=("alpha browse", ""))[:2] == ["BR0001", "BR0002"]
+assert update_book("BR0003", author="Bo Chan")
+assert browse_books(author="bo chan") == ["BR0002", "BR0003"]
+assert update_book("BR0002", title="Zeta Browse")
+assert browse_books(author="bo chan") == ["BR0003", "BR0002"]
+assert delete_book("BR0003")
+assert browse_books(author="bo chan", after=("Beta Browse", "BR0003")) == ["BR0002"]
+assert browse_books(after="BR0003") == []
+assert browse_books(genre="Article") == []
+assert browse_books(limit=-1) == []
+assert not apply_batch([("update_book", ("BR0002", None, "Ann Lee")), ("delete_book", ("BR9999",))])
+assert browse_books(author="bo chan") == ["BR0002"]
+assert browse_books(author="ann lee") == ["BR0001"]
+assert delete_book("BR0001")
+assert delete_book("BR0002")
+assert browse_books(author="bo chan") == []
+keys = browse_index.SortedKeys()
+for number in range(3000):
+    keys.add((number * 7919) % 3001)
+for number in range(0, 3000, 3):
+    keys.remove((number * 7919) % 3001)
+remaining = sorted((number * 7919) % 3001 for number in range(3000) if number % 3)
+assert list(keys.after()) == remaining
+assert len(keys) == 2000
+assert len(keys.chunks) > 1
+assert list(keys.after(1500)) == [key for key in remaining if key > 1500]
+assert list(keys.after(1500, descending=True)) == [key for key in reversed(remaining) if key < 1500]
+
+# Import and Export
+# Exported books and members stream back in, with per-row rejects
+with tempfile.TemporaryDirectory() as directory:
+    for fmt in ("csv", "jsonl"):
+        path = f"{directory}/books.{fmt}"
+        assert import_export.export_books(path)["rows"] == len(books)
+        rejects = []
+        report = import_export.import_books(path, on_reject=lambda line, row, reason: rejects.append(reason))
+        assert report["imported"] == 0
+        assert report["rejected"] == len(books) == len(rejects)
+        assert set(rejects) == {"duplicate_isbn"}  # Each reject carries the reason add_book gives
+
+    with open(f"{directory}/new_books.csv", "w") as source:
+        source.write("isbn,title,author,genre,total_copies\n"
+                     "SL501,Signals,Kairan Lebbie,Non-Fiction,2\n"
+                     "SL502,Systems,Kairan Lebbie,Non-Fiction,two\n"
+                     "SL503,Circuits,Kairan Lebbie,Comics,1\n")
+    rejects = []
+    report = import_export.import_books(f"{directory}/new_books.csv",
+                                        on_reject=lambda line, row, reason: rejects.append((line, reason)))
+    assert report["imported"] == 1
+    assert report["rejected"] == 2
+    assert rejects == [(3, "total_copies is not an integer"), (4, "unknown_genre")]
+    assert books["SL501"]["total_copies"] == 2
+
+    # A book exported while copies are on loan imports back with every copy it owns
+    on_loan = next(isbn for isbn, book in books.items() if book.original_copies > book.total_copies)
+    import_export.export_books(f"{directory}/lent.jsonl")
+    with open(f"{directory}/lent.jsonl") as exported:
+        row = next(row for row in map(json.loads, exported) if row["isbn"] == on_loan)
+    with open(f"{directory}/lent.jsonl", "w") as source:
+        source.write(json.dumps({**row, "isbn": "SL599"}) + "\n")
+    assert import_export.import_books(f"{directory}/lent.jsonl")["imported"] == 1
+    assert books["SL599"]["total_copies"] == books[on_loan]["original_copies"]
+    assert delete_book("SL599") == True
+
+    with open(f"{directory}/new_members.jsonl", "w") as source:
+        source.write('{"member_id": "905050001", "name": "Musa Sawyer", "email": "musa.sawyer@gmail.com"}\n'
+                     'not json\n')
+    report = import_export.import_members(f"{directory}/new_members.jsonl")
+    assert report["imported"] == 1
+    assert report["rejected"] == 1
+    assert import_export.export_members(f"{directory}/members.csv")["rows"] == len(members)
+
+# HTTP Service
+# Requests are served over HTTP/JSON and applied through the batching queue
+async def exercise_service():
+    service_instance = service.LibraryService()
+    ready = asyncio.Event()
+    server = asyncio.create_task(service_instance.serve(port=0, ready=ready))
+    await ready.wait()
+    reader, writer = await asyncio.open_connection("127.0.0.1", service_instance.port)
+    try:
+        assert await service.send_request(reader, writer, "POST", "/books", {
+            "isbn": "SL601", "title": "Web Services", "author": "Julius Kargbo", "genre": "Non-Fiction",
+            "total_copies": 1}) == {"ok": True}
+        assert await service.send_request(reader, writer, "GET", "/books/search?q=web") == {"isbns": ["SL601"]}
+        assert await service.send_request(reader, writer, "POST", "/borrow",
+                                          {"isbn": "SL601", "member_id": "905099999"}) == {"ok": False}
+        assert await service.send_request(reader, writer, "POST", "/borrow",
+                                          {"isbn": "SL601", "member_id": "905040001"}) == {"ok": True}
+        assert (await service.send_request(reader, writer, "GET", "/books/SL601"))["total_copies"] == 0
+        assert (await service.send_request(reader, writer, "GET", "/stats"))["summary"] == circulation_summary()
+        assert await service.send_request(reader, writer, "GET", "/books/browse?author=julius%20kargbo&limit=1&desc=1") == {
+            "isbns": ["SL601"], "next": "SL601"}
+        assert await service.send_request(reader, writer, "POST", "/return",
+                                          {"isbn": "SL601", "member_id": "905040001"}) == {"ok": True}
+    finally:
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.sleep(0.01)  # Let the server see the connection close before shutting down
+        server.cancel()
+
+
+asyncio.run(exercise_service())
+
+# Thread-Safe Circulation
+# Many threads borrowing and returning the same books never oversell copies or exceed the limit
+assert threadsafe.add_book("SL301", "Concurrency", "Kairan Lebbie", "Non-Fiction", 2) == True
+assert threadsafe.add_book("SL302", "Parallelism", "Haja Barrie", "Non-Fiction", 5) == True
+for number in range(20):
+    assert threadsafe.add_member(f"9053{number:05d}", "Stress Member", "stress@gmail.com") == True
+
+
+def hammer(seed):
+    generator = random.Random(seed)
+    for _ in range(2000):
+        isbn = generator.choice(("SL301", "SL302", "SL003", "SL004"))
+        member_id = f"9053{generator.randrange(20):05d}"
+        if generator.random() < 0.6:
+            threadsafe.borrow_book(isbn, member_id)
+        else:
+            threadsafe.return_book(isbn, member_id)
+
+
+switch_interval = sys.getswitchinterval()
+sys.setswitchinterval(1e-6)
+workers = [threading.Thread(target=hammer, args=(seed,)) for seed in range(16)]
+for worker in workers:
+    worker.start()
+for worker in workers:
+    worker.join()
+sys.setswitchinterval(switch_interval)
+
+for isbn, book in books.items():
+    holders = sum(isbn in member["borrowed_books"] for member in members.values())
+    assert book["total_copies"] >= 0
+    assert book["original_copies"] - book["total_copies"] == holders
+for member in members.values():
+    assert len(member["borrowed_books"]) <= 3
+assert threadsafe.circulation_summary() == rescanned_summary()
+
+# Benchmarks
+# A small benchmark run reports every operation (this replaces the library contents)
+result = benchmarks.run_size(200, samples=20)
+assert result["size"] == 200
+assert len(books) == 200 + 20
+assert all(numbers["calls"] > 0 and numbers["p99_us"] >= numbers["p50_us"]
+           for numbers in result["operations"].values())
+timed = {"place_hold", "hold_queue", "member_loans", "overdue_loans", "genre_stats", "title_stats", "apply_batch"}
+assert timed <= set(result["operations"])
+assert result["search_cache"]["author"]["hits"] == 0  # Distinct queries time the index, not the cache
+
+# Workload Traces
+# A recorded workload replays on a fresh library with the same results (this replaces the library contents)
+ticks = iter(range(1_000_000, 2_000_000))
+operations.clock = lambda: next(ticks) / 20  # Recorded calls are 50 ms apart
+with tempfile.TemporaryDirectory() as directory:
+    path = f"{directory}/trace.jsonl"
+    assert workload.start_recording(path)
+    assert not workload.start_recording(path)
+    assert workload.recording()
+    assert operations.add_books_bulk(record for record in [("WL001", "Trace Book", "Tracer", "Fiction", 1),
+                                                           ("WL002", "Replay Book", "Tracer", "Fiction", 2)])
+    assert operations.add_member("WLM001", "Tess", "tess@example.com")
+    assert threadsafe.borrow_book("WL001", "WLM001")
+    assert not operations.borrow_book("WL001", "WLM001")
+    assert operations.find_books("book") == ["WL001", "WL002"]
+    assert operations.apply_batch([("add_member", ("WLM002", "Rey", "rey@example.com")), ("borrow_book", ("WL002", "WLM002"))])
+    assert operations.member_loans("WLM001")[0].borrowed_at == 1_000_002 / 20  # The clock read as the borrow started
+    assert len(operations.overdue_loans(operations.clock() + 30 * 86400)) == 2
+    assert workload.stop_recording() == 8
+    assert not workload.recording()
+    assert workload.stop_recording() is None
+    assert operations.clock is not workload._call_clock
+    assert operations.borrow_book.__wrapped__ is not None
+    with open(path, "a") as trace:
+        trace.write('[1,"add_bo')  # Torn write
+    recorded = workload.load_trace(path)
+    assert [call[1] for call in recorded][-3:] == ["apply_batch", "member_loans", "overdue_loans"]
+    assert len(recorded) == 8
+    report = workload.replay(path)
+    assert report["calls"] == 8
+    assert report["divergences"] == 0
+    assert report["p99_us"] >= report["p50_us"] > 0
+    assert report["operations"]["borrow_book"]["calls"] == 2
+    assert books["WL002"]["total_copies"] == 1
+    # Across workers a borrow may overtake the add_member it depends on, which shows up as a divergence
+    report = workload.replay(path, workers=2)
+    assert report["calls"] == 8
+    assert report["workers"] == 2
+    assert report["divergences"] <= 4
+    assert len(members) == 2
+    paced = workload.replay(path, speed=2.0)  # The calls span 400 ms of recorded time
+    assert paced["divergences"] == 0
+    assert 0.15 < paced["seconds"] < 1.0
+    with open(path, "w") as trace:  # A recording that disagrees with this version
+        trace.write("".join(json.dumps(call[:4] + (False if call[1] == "apply_batch" else call[4],)) + "\n"
+                            for call in recorded))
+    report = workload.replay(path, max_divergences=0)
+    assert report["divergences"] == 1
+    assert report["divergent"] == []
+    assert workload.replay(path)["divergent"][0]["line"] == 6
+    with sqlite_store.SQLiteLibrary() as library:
+        report = workload.replay(path, library=library)
+        # The SQLite store has no apply_batch, so only the loan it would have opened is missing
+        assert report["calls"] == 7
+        assert report["skipped"] == {"apply_batch": 1}
+        assert report["divergences"] == 1
+        assert report["divergent"][0]["operation"] == "overdue_loans"
+        assert len(report["divergent"][0]["replayed"]) == 1
+operations.clock = time.time
+
+# Persistent Storage
+# Opening a store replaces the in-memory state with the persisted one
+with tempfile.TemporaryDirectory() as directory:
+    journal = storage.open_store(directory, compact_every=3)
+    assert books == {}
+    assert members == {}
+    assert add_book("SL101", "Networks", "Kumba Sesay", "Non-Fiction", 2) == True
+    assert add_member("905000101", "Alpha Kamara", "alpha.kamara@gmail.com") == True
+    assert borrow_book("SL101", "905000101") == True
+    borrowed_at = member_loans("905000101")[0].borrowed_at
+    assert update_book("SL101", title="Computer Networks") == True
+    with transactions.begin() as transaction:
+        transaction.add_member("905000102", "Isata Conteh", "isata.conteh@gmail.com")
+        transaction.borrow_book("SL101", "905000102")
+    assert transaction.committed == True
+    journal.close()
+
+    # Snapshot plus journal tail are replayed on startup
+    journal = storage.open_store(directory)
+    assert journal.replayed == 2
+    assert books["SL101"]["title"] == "Computer Networks"
+    assert books["SL101"]["total_copies"] == 0
+    assert members["905000102"]["borrowed_books"] == ("SL101",)
+    assert members["905000101"]["borrowed_books"] == ("SL101",)
+    assert current_borrowers("SL101") == ["905000101", "905000102"]
+    assert member_loans("905000101")[0].borrowed_at == borrowed_at
+    assert search_books("computer") == True
+    journal.close()
+
+    # The last records of a burst are written once flush_interval passes, with no later mutation
+    journal = storage.open_store(directory, batch_size=1000, flush_interval=0.01)
+    assert add_book("SL102", "Protocols", "Kumba Sesay", "Non-Fiction", 1) == True
+    time.sleep(0.2)
+    with open(f"{directory}/{storage.JOURNAL_FILE}", encoding="utf-8") as log:
+        assert '"SL102"' in log.read()
+    journal.close()
+
+    # A batch given as a generator is journaled with its calls and survives a restart
+    journal = storage.open_store(directory)
+    batch = (call for call in [("add_member", ("905000103", "Sia Koroma", "sia.koroma@gmail.com")),
+                               ("borrow_book", ("SL102", "905000103"))])
+    assert apply_batch(batch) == True
+    journal.close()
+    journal = storage.open_store(directory)
+    assert members["905000103"]["borrowed_books"] == ("SL102",)
+    journal.close()
+
+# Columnar Snapshots
+# Books snapshotted in the columnar format are served lazily after a restart
+with tempfile.TemporaryDirectory() as directory:
+    journal = storage.open_store(directory, compact_every=2, columnar_books=True)
+    assert add_book("SL201", "Compilers", "Haja Barrie", "Non-Fiction", 3) == True
+    assert add_book("SL202", "Algorithms", "Julius Kargbo", "Non-Fiction", 1) == True
+    journal.close()
+
+    journal = storage.open_store(directory, columnar_books=True)
+    assert isinstance(operations.books, columnar.LazyBooks)
+    assert operations.books["SL201"]["total_copies"] == 3
+    assert find_books("algo") == ["SL202"]
+    assert delete_book("SL201") == True
+    assert list(operations.books) == ["SL202"]
+    journal.close()
+    operations.books.catalog.close()
+    operations.books = books
+    reset_library()
+
 print("All unit tests passed successfully!")
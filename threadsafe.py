@@ -0,0 +1,263 @@
+import threading
+from contextlib import contextmanager
+
+import operations
+
+# Number of lock stripes per key space. Keys hash onto a fixed set of locks so the
+# lock tables do not grow with the catalog; unrelated keys rarely share a stripe.
+LOCK_STRIPES = 1024
+
+_book_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+_member_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+# Serializes changes to the catalog structure, since the search indexes are shared
+_catalog_lock = threading.Lock()
+
+
+def _stripes(keys):
+    """Returns the sorted, distinct stripe numbers of the string keys."""
+    return sorted({hash(key) % LOCK_STRIPES for key in keys if isinstance(key, str)})
+
+
+@contextmanager
+def locked(isbns=(), member_ids=(), catalog=False):
+    """
+    Holds the locks for the given ISBNs and member IDs for the duration of the block.
+    Locks are always taken in the same order (catalog lock, then book stripes by
+    number, then member stripes by number), so concurrent callers cannot deadlock.
+    """
+    locks = [_catalog_lock] if catalog else []
+    locks += [_book_locks[stripe] for stripe in _stripes(isbns)]
+    locks += [_member_locks[stripe] for stripe in _stripes(member_ids)]
+    acquired = []
+    try:
+        for lock in locks:
+            lock.acquire()
+            acquired.append(lock)
+        yield
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
+
+
+@contextmanager
+def exclusive():
+    """Holds every lock, pausing all operations made through this module."""
+    with locked(catalog=True):
+        acquired = []
+        try:
+            for lock in _book_locks + _member_locks:
+                lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+def compact(journal):
+    """Compacts a storage.Journal while no operation is half applied."""
+    with exclusive():
+        journal.compact()
+
+# Add Book
+def add_book(isbn, title, author, genre, total_copies):
+    """Thread-safe operations.add_book."""
+    with locked((isbn,), catalog=True):
+        return operations.add_book(isbn, title, author, genre, total_copies)
+
+# Add Member
+def add_member(member_id, name, email):
+    """Thread-safe operations.add_member."""
+    with locked(member_ids=(member_id,)):
+        return operations.add_member(member_id, name, email)
+
+# Find Books
+def find_books(query, by="title", offset=0, limit=None):
+    """Thread-safe operations.find_books."""
+    with locked(catalog=True):
+        return operations.find_books(query, by, offset, limit)
+
+# Fuzzy Find Books
+def fuzzy_find_books(query, by="title", offset=0, limit=None, max_distance=None):
+    """Thread-safe operations.fuzzy_find_books."""
+    with locked(catalog=True):
+        return operations.fuzzy_find_books(query, by, offset, limit, max_distance)
+
+# Search Books
+def search_books(query, by="title"):
+    """Thread-safe operations.search_books."""
+    with locked(catalog=True):
+        return operations.search_books(query, by)
+
+# Browse Books
+def browse_books(genre=None, author=None, after=None, limit=20, descending=False):
+    """Thread-safe operations.browse_books."""
+    with locked(catalog=True):
+        return operations.browse_books(genre, author, after, limit, descending)
+
+# Search Cache Stats
+def search_cache_stats():
+    """Thread-safe operations.search_cache_stats."""
+    with locked(catalog=True):
+        return operations.search_cache_stats()
+
+# Update Book
+def update_book(isbn, title=None, author=None, genre=None, total_copies=None):
+    """Thread-safe operations.update_book."""
+    with locked((isbn,), catalog=True):
+        return operations.update_book(isbn, title, author, genre, total_copies)
+
+# Update Member
+def update_member(member_id, name=None, email=None):
+    """Thread-safe operations.update_member."""
+    with locked(member_ids=(member_id,)):
+        return operations.update_member(member_id, name, email)
+
+# Delete Book
+def delete_book(isbn):
+    """Thread-safe operations.delete_book."""
+    with locked((isbn,), catalog=True):
+        return operations.delete_book(isbn)
+
+# Delete Member
+def delete_member(member_id):
+    """Thread-safe operations.delete_member."""
+    with locked(member_ids=(member_id,)):
+        return operations.delete_member(member_id)
+
+# Borrow Book
+def borrow_book(isbn, member_id):
+    """
+    Thread-safe operations.borrow_book. Holds only the book's and the member's
+    stripes, so checkouts of different books by different members run concurrently.
+    """
+    with locked((isbn,), (member_id,)):
+        return operations.borrow_book(isbn, member_id)
+
+# Return Book
+def return_book(isbn, member_id):
+    """
+    Thread-safe operations.return_book. Besides the stripes borrow_book uses, it holds
+    the stripes of the members waiting on the book, since a hold may be served.
+    """
+    while True:
+        with locked((isbn,)):
+            waiting = _waiting_members(isbn)
+        with locked((isbn,), (member_id, *waiting)):
+            # The queue only changes under the book's stripe, so it is stable from here on
+            if set(_waiting_members(isbn)) <= set(waiting):
+                return operations.return_book(isbn, member_id)
+
+
+def _waiting_members(isbn):
+    """Returns the members with a hold on the book. The caller holds the book's stripe."""
+    return operations.hold_queue(isbn)
+
+# Place Hold
+def place_hold(isbn, member_id, priority=0, expires_in=None):
+    """Thread-safe operations.place_hold."""
+    with locked((isbn,), (member_id,)):
+        return operations.place_hold(isbn, member_id, priority, expires_in)
+
+# Cancel Hold
+def cancel_hold(isbn, member_id):
+    """Thread-safe operations.cancel_hold."""
+    with locked((isbn,), (member_id,)):
+        return operations.cancel_hold(isbn, member_id)
+
+# Hold Queue
+def hold_queue(isbn):
+    """Thread-safe operations.hold_queue."""
+    with locked((isbn,)):
+        return operations.hold_queue(isbn)
+
+# Current Borrowers
+def current_borrowers(isbn):
+    """Thread-safe operations.current_borrowers."""
+    with locked((isbn,)):
+        return operations.current_borrowers(isbn)
+
+# Member Loans
+def member_loans(member_id):
+    """Thread-safe operations.member_loans."""
+    with locked((), (member_id,)):
+        return operations.member_loans(member_id)
+
+# Overdue Loans
+def overdue_loans(now=None):
+    """Thread-safe operations.overdue_loans. Overdue loans may be on any book, so it holds every lock."""
+    with exclusive():
+        return operations.overdue_loans(now)
+
+# Circulation Summary
+def circulation_summary():
+    """
+    Thread-safe operations.circulation_summary. Counting after a reload scans the
+    catalog, so that first read pauses every operation; later reads take no stripes.
+    """
+    _build_stats()
+    return operations.circulation_summary()
+
+# Genre Stats
+def genre_stats():
+    """Thread-safe operations.genre_stats."""
+    _build_stats()
+    return operations.genre_stats()
+
+# Title Stats
+def title_stats(isbn):
+    """Thread-safe operations.title_stats."""
+    with locked((isbn,)):
+        return operations.title_stats(isbn)
+
+
+def _build_stats():
+    """Finishes deferred counting while no operation can change the records being counted."""
+    if operations.stats.pending is not None:
+        with exclusive():
+            operations.stats.genre_stats()
+
+# Apply Batch
+def apply_batch(calls):
+    """
+    Thread-safe operations.apply_batch. Runs with every lock held, so no other
+    operation interleaves with the batch; pass it to transactions.begin.
+    """
+    with exclusive():
+        return operations.apply_batch(calls)
+
+# Add Books Bulk
+def add_books_bulk(records, atomic=False):
+    """Thread-safe operations.add_books_bulk."""
+    records = [tuple(record) for record in records]
+    with locked([record[0] for record in records if record], catalog=True):
+        return operations.add_books_bulk(records, atomic)
+
+# Add Members Bulk
+def add_members_bulk(records, atomic=False):
+    """Thread-safe operations.add_members_bulk."""
+    records = [tuple(record) for record in records]
+    with locked(member_ids=[record[0] for record in records if record]):
+        return operations.add_members_bulk(records, atomic)
+
+# Borrow Many
+def borrow_many(pairs, atomic=False):
+    """Thread-safe operations.borrow_many, holding the stripes of every book and member in the batch."""
+    pairs = [tuple(pair) for pair in pairs]
+    with locked([pair[0] for pair in pairs if len(pair) == 2], [pair[1] for pair in pairs if len(pair) == 2]):
+        return operations.borrow_many(pairs, atomic)
+
+# Return Many
+def return_many(pairs, atomic=False):
+    """
+    Thread-safe operations.return_many, holding the stripes of every book and member in
+    the batch and of the members waiting on those books.
+    """
+    pairs = [tuple(pair) for pair in pairs]
+    isbns = [pair[0] for pair in pairs if len(pair) == 2]
+    while True:
+        with locked(isbns):
+            waiting = [member_id for isbn in isbns for member_id in _waiting_members(isbn)]
+        with locked(isbns, [pair[1] for pair in pairs if len(pair) == 2] + waiting):
+            if set(member_id for isbn in isbns for member_id in _waiting_members(isbn)) <= set(waiting):
+                return operations.return_many(pairs, atomic)
@@ -0,0 +1,129 @@
+import time
+
+import operations
+
+
+class Transaction:
+    """
+    Groups operations into one atomic change. Calls are staged while the transaction is
+    open and applied together by commit through operations.apply_batch, so other
+    readers never see a half-applied transaction. Staged calls do not see each other's
+    effects until commit; reads made meanwhile see the committed state.
+    """
+
+    def __init__(self, apply=None):
+        # threadsafe.apply_batch can be passed when other threads share the store
+        self.apply = apply if apply is not None else operations.apply_batch
+        self.calls = []
+        self.committed = None  # True or False once commit has run
+
+    def _stage(self, name, *args):
+        if self.committed is not None:
+            raise RuntimeError("Transaction already finished")
+        self.calls.append((name, args))
+
+    def add_book(self, isbn, title, author, genre, total_copies):
+        """Stages operations.add_book."""
+        self._stage("add_book", isbn, title, author, genre, total_copies)
+
+    def add_member(self, member_id, name, email):
+        """Stages operations.add_member."""
+        self._stage("add_member", member_id, name, email)
+
+    def update_book(self, isbn, title=None, author=None, genre=None, total_copies=None):
+        """
+        Stages operations.update_book for every field given, unlike update_book itself,
+        which applies only the first one. Staging no field makes the commit fail.
+        """
+        fields = [(position, value) for position, value in enumerate((title, author, genre, total_copies))
+                  if value is not None]
+        for position, value in fields or [(0, None)]:
+            args = [None] * 4
+            args[position] = value
+            self._stage("update_book", isbn, *args)
+
+    def update_member(self, member_id, name=None, email=None):
+        """Stages operations.update_member for every field given."""
+        fields = [(position, value) for position, value in enumerate((name, email)) if value is not None]
+        for position, value in fields or [(0, None)]:
+            args = [None] * 2
+            args[position] = value
+            self._stage("update_member", member_id, *args)
+
+    def delete_book(self, isbn):
+        """Stages operations.delete_book."""
+        self._stage("delete_book", isbn)
+
+    def delete_member(self, member_id):
+        """Stages operations.delete_member."""
+        self._stage("delete_member", member_id)
+
+    def borrow_book(self, isbn, member_id):
+        """Stages operations.borrow_book."""
+        self._stage("borrow_book", isbn, member_id)
+
+    def return_book(self, isbn, member_id):
+        """Stages operations.return_book."""
+        self._stage("return_book", isbn, member_id)
+
+    def place_hold(self, isbn, member_id, priority=0, expires_in=None):
+        """Stages operations.place_hold."""
+        self._stage("place_hold", isbn, member_id, priority, expires_in)
+
+    def cancel_hold(self, isbn, member_id):
+        """Stages operations.cancel_hold."""
+        self._stage("cancel_hold", isbn, member_id)
+
+    def commit(self):
+        """
+        Applies every staged call atomically. Returns True if all of them succeeded;
+        otherwise nothing is changed and False is returned.
+        """
+        if self.committed is not None:
+            raise RuntimeError("Transaction already finished")
+        self.committed = bool(self.apply(self.calls)) if self.calls else True
+        return self.committed
+
+    def rollback(self):
+        """Discards the staged calls without applying them."""
+        if self.committed is not None:
+            raise RuntimeError("Transaction already finished")
+        self.calls.clear()
+        self.committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Commits when the block completes, or rolls back if it raised. Check committed for the outcome."""
+        if self.committed is None:
+            if exc_type is None:
+                self.commit()
+            else:
+                self.rollback()
+        return False
+
+
+def begin(apply=None):
+    """Starts a transaction. Use it as a context manager or call commit or rollback."""
+    return Transaction(apply)
+
+
+def read(reader):
+    """
+    Runs reader() and returns its result, retrying until no batch was applied while
+    it ran, so the result reflects a consistent state without taking any lock.
+    Errors raised while a batch was running are treated as torn reads and retried.
+    """
+    while True:
+        version = operations.commit_version
+        if version % 2 == 0:
+            try:
+                result = reader()
+            except Exception:
+                if operations.commit_version == version:
+                    raise
+            else:
+                if operations.commit_version == version:
+                    return result
+        time.sleep(0)  # Let the batch finish
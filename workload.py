@@ -0,0 +1,332 @@
+import argparse
+import collections.abc
+import concurrent.futures
+import functools
+import json
+import random
+import threading
+import time
+
+import benchmarks
+import instrumentation
+import operations
+import threadsafe
+from records import Record
+
+# Operations whose first argument is the ISBN, member ID or query the call is about.
+# Across several workers, consecutive calls of these are spread over the workers by
+# that key; any other call runs alone, after every earlier call has finished.
+KEYED_OPERATIONS = frozenset(("add_book", "add_member", "find_books", "fuzzy_find_books", "search_books",
+                              "update_book", "update_member", "delete_book", "delete_member", "borrow_book",
+                              "return_book", "current_borrowers", "member_loans", "place_hold", "cancel_hold",
+                              "hold_queue", "title_stats"))
+
+_originals = {}  # operation name -> unrecorded function, while recording
+_base_clock = None  # operations.clock before recording or replay replaced it
+_file = None  # Trace being written
+_buffer = []
+_buffer_lock = threading.Lock()
+_recorded = 0  # Calls written to the current trace
+_state = threading.local()  # Per thread: nesting depth of recorded calls and the frozen clock reading
+
+
+def _call_clock():
+    """
+    Replaces operations.clock while recording or replaying: inside a call it returns
+    the reading taken when the call started, so a replayed call sees the same time.
+    """
+    now = getattr(_state, "now", None)
+    return _base_clock() if now is None else now
+
+
+def _plain(value):
+    """json.dumps default: converts records and sets in results to JSON values."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Cannot record {type(value).__name__} values")
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":"), default=_plain)
+
+
+def _materialize(args):
+    """Turns iterator arguments, such as generators of bulk records, into lists so they can be recorded."""
+    return tuple(list(arg) if isinstance(arg, collections.abc.Iterator) else arg for arg in args)
+
+
+def _record(name, func):
+    """Wraps one operation so each outermost call is appended to the trace."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _recorded
+        if getattr(_state, "depth", 0):
+            # Operations calling other operations are recorded as the outer call only
+            return func(*args, **kwargs)
+        args = _materialize(args)
+        kwargs = dict(zip(kwargs, _materialize(kwargs.values())))
+        _state.now = now = operations.clock()
+        _state.depth = 1
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            _state.depth = 0
+            _state.now = None
+        line = f"[{now!r},{_encode(name)},{_encode(args)},{_encode(kwargs)},{_encode(result)}]\n"
+        with _buffer_lock:
+            _buffer.append(line)
+            _recorded += 1
+            if len(_buffer) >= 1024:
+                _flush()
+        return result
+
+    # operations.py calls borrow_book.__wrapped__ to skip journaling, so it must keep
+    # pointing at the undecorated function rather than at the mutation wrapper
+    wrapper.__wrapped__ = getattr(func, "__wrapped__", func)
+    return wrapper
+
+
+def _flush():
+    if _buffer:
+        _file.write("".join(_buffer))
+        _file.flush()
+        _buffer.clear()
+
+
+def start_recording(path):
+    """
+    Records every call of the operations in instrumentation.OPERATIONS to a JSONL
+    trace at path, one [clock reading, operation, args, kwargs, result] list per line
+    in the order the calls returned. Like instrumentation, the operations are replaced
+    on the operations module, so only callers going through the module are recorded;
+    calls operations make to each other are not recorded separately. Inside a call,
+    operations.clock returns the reading taken as it started, so replay reproduces
+    loan and hold times. Returns False if a trace is already being recorded.
+    """
+    global _file, _recorded, _base_clock
+    if _originals:
+        return False
+    _file = open(path, "w", encoding="utf-8")
+    _recorded = 0
+    _base_clock = operations.clock
+    operations.clock = _call_clock
+    for name in instrumentation.OPERATIONS:
+        _originals[name] = getattr(operations, name)
+        setattr(operations, name, _record(name, _originals[name]))
+    return True
+
+
+def stop_recording():
+    """
+    Restores the unrecorded operations and closes the trace. Returns the number of
+    calls recorded, or None if no trace was being recorded. When instrumentation is
+    also enabled, disable it and stop recording in the reverse order of enabling.
+    """
+    global _file
+    if not _originals:
+        return None
+    for name, func in _originals.items():
+        setattr(operations, name, func)
+    _originals.clear()
+    if operations.clock is _call_clock:
+        operations.clock = _base_clock
+    with _buffer_lock:
+        _flush()
+        _file.close()
+        _file = None
+    return _recorded
+
+
+def recording():
+    """Returns True while calls are being recorded."""
+    return bool(_originals)
+
+
+def load_trace(path):
+    """
+    Returns the calls of a trace as (clock reading, operation, args, kwargs, result)
+    tuples. A torn last line, left by a process that stopped mid-write, is ignored.
+    """
+    calls = []
+    with open(path, encoding="utf-8") as trace:
+        for line in trace:
+            try:
+                at, operation, args, kwargs, result = json.loads(line)
+            except ValueError:
+                break  # Torn write at the tail of the trace
+            calls.append((at, operation, args, kwargs, result))
+    return calls
+
+
+def _phases(calls, workers):
+    """
+    Splits the call positions into phases run one after another. A phase is either a
+    single call that is not keyed, or a run of keyed calls divided into one list per
+    worker by key, so calls about the same key keep their recorded order.
+    """
+    phases = []
+    lanes = None
+    for position, (_, operation, args, kwargs, _) in enumerate(calls):
+        if workers > 1 and operation in KEYED_OPERATIONS and args and isinstance(args[0], str):
+            if lanes is None:
+                lanes = [[] for _ in range(workers)]
+                phases.append(lanes)
+            lanes[hash(args[0]) % workers].append(position)
+        else:
+            lanes = None
+            phases.append([[position]])
+    return phases
+
+
+def replay(path, speed=None, workers=1, library=None, max_divergences=20):
+    """
+    Replays a trace against a library emptied first: the operations module by default,
+    or any object with the same API, such as a sqlite_store.SQLiteLibrary. With speed
+    None the calls run as fast as possible; otherwise each call waits for its recorded
+    time, scaled by speed (1.0 is the original pacing). With several workers, keyed
+    calls run on worker threads through threadsafe.py, so replies that depend on the
+    order of calls about different keys may diverge from the recording (workers > 1
+    requires the operations module). Calls of operations the library does not
+    implement are skipped and counted. Returns throughput, latency percentiles in
+    microseconds overall and per operation, and the calls whose result differed from
+    the recording, up to max_divergences of them.
+    """
+    global _base_clock
+    target = operations if library is None else library
+    if workers > 1 and target is not operations:
+        raise ValueError("Replaying on several workers requires the operations module")
+    calls = []
+    lines = []  # Trace line number of each call in calls
+    skipped = {}  # operation the library does not implement -> calls left out
+    for line, call in enumerate(load_trace(path), 1):
+        if hasattr(target, call[1]):
+            calls.append(call)
+            lines.append(line)
+        else:
+            skipped[call[1]] = skipped.get(call[1], 0) + 1
+    target.reset_library()
+    if workers > 1:
+        target = threadsafe
+    functions = {name: getattr(target, name) for name in {call[1] for call in calls}}
+    latencies = [0] * len(calls)
+    results = [None] * len(calls)
+    first_at = calls[0][0] if calls else 0.0
+    clock = time.perf_counter_ns
+
+    def run(positions):
+        for position in positions:
+            at, operation, args, kwargs, _ = calls[position]
+            if speed:
+                delay = started + (at - first_at) / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            _state.now = at
+            before = clock()
+            try:
+                results[position] = functions[operation](*args, **kwargs)
+            finally:
+                latencies[position] = clock() - before
+                _state.now = None
+
+    replaced = operations.clock is not _call_clock  # Already replaced while recording
+    if replaced:
+        _base_clock = operations.clock
+        operations.clock = _call_clock
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            started = time.perf_counter()
+            for lanes in _phases(calls, workers):
+                if len(lanes) == 1:
+                    run(lanes[0])
+                else:
+                    for future in [pool.submit(run, lane) for lane in lanes if lane]:
+                        future.result()
+            elapsed = time.perf_counter() - started
+    finally:
+        if replaced:
+            operations.clock = _base_clock
+
+    divergences = 0
+    divergent = []
+    timings = {}
+    for position, (_, operation, args, kwargs, expected) in enumerate(calls):
+        timings.setdefault(operation, []).append(latencies[position])
+        actual = json.loads(_encode(results[position]))
+        if actual != expected:
+            divergences += 1
+            if len(divergent) < max_divergences:
+                divergent.append({"line": lines[position], "operation": operation, "args": args, "kwargs": kwargs,
+                                  "recorded": expected, "replayed": actual})
+    report = {"calls": len(calls), "workers": workers, "seconds": elapsed,
+              "ops_per_second": len(calls) / elapsed if elapsed else 0.0}
+    report.update(_latency(latencies))
+    report["operations"] = {name: _latency(values) for name, values in sorted(timings.items())}
+    report["skipped"] = skipped
+    report["divergences"] = divergences
+    report["divergent"] = divergent
+    return report
+
+
+def _latency(latencies):
+    """Returns the call count and latency percentiles in microseconds of nanosecond latencies."""
+    if not latencies:
+        return {"calls": 0}
+    ordered = sorted(latencies)
+    return {"calls": len(ordered), "p50_us": benchmarks._percentile(ordered, 0.50) / 1000,
+            "p90_us": benchmarks._percentile(ordered, 0.90) / 1000,
+            "p99_us": benchmarks._percentile(ordered, 0.99) / 1000, "max_us": ordered[-1] / 1000}
+
+
+def generate_workload(size=10_000, calls=50_000, seed=0):
+    """
+    Loads size synthetic books and members, then makes calls random calls: mostly
+    borrows, returns and title searches, with some holds, loan listings and stats.
+    """
+    generator = random.Random(seed)
+    books = list(benchmarks.generate_books(size, seed))
+    members = list(benchmarks.generate_members(size, seed))
+    operations.add_books_bulk(books)
+    operations.add_members_bulk(members)
+    for _ in range(calls):
+        isbn = generator.choice(books)[0]
+        member_id = generator.choice(members)[0]
+        roll = generator.random()
+        if roll < 0.35:
+            operations.borrow_book(isbn, member_id)
+        elif roll < 0.55:
+            borrowers = operations.current_borrowers(isbn)
+            operations.return_book(isbn, borrowers[0] if borrowers else member_id)
+        elif roll < 0.80:
+            operations.find_books(generator.choice(books)[1].split()[0], limit=20)
+        elif roll < 0.87:
+            operations.place_hold(isbn, member_id)
+        elif roll < 0.95:
+            operations.member_loans(member_id)
+        elif roll < 0.99:
+            operations.title_stats(isbn)
+        else:
+            operations.circulation_summary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record a synthetic workload trace or replay a recorded one.")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("trace", help="trace file to write or to replay")
+    parser.add_argument("--size", type=int, default=10_000, help="books and members loaded when recording")
+    parser.add_argument("--calls", type=int, default=50_000, help="calls made after loading when recording")
+    parser.add_argument("--speed", type=float, help="replay at this multiple of the recorded pacing; "
+                                                    "as fast as possible when omitted")
+    parser.add_argument("--workers", type=int, default=1)
+    arguments = parser.parse_args()
+
+    if arguments.mode == "record":
+        operations.reset_library()
+        start_recording(arguments.trace)
+        started = time.perf_counter()
+        generate_workload(arguments.size, arguments.calls)
+        print({"calls": stop_recording(), "seconds": time.perf_counter() - started})
+    else:
+        print(json.dumps(replay(arguments.trace, arguments.speed, arguments.workers), indent=2))